@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def iter_analysis(paths, kind, analyze, cache=None, max_workers=None):
+    """
+    ファイルごとの音声解析 analyze(パス) -> バイト列（失敗時は None）を実行し、
+    (パス, 結果) を順に返すジェネレータ。
+
+    MetadataCache に kind の結果があればそれを返し、無いものだけをプロセスプールで
+    並列に計算してキャッシュへ保存します（書き込みは呼び出し元のプロセスで行う）。
+    analyze はワーカープロセスから呼べるよう、モジュールの関数を渡してください。
+    max_workers=1 ならプールを使わずその場で計算します。
+    ワーカーは fork ではなく spawn で起動します（デコードや描画のスレッドが動いている
+    Qt のプロセスを fork すると、ロックを握ったままの状態が子に複製されるため）。
+    途中でやめる場合はジェネレータを close() すると、未着手の解析を取り消します。
+    """
+    missing = []
+    for path in paths:
+        data = cache.get_analysis(path, kind) if cache is not None else None
+        if data is None:
+            missing.append(path)
+        else:
+            yield path, data
+    if not missing:
+        return
+
+    if max_workers == 1:
+        computed = map(analyze, missing)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        workers = max_workers or os.cpu_count() or 1
+        computed = executor.map(
+            analyze,
+            missing,
+            chunksize=max(1, min(32, len(missing) // (workers * 4))),
+        )
+    try:
+        for path, data in zip(missing, computed):
+            if data is not None and cache is not None:
+                cache.put_analysis(path, kind, data)
+            yield path, data
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if cache is not None:
+            cache.flush()
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class ArtStore:
+    """
+    アルバムアートを内容ハッシュで重複排除して保持するストア。
+
+    曲のメタデータには画像そのものではなくハッシュ値（art_key）だけを持たせ、
+    バイト列は必要になった時にここから取り出します。メモリ上の保持量は
+    max_bytes を上限とする LRU で管理し、追い出した画像は spill_dir が
+    指定されていればディスクへ退避します。どちらにも無い場合は loader で
+    元の音声ファイルから読み直します。
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, spill_dir=None, loader=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        # loader(file_path) -> bytes | None
+        self.loader = loader
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        # ハッシュ値 -> 読み直し用の音声ファイルパス（文字列だけなので軽い）
+        self._sources = {}
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(data):
+        """画像バイト列からキー（ハッシュ値）を計算する"""
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def put(self, data, source_path=None):
+        """画像を登録してキーを返す。同じ画像は一度しか保持しない"""
+        if not data:
+            return None
+        key = self.make_key(data)
+        with self._lock:
+            if source_path is not None:
+                self._sources.setdefault(key, source_path)
+            self._remember(key, bytes(data))
+        return key
+
+    def get(self, key, source_path=None):
+        """
+        キーに対応する画像を返す。
+        メモリ → ディスク退避先 → 元ファイルの順に探し、見つからなければ None。
+        """
+        if key is None:
+            return None
+
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                return data
+            source_path = source_path or self._sources.get(key)
+
+        data = self._read_spilled(key)
+        if data is None and self.loader is not None and source_path:
+            data = self.loader(source_path)
+            # ファイルが書き換えられて別の画像になっていたら使わない
+            if data is not None and self.make_key(data) != key:
+                data = None
+
+        if data is not None:
+            with self._lock:
+                self._remember(key, data)
+        return data
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._cache:
+                return True
+        path = self._spill_path(key)
+        return path is not None and os.path.exists(path)
+
+    @property
+    def memory_usage(self):
+        """メモリ上に保持している画像の合計バイト数"""
+        return self._cache_bytes
+
+    def clear(self):
+        """メモリ上の画像をすべて破棄する（ディスク退避分は残す）"""
+        with self._lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+
+    def _remember(self, key, data):
+        """LRU に登録し、上限を超えた分を古い順に追い出す（ロック取得済みで呼ぶ）"""
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return
+        self._cache[key] = data
+        self._cache_bytes += len(data)
+
+        # 直近に登録した1枚は上限を超えていても残す
+        while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+            old_key, old_data = self._cache.popitem(last=False)
+            self._cache_bytes -= len(old_data)
+            self._spill(old_key, old_data)
+
+    def _spill_path(self, key):
+        if not self.spill_dir:
+            return None
+        return os.path.join(self.spill_dir, key[:2], key)
+
+    def _spill(self, key, data):
+        path = self._spill_path(key)
+        if path is None or os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 書きかけのファイルを読まないよう、一時ファイル経由で置き換える
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Art spill error ({key}): {e}")
+
+    def _read_spilled(self, key):
+        path = self._spill_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
@@ -0,0 +1,34 @@
+from functools import lru_cache
+from .search import normalize_text
+
+# PyICU があれば日本語ロケールの照合順（読みを考慮した並び）を使う
+try:
+    import icu
+except ImportError:
+    icu = None
+
+if icu is not None:
+    _collator = icu.Collator.createInstance(icu.Locale("ja_JP"))
+else:
+    _collator = None
+
+
+def has_locale_collation():
+    """ロケールに従った照合（PyICU）が使えるかどうか"""
+    return _collator is not None
+
+
+@lru_cache(maxsize=65536)
+def collation_key(text):
+    """
+    並び替え用の照合キーを返す。比較のたびに計算しないよう、曲の追加時に1回だけ呼びます。
+
+    PyICU がある場合は ja_JP の照合キー（bytes）を、無い場合は
+    全角/半角・大文字/小文字・カタカナ/ひらがなを同一視した文字列を返します。
+    （後者では漢字は読みではなく文字コード順になります）
+    """
+    if not isinstance(text, str):
+        text = ""
+    if _collator is not None:
+        return _collator.getSortKey(text)
+    return normalize_text(text)
@@ -0,0 +1,77 @@
+import numpy as np
+
+# 音声そのものの読み込みには soundfile（libsndfile）を使う（無ければ解析系の機能を使わない）
+try:
+    import soundfile
+except (ImportError, OSError):
+    # libsndfile 本体が見つからない場合は OSError になる
+    soundfile = None
+
+
+class DecodeError(Exception):
+    """音声ファイルをデコードできなかったことを表す例外"""
+
+
+def can_decode():
+    """PCM へのデコード（soundfile）が使えるかどうか"""
+    return soundfile is not None
+
+
+def decode_audio(file_path, offset=0.0, duration=None, mono=False):
+    """
+    音声ファイルの offset 秒目から duration 秒分（None なら最後まで）を
+    float32 の PCM として読み込み、(サンプル, サンプリングレート) を返す。
+
+    サンプルは (フレーム数, チャンネル数) の配列で、mono=True の場合は
+    チャンネルを平均した1次元配列です。曲の長さより後ろを指定すると空になります。
+    """
+    if soundfile is None:
+        raise DecodeError("soundfile (libsndfile) is not available")
+    try:
+        with soundfile.SoundFile(file_path) as f:
+            rate = f.samplerate
+            start = int(offset * rate)
+            if start >= f.frames:
+                samples = np.zeros((0, f.channels), dtype=np.float32)
+            else:
+                if start > 0:
+                    f.seek(start)
+                frames = -1 if duration is None else int(duration * rate)
+                samples = f.read(frames, dtype="float32", always_2d=True)
+    except (RuntimeError, OSError) as e:
+        # soundfile.LibsndfileError は RuntimeError の派生
+        raise DecodeError(f"{file_path}: {e}") from e
+
+    if mono:
+        samples = samples.mean(axis=1, dtype=np.float32)
+    return samples, rate
+
+
+def iter_audio_blocks(file_path, block_frames=1 << 18):
+    """
+    音声ファイル全体を先頭から block_frames フレームずつ読み込み、
+    (float32 の (フレーム数, チャンネル数) 配列, サンプリングレート) を順に返す。
+    長い曲でも全体をメモリに載せずに解析するためのものです。
+    """
+    if soundfile is None:
+        raise DecodeError("soundfile (libsndfile) is not available")
+    try:
+        with soundfile.SoundFile(file_path) as f:
+            rate = f.samplerate
+            for block in f.blocks(block_frames, dtype="float32", always_2d=True):
+                yield block, rate
+    except (RuntimeError, OSError) as e:
+        raise DecodeError(f"{file_path}: {e}") from e
+
+
+def open_audio(file_path):
+    """
+    シークしながら少しずつ読むために音声ファイルを開き、soundfile.SoundFile を返す
+    （使い終わったら close() する）。
+    """
+    if soundfile is None:
+        raise DecodeError("soundfile (libsndfile) is not available")
+    try:
+        return soundfile.SoundFile(file_path)
+    except (RuntimeError, OSError) as e:
+        raise DecodeError(f"{file_path}: {e}") from e
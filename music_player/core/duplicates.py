@@ -0,0 +1,191 @@
+import os
+import numpy as np
+from dsp.fingerprint import (
+    FINGERPRINT_VERSION,
+    HASH_BITS,
+    compute_fingerprint,
+    fingerprint_from_bytes,
+    fingerprint_to_bytes,
+)
+from .analysis import iter_analysis
+from .decoder import DecodeError, decode_audio
+
+# フィンガープリントを取る区間（曲頭の無音やフェードインを避けて少し後ろから）
+FINGERPRINT_OFFSET = 10.0
+FINGERPRINT_SECONDS = 10.0
+# MetadataCache の解析結果として保存する時の種類名
+FINGERPRINT_KIND = f"fingerprint:{FINGERPRINT_VERSION}"
+
+
+def fingerprint_file(file_path):
+    """
+    音声ファイルをデコードしてフィンガープリントを返す（デコードできなければ None）。
+    プロセスプールのワーカーから呼ぶため、結果は保存用のバイト列で返します。
+    """
+    try:
+        samples, rate = decode_audio(
+            file_path, FINGERPRINT_OFFSET, FINGERPRINT_SECONDS, mono=True
+        )
+        if len(samples) < rate * FINGERPRINT_SECONDS / 2:
+            # 短い曲は先頭から取る
+            samples, rate = decode_audio(file_path, 0.0, FINGERPRINT_SECONDS, mono=True)
+    except DecodeError as e:
+        print(f"Fingerprint error ({file_path}): {e}")
+        return None
+    return fingerprint_to_bytes(compute_fingerprint(samples, rate))
+
+
+def fingerprint_files(paths, cache=None, max_workers=None, on_progress=None):
+    """
+    複数のファイルのフィンガープリントを {パス: 配列} で返す。
+
+    キャッシュに無いものだけをプロセスプールで並列に計算し、結果をキャッシュへ
+    保存します（詳細は core.analysis.iter_analysis）。プールは音量の測定と共通で、
+    ワーカーは spawn で起動するため GUI のスレッドを抱えたまま fork されません。
+    """
+    paths = list(paths)
+    results = {}
+    if on_progress:
+        on_progress(0, len(paths))
+    done = 0
+    for path, data in iter_analysis(
+        paths, FINGERPRINT_KIND, fingerprint_file, cache, max_workers
+    ):
+        if data is not None:
+            results[path] = fingerprint_from_bytes(data)
+        done += 1
+        if on_progress:
+            on_progress(done, len(paths))
+    return results
+
+
+class DuplicateIndex:
+    """
+    フィンガープリントから同じ録音の曲をまとめる索引。
+
+    全曲のハッシュをハッシュ値で直接引ける転置索引（CSR 形式）にし、各曲のハッシュで
+    一致した曲を引いて「曲 × 時間のずれ」ごとに票を数えます。同じ録音なら同じずれに
+    票が集まるため、曲同士を総当たりで比べずに重複を見つけられます。
+    見つかった組は Union-Find でまとめてクラスタにします。
+    """
+
+    def __init__(self, min_matches=10, min_ratio=0.05, max_postings=100):
+        # 重複とみなす票数（絶対数と、ハッシュ数の少ない方に対する割合）
+        self.min_matches = min_matches
+        self.min_ratio = min_ratio
+        # これより多くの曲に出てくるハッシュは手掛かりにならないので無視する
+        self.max_postings = max_postings
+        self.keys = []
+        self._fingerprints = []
+
+    def add(self, key, fingerprint):
+        """曲を登録する（key はファイルパスなど、クラスタとして返す値）"""
+        self.keys.append(key)
+        self._fingerprints.append(np.asarray(fingerprint, dtype=np.uint32))
+
+    def pairs(self, batch_size=256):
+        """重複と判定した曲の組を、登録番号 (a, b)（a < b）の (N, 2) 配列で返す"""
+        song_count = len(self._fingerprints)
+        sizes = np.array([len(fp) for fp in self._fingerprints], dtype=np.int64)
+        if sizes.sum() == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        hashes = np.concatenate([fp[:, 0] for fp in self._fingerprints])
+        order = np.argsort(hashes, kind="stable")
+        # 大きなライブラリでもメモリに収まるよう、索引は int32 で持つ
+        times = np.concatenate([fp[:, 1] for fp in self._fingerprints]).astype(np.int32)
+        songs = np.repeat(np.arange(song_count, dtype=np.int32), sizes)
+        posting_times, posting_songs = times[order], songs[order]
+        del order
+        # ハッシュ値 h の行は posting_*[offsets[h]:offsets[h + 1]]
+        counts = np.bincount(hashes, minlength=1 << HASH_BITS)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        del hashes
+
+        found = []
+        song_offsets = np.concatenate([[0], np.cumsum(sizes)])
+        for batch in range(0, song_count, batch_size):
+            # 曲をまとめて引き、numpy の呼び出し回数を抑える
+            low = song_offsets[batch]
+            high = song_offsets[min(batch + batch_size, song_count)]
+            query_songs = songs[low:high].astype(np.int64)
+            query_times = times[low:high].astype(np.int64)
+            query_hashes = np.concatenate(
+                [fp[:, 0] for fp in self._fingerprints[batch : batch + batch_size]]
+            )
+            starts = offsets[query_hashes]
+            hits = counts[query_hashes]
+            # 自分しか持たないハッシュと、ありふれたハッシュは飛ばす
+            keep = (hits > 1) & (hits <= self.max_postings)
+            starts, hits = starts[keep], hits[keep]
+            if len(hits) == 0:
+                continue
+            query_songs, query_times = query_songs[keep], query_times[keep]
+
+            # 一致した行をまとめて取り出す（各ハッシュの [start, start + hits) を連結）
+            skip = np.repeat(starts - np.cumsum(hits) + hits, hits)
+            rows = skip + np.arange(hits.sum())
+            a = np.repeat(query_songs, hits)
+            b = posting_songs[rows].astype(np.int64)
+            later = b > a
+            shift = posting_times[rows][later] - np.repeat(query_times, hits)[later]
+            found.append(self._vote(a[later], b[later], shift, song_count, sizes))
+
+        if not found:
+            return np.zeros((0, 2), dtype=np.int64)
+        return np.concatenate(found)
+
+    def _vote(self, a, b, shift, song_count, sizes):
+        if len(a) == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        # (曲の組, ずれ) ごとの票。エンコーダ遅延などで1フレームずれる分は隣と合算する
+        span = 1 << 17
+        votes_key, votes = np.unique(
+            (a * song_count + b) * span + shift + span // 2, return_counts=True
+        )
+        neighbor = np.minimum(
+            np.searchsorted(votes_key, votes_key + 1), len(votes_key) - 1
+        )
+        score = votes + np.where(
+            votes_key[neighbor] == votes_key + 1, votes[neighbor], 0
+        )
+
+        # 組ごとに最も票の集まったずれの票数で判定する
+        pair_keys, first = np.unique(votes_key // span, return_index=True)
+        best = np.maximum.reduceat(score, first)
+        a, b = pair_keys // song_count, pair_keys % song_count
+        needed = np.maximum(
+            self.min_matches, self.min_ratio * np.minimum(sizes[a], sizes[b])
+        )
+        found = best >= needed
+        return np.stack([a[found], b[found]], axis=1)
+
+    def clusters(self):
+        """重複している曲のまとまりを、登録順の key のリストのリストで返す"""
+        parent = list(range(len(self.keys)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for a, b in self.pairs().tolist():
+            a, b = find(a), find(b)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+
+        groups = {}
+        for index in range(len(self.keys)):
+            groups.setdefault(find(index), []).append(self.keys[index])
+        return [group for group in groups.values() if len(group) > 1]
+
+
+def find_duplicates(paths, cache=None, max_workers=None, on_progress=None):
+    """ファイル群から同じ録音のまとまりを探し、パスのリストのリストで返す"""
+    paths = [os.path.abspath(path) for path in paths]
+    fingerprints = fingerprint_files(paths, cache, max_workers, on_progress)
+    index = DuplicateIndex()
+    for path in paths:
+        if path in fingerprints:
+            index.add(path, fingerprints[path])
+    return index.clusters()
@@ -1,5 +1,17 @@
-from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
-from PySide6.QtCore import QObject, Signal
+from functools import partial
+import numpy as np
+from PySide6.QtMultimedia import (
+    QMediaPlayer,
+    QAudioOutput,
+    QAudioFormat,
+    QAudioSink,
+    QMediaDevices,
+    QtAudio,
+)
+from PySide6.QtCore import QIODevice, QObject, Qt, QTimer, Signal
+from dsp.kernels import warm_up_async
+from .decoder import DecodeError
+from .pcm_stream import PcmStream
 
 
 class AudioEngine(QObject):
@@ -13,24 +25,67 @@ class AudioEngine(QObject):
 
     # 新しいシグナル：メディアの状態（終了など）を通知
     media_status_changed = Signal(QMediaPlayer.MediaStatus)
+    # prepare_next() で用意した曲へ切れ目なく移った時（その曲のパス）
+    next_song_started = Signal(str)
 
     def __init__(self):
         super().__init__()
         self.player = QMediaPlayer()
         self.audio_output = QAudioOutput()
         self.player.setAudioOutput(self.audio_output)
+        # 読み込み完了後に移動する再生位置（セッション復元用, ms）
+        self._pending_position = 0
+        # 音量スライダーの値（0-100）と、曲ごとの音量補正（ReplayGain, dB）
+        self._volume = 100
+        self._replay_gain = 0.0
+        # 曲と曲を重ねる長さ [ms]（QMediaPlayer では使わない）
+        self.crossfade_ms = 0
 
         # メディア状態の変化を監視
         self.player.mediaStatusChanged.connect(self.media_status_changed.emit)
+        self.player.mediaStatusChanged.connect(self._apply_pending_position)
 
         # プレイヤーの信号をエンジンのシグナルへリレー
         self.player.positionChanged.connect(self.position_changed.emit)
         self.player.durationChanged.connect(self.duration_changed.emit)
         self.player.playbackStateChanged.connect(self.state_changed.emit)
 
-    def load_song(self, file_path):
+    def load_song(self, file_path, start_position=0, autoplay=True):
+        """
+        曲を読み込んで再生する。
+        start_position [ms] から始め、autoplay=False なら一時停止状態で待機します。
+        """
+        self._pending_position = start_position
         self.player.setSource(file_path)
-        self.player.play()
+        if autoplay:
+            self.player.play()
+
+    def prepare_next(self, file_path, replay_gain=0.0):
+        """
+        次の曲を先に開いて、今の曲の最後から切れ目なく続ける準備をする。
+        QMediaPlayer は曲をつなげないので、常に False（用意しない）を返します。
+        """
+        return False
+
+    def cancel_next(self):
+        """prepare_next() で用意した次の曲を取りやめる"""
+
+    def set_crossfade(self, crossfade_ms):
+        """曲と曲を重ねる長さ [ms] を設定する（0 で重ねない）"""
+        self.crossfade_ms = max(0, int(crossfade_ms))
+
+    def _apply_pending_position(self, status):
+        # 読み込みが終わる前の setPosition は無視されるため、完了を待って移動する
+        if self._pending_position and status in (
+            QMediaPlayer.MediaStatus.LoadedMedia,
+            QMediaPlayer.MediaStatus.BufferedMedia,
+        ):
+            self.player.setPosition(self._pending_position)
+            self._pending_position = 0
+
+    def position(self):
+        """現在の再生位置 [ms]"""
+        return self.player.position()
 
     def toggle_play(self):
         if self.player.playbackState() == QMediaPlayer.PlayingState:
@@ -38,11 +93,469 @@ class AudioEngine(QObject):
         else:
             self.player.play()
 
+    def stop(self):
+        self.player.stop()
+
     def set_position(self, position):
         self.player.setPosition(position)
 
+    def duration(self):
+        """曲の長さ [ms]"""
+        return self.player.duration()
+
+    # ボリューム設定
+    def set_volume(self, value):
+        """0-100の整数を受け取り、0.0-1.0に変換して適用"""
+        self._volume = value
+        self._apply_volume()
+
+    def set_replay_gain(self, gain_db):
+        """曲ごとの音量補正 [dB] を設定する（0 で補正なし）"""
+        self._replay_gain = gain_db
+        self._apply_volume()
+
+    def _apply_volume(self):
+        # 音量補正はスライダーの音量に掛け合わせる
+        # QAudioOutput は 1.0 を超えて増幅できないため、上げる補正は上限で頭打ちになる
+        volume = self._volume / 100.0 * 10 ** (self._replay_gain / 20.0)
+        self.audio_output.setVolume(min(1.0, volume))
+
+
+class PcmAudioEngine(QObject):
+    """
+    曲を自前で PCM にデコードして再生するエンジン。
+    AudioEngine と同じシグナル・操作を持ち、そのまま差し替えて使えます。
+
+    デコードと処理フック（processors）は PcmStream の専用スレッドで行い、
+    リングバッファに貯めた PCM を QAudioSink がプル方式で取り出して鳴らします。
+    音量と音量補正はサンプルに直接掛けるため、上げる補正も頭打ちになりません。
+
+    自前でデコードできるのは libsndfile が読める形式（WAV / FLAC / OGG / MP3 など）
+    だけです。AAC / ALAC の .m4a・.aac など開けない曲は AudioEngine（QMediaPlayer）に
+    任せて鳴らし、その曲の間は処理フック・タップ・ギャップレス再生を使いません。
+    """
+
+    position_changed = Signal(int)
+    duration_changed = Signal(int)
+    state_changed = Signal(QMediaPlayer.PlaybackState)
+    metadata_updated = Signal(dict)
+    media_status_changed = Signal(QMediaPlayer.MediaStatus)
+    next_song_started = Signal(str)
+
+    def __init__(self, device=None, block_frames=4096, buffer_seconds=0.5):
+        super().__init__()
+        # デコードしたサンプルに順に掛ける処理（EQ など）。デコードスレッドで呼ばれる
+        self.processors = []
+        # 出力デバイスへ渡す直前のサンプルを受け取る関数 (サンプル, サンプリングレート)。
+        # GUI スレッドで呼ばれるので、受け取ったサンプルを貯める程度の軽い処理にする
+        self.taps = []
+        self.block_frames = block_frames
+        self.buffer_seconds = buffer_seconds
+        self.device = (
+            device if device is not None else QMediaDevices.defaultAudioOutput()
+        )
+
+        self._stream = None
+        self._source = None
+        self._sink = None
+        # 今の曲を開いた出力形式（出力デバイスが無いと QAudioSink.format() は無効になる）
+        self._format = None
+        # prepare_next() で開いた次の曲のストリームと、その音量補正 [dB]
+        self._next_stream = None
+        self._next_replay_gain = 0.0
+        self._state = QMediaPlayer.PlaybackState.StoppedState
+        # デコードできない曲を代わりに鳴らすエンジン（初めて必要になった時に作る）
+        self._fallback = None
+        self._fallback_active = False
+        # 音量スライダーの値（0-100）と、曲ごとの音量補正（ReplayGain, dB）
+        self._volume = 100
+        self._replay_gain = 0.0
+        self._gain = 1.0
+        # 次の曲と重ねる長さ [ms]（prepare_next() の時点の値を使う）
+        self.crossfade_ms = 0
+
+        # 再生中は一定間隔で再生位置を知らせる
+        self._position_timer = QTimer(self)
+        self._position_timer.setInterval(100)
+        self._position_timer.timeout.connect(self._emit_position)
+
+        # EQ の Numba カーネルは再生とは別のスレッドで先にコンパイルしておく
+        # （済むまでは NumPy の実装で掛ける）
+        warm_up_async()
+
+    def load_song(self, file_path, start_position=0, autoplay=True):
+        """
+        曲を読み込んで再生する。
+        start_position [ms] から始め、autoplay=False なら停止状態で待機します。
+        """
+        self._close_song()
+        self.media_status_changed.emit(QMediaPlayer.MediaStatus.LoadingMedia)
+        try:
+            stream = PcmStream(
+                file_path, self.processors, self.block_frames, self.buffer_seconds
+            )
+        except DecodeError as e:
+            print(f"Playback error ({file_path}): {e}")
+            self._load_fallback(file_path, start_position, autoplay)
+            return
+
+        audio_format = self._output_format(stream)
+        stream.start(
+            start_position, audio_format.sampleRate(), audio_format.channelCount()
+        )
+        self._stream = stream
+        self._format = audio_format
+        self._source = _PcmSource(stream, audio_format, self.taps, self)
+        self._source.gain = self._gain
+        self._source.stream_switched.connect(
+            self._on_stream_switched, Qt.QueuedConnection
+        )
+        self._source.open(QIODevice.ReadOnly)
+        self._sink = QAudioSink(self.device, audio_format, self)
+        self._sink.stateChanged.connect(self._on_sink_state_changed)
+
+        self.duration_changed.emit(stream.duration)
+        self.position_changed.emit(stream.position())
+        self.media_status_changed.emit(QMediaPlayer.MediaStatus.LoadedMedia)
+        if autoplay:
+            self.play()
+
+    def _load_fallback(self, file_path, start_position, autoplay):
+        # 開けない曲は QMediaPlayer で鳴らす（それでも読めなければ InvalidMedia が届く）
+        if self._fallback is None:
+            self._fallback = AudioEngine()
+            self._fallback.audio_output.setDevice(self.device)
+            self._fallback.position_changed.connect(
+                partial(self._relay_fallback, self.position_changed.emit)
+            )
+            self._fallback.duration_changed.connect(
+                partial(self._relay_fallback, self.duration_changed.emit)
+            )
+            self._fallback.media_status_changed.connect(
+                partial(self._relay_fallback, self.media_status_changed.emit)
+            )
+            self._fallback.state_changed.connect(
+                partial(self._relay_fallback, self._set_state)
+            )
+        self._fallback.set_volume(self._volume)
+        self._fallback.set_replay_gain(self._replay_gain)
+        self._fallback_active = True
+        self._fallback.load_song(file_path, start_position, autoplay)
+
+    def _relay_fallback(self, emit, value):
+        # 代わりのエンジンで鳴らしている間だけ、そのシグナルを自分のものとして伝える
+        if self._fallback_active:
+            emit(value)
+
+    def _output_format(self, stream):
+        # 曲の形式（float32）をそのまま出せればそれを、無理なら出力デバイスの標準形式を使う
+        audio_format = QAudioFormat()
+        audio_format.setSampleRate(stream.sample_rate)
+        audio_format.setChannelCount(stream.channels)
+        audio_format.setSampleFormat(QAudioFormat.SampleFormat.Float)
+        preferred = self.device.preferredFormat()
+        if self.device.isFormatSupported(audio_format) or not preferred.isValid():
+            return audio_format
+        audio_format.setSampleFormat(preferred.sampleFormat())
+        if self.device.isFormatSupported(audio_format):
+            return audio_format
+        return preferred
+
+    def prepare_next(self, file_path, replay_gain=0.0):
+        """
+        次の曲を先に開いてデコードを始め、今の曲の最後のサンプルの直後から
+        切れ目なく続ける準備をする。用意できれば True を返します。
+
+        出力形式（サンプリングレート・チャンネル数）が今の曲と違う曲は、
+        出力デバイスを開き直す必要があるので用意しません（False）。
+        その場合は今まで通り EndOfMedia の後に load_song() してください。
+
+        crossfade_ms が 0 より大きければ、今の曲の最後とその長さだけ重ねて
+        クロスフェードします（曲のサンプリングレートが同じ時だけ）。
+        """
+        self.cancel_next()
+        if self._stream is None:
+            return False
+        try:
+            stream = PcmStream(
+                file_path, self.processors, self.block_frames, self.buffer_seconds
+            )
+        except DecodeError as e:
+            print(f"Playback error ({file_path}): {e}")
+            return False
+        audio_format = self._format
+        if self._output_format(stream) != audio_format:
+            stream.close()
+            return False
+        crossfade_frames = 0
+        if stream.sample_rate == self._stream.sample_rate:
+            crossfade_frames = self.crossfade_ms * stream.sample_rate // 1000
+        stream.start(
+            0,
+            audio_format.sampleRate(),
+            audio_format.channelCount(),
+            previous=self._stream,
+            crossfade_frames=crossfade_frames,
+            # 重ねた部分は今の曲の音量補正で鳴るので、差の分だけ次の曲に掛けておく
+            crossfade_gain=10 ** ((replay_gain - self._replay_gain) / 20.0),
+        )
+        self._next_stream = stream
+        self._next_replay_gain = replay_gain
+        self._source.next_stream = stream
+        self._source.next_gain = self._volume_gain(replay_gain)
+        return True
+
+    def set_crossfade(self, crossfade_ms):
+        """曲と曲を重ねる長さ [ms] を設定する（0 で重ねず、切れ目なくつなぐ）"""
+        self.crossfade_ms = max(0, int(crossfade_ms))
+
+    def cancel_next(self):
+        """prepare_next() で用意した次の曲を取りやめる"""
+        if self._next_stream is None:
+            return
+        if self._source.stream is self._next_stream:
+            # 出力側は既に次の曲へ移っているので、取りやめずに切り替えを済ませる
+            self._on_stream_switched()
+            return
+        self._source.next_stream = None
+        self._stream.unchain()
+        self._next_stream.close()
+        self._next_stream = None
+
+    def _on_stream_switched(self):
+        # 出力側が次の曲へ移った（前の曲のデコードは既に終わっている）
+        if self._source is None or self._source.stream is not self._next_stream:
+            return
+        self._stream.close()
+        self._stream = self._next_stream
+        self._next_stream = None
+        self._replay_gain = self._next_replay_gain
+        self._gain = self._source.gain
+        self.duration_changed.emit(self._stream.duration)
+        self._emit_position()
+        self.next_song_started.emit(self._stream.file_path)
+
+    def _close_song(self):
+        self._position_timer.stop()
+        if self._fallback_active:
+            self._fallback.stop()
+            self._fallback_active = False
+        if self._next_stream is not None:
+            # 今の曲のデコードスレッドが次の曲を読まなくなってから閉じる
+            self._stream.unchain()
+            self._next_stream.close()
+            self._next_stream = None
+        if self._sink is not None:
+            self._sink.stateChanged.disconnect(self._on_sink_state_changed)
+            self._sink.stop()
+            self._sink.deleteLater()
+            self._source.close()
+            self._source.deleteLater()
+            self._stream.close()
+        self._sink = self._source = self._stream = self._format = None
+        self._set_state(QMediaPlayer.PlaybackState.StoppedState)
+
+    def play(self):
+        if self._fallback_active:
+            self._fallback.player.play()
+            return
+        if self._stream is None:
+            return
+        if self._stream.at_end:
+            self.cancel_next()
+            self._stream.seek(0)
+        if self._sink.state() == QtAudio.State.SuspendedState:
+            self._sink.resume()
+        elif self._sink.state() != QtAudio.State.ActiveState:
+            self._sink.start(self._source)
+        self._set_state(QMediaPlayer.PlaybackState.PlayingState)
+        self.media_status_changed.emit(QMediaPlayer.MediaStatus.BufferedMedia)
+        self._position_timer.start()
+
+    def pause(self):
+        if self._fallback_active:
+            self._fallback.player.pause()
+            return
+        if self._stream is None:
+            return
+        if self._sink.state() == QtAudio.State.ActiveState:
+            self._sink.suspend()
+        self._position_timer.stop()
+        self._set_state(QMediaPlayer.PlaybackState.PausedState)
+        self._emit_position()
+
+    def stop(self):
+        if self._fallback_active:
+            self._fallback.stop()
+            return
+        if self._stream is None:
+            return
+        self.cancel_next()
+        self._sink.stop()
+        self._stream.seek(0)
+        self._position_timer.stop()
+        self._set_state(QMediaPlayer.PlaybackState.StoppedState)
+        self.position_changed.emit(0)
+
+    def toggle_play(self):
+        if self._fallback_active:
+            self._fallback.toggle_play()
+            return
+        if self._state == QMediaPlayer.PlaybackState.PlayingState:
+            self.pause()
+        else:
+            self.play()
+
+    def set_position(self, position):
+        if self._fallback_active:
+            self._fallback.set_position(position)
+            return
+        if self._stream is None:
+            return
+        # 次の曲へ引き継いだ処理フックの状態を、シークで使い直さないようにする
+        self.cancel_next()
+        self._stream.seek(position)
+        # 出力側に残っている移動前の音を捨てる
+        if self._sink.state() == QtAudio.State.ActiveState:
+            self._sink.stop()
+            self._sink.start(self._source)
+        elif self._sink.state() != QtAudio.State.StoppedState:
+            self._sink.stop()
+        self._emit_position()
+
+    def position(self):
+        """現在の再生位置 [ms]（出力側でまだ鳴っていない分は差し引く）"""
+        if self._fallback_active:
+            return self._fallback.position()
+        if self._stream is None:
+            return 0
+        latency = 0
+        if self._sink.state() != QtAudio.State.StoppedState:
+            buffered = self._sink.bufferSize() - self._sink.bytesFree()
+            latency = buffered // self._format.bytesPerFrame()
+        return self._stream.position(latency)
+
+    def duration(self):
+        """曲の長さ [ms]"""
+        if self._fallback_active:
+            return self._fallback.duration()
+        return self._stream.duration if self._stream is not None else 0
+
+    def _emit_position(self):
+        self.position_changed.emit(self.position())
+
+    def _set_state(self, state):
+        if state != self._state:
+            self._state = state
+            self.state_changed.emit(state)
+
+    def _on_sink_state_changed(self, state):
+        # 最後まで鳴らし終えると出力が待機状態になる
+        if state == QtAudio.State.IdleState and self._stream.at_end:
+            # シンクのシグナルの中で曲を切り替えないよう、後で終了を知らせる
+            QTimer.singleShot(0, self._finish)
+
+    def _finish(self):
+        if self._stream is None or not self._stream.at_end:
+            return
+        self._sink.stop()
+        self._position_timer.stop()
+        self._set_state(QMediaPlayer.PlaybackState.StoppedState)
+        self.position_changed.emit(self._stream.duration)
+        self.media_status_changed.emit(QMediaPlayer.MediaStatus.EndOfMedia)
+
     # ボリューム設定
     def set_volume(self, value):
         """0-100の整数を受け取り、0.0-1.0に変換して適用"""
-        # AudioEngine内で初期化済みのaudio_outputを使用
-        self.audio_output.setVolume(value / 100.0)
+        self._volume = value
+        self._apply_volume()
+
+    def set_replay_gain(self, gain_db):
+        """曲ごとの音量補正 [dB] を設定する（0 で補正なし）"""
+        self._replay_gain = gain_db
+        self._apply_volume()
+
+    def _apply_volume(self):
+        self._gain = self._volume_gain(self._replay_gain)
+        if self._fallback is not None:
+            self._fallback.set_volume(self._volume)
+            self._fallback.set_replay_gain(self._replay_gain)
+        if self._source is not None:
+            self._source.gain = self._gain
+            self._source.next_gain = self._volume_gain(self._next_replay_gain)
+
+    def _volume_gain(self, replay_gain):
+        return self._volume / 100.0 * 10 ** (replay_gain / 20.0)
+
+
+class _PcmSource(QIODevice):
+    """
+    QAudioSink がプル方式で読みに来た時に、ストリームの PCM を出力形式で渡すデバイス。
+    next_stream があれば、今の曲を読み切った同じ読み出しの中で次の曲へ移ります。
+    """
+
+    # next_stream へ移った時
+    stream_switched = Signal()
+
+    def __init__(self, stream, audio_format, taps=(), parent=None):
+        super().__init__(parent)
+        self.stream = stream
+        self.taps = taps
+        # サンプルに掛ける倍率（音量 × 音量補正）
+        self.gain = 1.0
+        # 次の曲と、その曲に掛ける倍率
+        self.next_stream = None
+        self.next_gain = 1.0
+        self._format = audio_format
+        self._bytes_per_frame = audio_format.bytesPerFrame()
+
+    def isSequential(self):
+        return True
+
+    def bytesAvailable(self):
+        return (
+            self.stream.available() * self._bytes_per_frame + super().bytesAvailable()
+        )
+
+    def readData(self, maxlen):
+        frames = maxlen // self._bytes_per_frame
+        samples = self.stream.read(frames)
+        gain = self.gain
+        if (
+            len(samples) < frames
+            and self.next_stream is not None
+            and self.stream.at_end
+        ):
+            # 前の曲の最後のサンプルのすぐ後ろに、次の曲の先頭を並べる
+            split = len(samples)
+            self.stream, self.next_stream = self.next_stream, None
+            samples = np.concatenate([samples, self.stream.read(frames - split)])
+            gain = np.full((len(samples), 1), self.next_gain, dtype=np.float32)
+            gain[:split] = self.gain
+            self.gain = self.next_gain
+            self.stream_switched.emit()
+        if len(samples) == 0:
+            if self.stream.at_end:
+                return b""
+            # デコードが間に合わない時は短い無音でつなぐ（再生位置は進めない）
+            silence = min(frames, self.stream.output_rate // 100)
+            samples = np.zeros((silence, self.stream.output_channels), np.float32)
+        else:
+            for tap in tuple(self.taps):
+                tap(samples, self.stream.output_rate)
+        return _encode_samples(samples * gain, self._format.sampleFormat())
+
+    def writeData(self, data):
+        return -1
+
+
+def _encode_samples(samples, sample_format):
+    # float のサンプルを出力形式のバイト列にする
+    samples = np.clip(samples, -1.0, 1.0)
+    if sample_format == QAudioFormat.SampleFormat.Int16:
+        return (samples * 32767.0).astype("<i2").tobytes()
+    if sample_format == QAudioFormat.SampleFormat.Int32:
+        return (samples * 2147483647.0).astype("<i4").tobytes()
+    if sample_format == QAudioFormat.SampleFormat.UInt8:
+        return (samples * 127.0 + 128.0).astype(np.uint8).tobytes()
+    return samples.astype("<f4").tobytes()
@@ -0,0 +1,145 @@
+import struct
+from mutagen import File as MutagenFile, MutagenError
+
+# mpg123 / libmad などの MP3 デコーダ自身の遅延 [サンプル]
+MP3_DECODER_DELAY = 529
+# MPEG のバージョンごとの 1 フレームのサンプル数（Layer III）
+_SAMPLES_PER_FRAME = {1: 1152, 2: 576, 25: 576}
+
+
+def read_gapless_info(file_path):
+    """
+    エンコーダが曲の前後に足した無音（エンコーダディレイ・パディング）を読み、
+    (先頭の余分 [フレーム], 末尾の余分 [フレーム], 余分を含めたデコード後の長さ) を返す。
+
+    iTunes の iTunSMPB タグを優先し、無ければ MP3 の LAME ヘッダを読みます。
+    どちらも無ければ None です。
+    """
+    info = _read_itunsmpb(file_path)
+    if info is None and file_path.lower().endswith(".mp3"):
+        info = _read_lame_header(file_path)
+    return info
+
+
+def gapless_range(file_path, decoded_frames):
+    """
+    デコーダが返す decoded_frames フレームのうち、本来の音がある範囲
+    (開始フレーム, 終了フレーム) を返す。
+
+    デコーダ（libsndfile の mpg123 など）が既に余分を取り除いている場合は
+    長さが一致しないので、何も削りません。
+    """
+    info = read_gapless_info(file_path)
+    if info is None:
+        return 0, decoded_frames
+    delay, padding, untrimmed = info
+    if decoded_frames != untrimmed or delay + padding >= decoded_frames:
+        return 0, decoded_frames
+    return delay, decoded_frames - padding
+
+
+def parse_itunsmpb(text):
+    """
+    iTunSMPB の値（" 00000000 00000840 000001CA 00000000001E8A76 ..."）を
+    (先頭の余分, 末尾の余分, 余分を含めた長さ) にする（読めなければ None）
+    """
+    try:
+        fields = [int(field, 16) for field in text.split()[:4]]
+    except ValueError:
+        return None
+    if len(fields) < 4:
+        return None
+    _, delay, padding, total = fields
+    if total <= 0:
+        return None
+    return delay, padding, delay + total + padding
+
+
+def _read_itunsmpb(file_path):
+    try:
+        audio = MutagenFile(file_path)
+    except (MutagenError, OSError) as e:
+        print(f"Gapless info error ({file_path}): {e}")
+        return None
+    tags = getattr(audio, "tags", None)
+    if not tags:
+        return None
+    # ID3（MP3）はコメントフレーム、MP4 はフリーフォームのアトムに入っている
+    # （.m4a は今の libsndfile では開けず QMediaPlayer で鳴らすため、MP4 の分は
+    # libsndfile が MP4 に対応した時のためのもの）
+    if hasattr(tags, "getall"):
+        for frame in tags.getall("COMM"):
+            if frame.desc == "iTunSMPB" and frame.text:
+                return parse_itunsmpb(str(frame.text[0]))
+        return None
+    values = tags.get("----:com.apple.iTunes:iTunSMPB")
+    if values:
+        value = values[0]
+        if isinstance(value, bytes):
+            value = value.decode("latin-1")
+        return parse_itunsmpb(str(value))
+    return None
+
+
+def _read_lame_header(file_path):
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(10)
+            start = 0
+            # ID3v2 タグの後ろから最初のフレームが始まる
+            if len(head) == 10 and head[:3] == b"ID3":
+                size = 0
+                for byte in head[6:10]:
+                    size = (size << 7) | (byte & 0x7F)
+                start = 10 + size + (10 if head[5] & 0x10 else 0)
+            f.seek(start)
+            data = f.read(4096)
+    except OSError as e:
+        print(f"Gapless info error ({file_path}): {e}")
+        return None
+    return parse_lame_frame(data)
+
+
+def parse_lame_frame(data):
+    """
+    MP3 の最初のフレーム（Xing / Info タグを含むもの）から LAME のエンコーダ
+    ディレイ・パディングを読み、read_gapless_info と同じ形で返す。
+    """
+    if len(data) < 4 or data[0] != 0xFF or data[1] & 0xE0 != 0xE0:
+        return None
+    version = {3: 1, 2: 2, 0: 25}.get((data[1] >> 3) & 0x03)
+    layer = (data[1] >> 1) & 0x03
+    # Layer III 以外、予約済みのバージョンは扱わない
+    if version is None or layer != 1:
+        return None
+    mono = (data[3] >> 6) & 0x03 == 3
+    if version == 1:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+
+    tag = 4 + side_info
+    if data[tag : tag + 4] not in (b"Xing", b"Info"):
+        return None
+    (flags,) = struct.unpack(">I", data[tag + 4 : tag + 8])
+    offset = tag + 8
+    frames = None
+    if flags & 0x1:
+        (frames,) = struct.unpack(">I", data[offset : offset + 4])
+        offset += 4
+    # バイト数・シーク用の目次・品質の欄があれば飛ばす
+    offset += (4 if flags & 0x2 else 0) + (100 if flags & 0x4 else 0)
+    offset += 4 if flags & 0x8 else 0
+    if frames is None or data[offset : offset + 4] != b"LAME":
+        return None
+
+    # LAME 拡張の 21 バイト目から、ディレイ 12 ビット・パディング 12 ビット
+    packed = data[offset + 21 : offset + 24]
+    if len(packed) < 3:
+        return None
+    encoder_delay = (packed[0] << 4) | (packed[1] >> 4)
+    encoder_padding = ((packed[1] & 0x0F) << 8) | packed[2]
+    # デコーダ自身の遅延の分だけ、音は後ろにずれて出てくる
+    delay = encoder_delay + MP3_DECODER_DELAY
+    padding = max(0, encoder_padding - MP3_DECODER_DELAY)
+    return delay, padding, frames * _SAMPLES_PER_FRAME[version]
@@ -0,0 +1,239 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QObject, Signal
+from .metadata import extract_metadata
+
+
+class MetadataImporter(QObject):
+    """
+    大量ファイルのメタデータ抽出をバックグラウンドで並列実行するクラス。
+
+    抽出はスレッドプールに分散し、結果は投入順を保ったまま小さなバッチに
+    まとめて GUI スレッドへ届けます。ジョブ内で最初のバッチは有効な曲が
+    1件見つかった時点ですぐに送るため、全件の解析を待たずに再生を開始できます。
+    scanner を渡すと、ジョブに含まれるフォルダの走査もワーカースレッドで行います。
+    走査の結果は、そのジョブの曲を最後まで取り込んでから scanner のジャーナルに
+    記録します（キャンセルした場合、次の走査でも同じ差分を読み直す）。
+    """
+
+    # (メタデータのリスト, ジョブ内で最初のバッチか)
+    batch_ready = Signal(list, bool)
+    # (処理済みファイル数, 総ファイル数)。待ち行列の全ジョブを通した値で、
+    # 取り込みが終わるまでは後から追加したジョブの分も総数に足していく
+    progress_changed = Signal(int, int)
+    # 待ち行列のジョブがすべて終わった（またはキャンセルされた）
+    import_finished = Signal()
+    # フォルダを走査した（ScanResult）。そのフォルダの曲のバッチより先に届く
+    folder_scanned = Signal(object)
+
+    # ワーカースレッドからの内部通知（ジョブIDを付けて古い結果を捨てる）
+    _batch = Signal(int, list, bool)
+    _progress = Signal(int, int, int, int)
+    _idle = Signal(int, int)
+    _scanned = Signal(int, object)
+
+    def __init__(
+        self,
+        loader=extract_metadata,
+        max_workers=None,
+        batch_size=200,
+        flush_interval=0.1,
+        scanner=None,
+        cache=None,
+    ):
+        super().__init__()
+        self.loader = loader
+        # フォルダを走査する LibraryScanner（None ならフォルダは扱わない）
+        self.scanner = scanner
+        # 更新・削除されたファイルのエントリを破棄する MetadataCache
+        self.cache = cache
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._jobs = queue.Queue()
+        self._job_id = 0
+        self._job_seq = 0
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._thread = None
+        self._busy = False
+        # 取り込み中のジョブごとの [処理済み, 総数]（GUI スレッドだけで扱う）
+        self._job_progress = {}
+
+        self._batch.connect(self._on_batch)
+        self._progress.connect(self._on_progress)
+        self._idle.connect(self._on_idle)
+        self._scanned.connect(self._on_scanned)
+
+    def import_files(self, files, known_paths=None):
+        """
+        ファイル群の抽出を待ち行列に追加する（実行中のジョブの後に処理される）。
+        フォルダはワーカースレッドで走査し、known_paths（登録済みのパスの集合）に
+        無い曲と、前回の走査から更新された曲を取り込みます。
+        """
+        files = list(files)
+        if not files:
+            return
+        with self._lock:
+            self._busy = True
+            self._job_seq += 1
+            seq = self._job_seq
+            self._jobs.put((self._job_id, seq, files, known_paths))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        # フォルダの曲数は走査するまで分からないので、それまでは1件と数える
+        self._job_progress[seq] = [0, len(files)]
+        self._emit_progress()
+
+    def cancel(self):
+        """実行中のジョブと待ち行列をすべて破棄する"""
+        with self._lock:
+            # 世代を進めて、既に送信済みの結果も GUI 側で無視させる
+            self._job_id += 1
+            self._cancel_event.set()
+            while not self._jobs.empty():
+                self._jobs.get_nowait()
+        self._job_progress.clear()
+        if self._busy:
+            self._busy = False
+            self.import_finished.emit()
+
+    def is_busy(self):
+        return self._busy
+
+    def _run(self):
+        last_seq = 0
+        while True:
+            with self._lock:
+                try:
+                    job_id, last_seq, files, known = self._jobs.get_nowait()
+                except queue.Empty:
+                    self._thread = None
+                    idle_id = self._job_id
+                    break
+                self._cancel_event.clear()
+            results = []
+            files = self._expand(job_id, files, known or (), results)
+            self._process(job_id, last_seq, files)
+            # キャンセルされたジョブの走査結果は記録せず、次の走査で同じ差分を返させる
+            with self._lock:
+                completed = job_id == self._job_id
+            if completed:
+                for result in results:
+                    self.scanner.commit(result)
+        self._idle.emit(idle_id, last_seq)
+
+    def _expand(self, job_id, files, known, results):
+        """フォルダを走査して、取り込むファイルの並びに置き換える（走査の結果は results へ）"""
+        if self.scanner is None:
+            return files
+        expanded = []
+        for path in files:
+            if not os.path.isdir(path):
+                expanded.append(path)
+                continue
+            if self._cancel_event.is_set():
+                break
+            result = self.scanner.scan(path, commit=False)
+            results.append(result)
+            # 更新されたファイルは古いエントリを捨ててから読み直す
+            if self.cache is not None:
+                self.cache.invalidate(result.changed + result.removed)
+            self._scanned.emit(job_id, result)
+            changed = set(result.changed)
+            expanded.extend(
+                path for path in result.files if path not in known or path in changed
+            )
+        return expanded
+
+    def _process(self, job_id, seq, files):
+        total = len(files)
+        done = 0
+        batch = []
+        first = True
+        last_flush = time.monotonic()
+        cancelled = self._cancel_event.is_set
+
+        workers = self.max_workers or min(32, (os.cpu_count() or 1) + 4)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # 同時に投入するファイル数を制限し、メモリを一定に保つ
+            window = workers * 4
+            remaining = iter(files)
+            in_flight = deque()
+            for f in remaining:
+                in_flight.append(pool.submit(self._load, f))
+                if len(in_flight) >= window:
+                    break
+
+            while in_flight:
+                if cancelled():
+                    for future in in_flight:
+                        future.cancel()
+                    return
+
+                metadata = in_flight.popleft().result()
+                next_file = next(remaining, None)
+                if next_file is not None:
+                    in_flight.append(pool.submit(self._load, next_file))
+
+                done += 1
+                if metadata:
+                    batch.append(metadata)
+
+                now = time.monotonic()
+                if batch and (
+                    first
+                    or len(batch) >= self.batch_size
+                    or now - last_flush >= self.flush_interval
+                ):
+                    self._batch.emit(job_id, batch, first)
+                    self._progress.emit(job_id, seq, done, total)
+                    batch = []
+                    first = False
+                    last_flush = now
+
+        if batch:
+            self._batch.emit(job_id, batch, first)
+        self._progress.emit(job_id, seq, done, total)
+
+    def _load(self, file_path):
+        if self._cancel_event.is_set():
+            return None
+        try:
+            return self.loader(file_path)
+        except Exception as e:
+            print(f"Import error ({file_path}): {e}")
+            return None
+
+    # --- 以下は GUI スレッドで実行される ---
+    def _on_batch(self, job_id, batch, first):
+        if job_id == self._job_id:
+            self.batch_ready.emit(batch, first)
+
+    def _on_progress(self, job_id, seq, done, total):
+        if job_id == self._job_id and seq in self._job_progress:
+            self._job_progress[seq] = [done, total]
+            self._emit_progress()
+
+    def _emit_progress(self):
+        self.progress_changed.emit(
+            sum(done for done, _ in self._job_progress.values()),
+            sum(total for _, total in self._job_progress.values()),
+        )
+
+    def _on_scanned(self, job_id, result):
+        if job_id == self._job_id:
+            self.folder_scanned.emit(result)
+
+    def _on_idle(self, job_id, seq):
+        # 終了通知が届く前に新しいジョブが追加されていれば無視する
+        if job_id == self._job_id and seq == self._job_seq and self._busy:
+            self._busy = False
+            self._job_progress.clear()
+            self.import_finished.emit()
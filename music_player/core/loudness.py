@@ -0,0 +1,195 @@
+import math
+import os
+import threading
+import time
+from PySide6.QtCore import QObject, Signal
+from dsp.loudness import (
+    LOUDNESS_VERSION,
+    LoudnessMeter,
+    histogram_loudness,
+    loudness_from_bytes,
+    loudness_to_bytes,
+)
+from .analysis import iter_analysis
+from .decoder import DecodeError, iter_audio_blocks
+
+# MetadataCache の解析結果として保存する時の種類名
+LOUDNESS_KIND = f"loudness:{LOUDNESS_VERSION}"
+# ReplayGain 2.0 の基準ラウドネス [LUFS]
+REFERENCE_LOUDNESS = -18.0
+
+
+def measure_file(file_path):
+    """
+    音声ファイル全体のラウドネスと true-peak を測り、保存用のバイト列で返す。
+    デコードできなければ空のバイト列を返し、失敗したこと自体をキャッシュさせます
+    （ファイルが変わるまで測り直さない）。プロセスプールのワーカーから呼ばれます。
+    """
+    meter = None
+    try:
+        blocks = iter_audio_blocks(file_path)
+        for block, rate in blocks:
+            if meter is None:
+                meter = LoudnessMeter(rate, block.shape[1])
+            meter.process(block)
+    except DecodeError as e:
+        print(f"Loudness error ({file_path}): {e}")
+        return b""
+    if meter is None:
+        return b""
+    return loudness_to_bytes(
+        meter.integrated_loudness(), meter.true_peak(), meter.histogram()
+    )
+
+
+def replay_gain(loudness, peak):
+    """
+    基準ラウドネスに揃えるためのゲイン [dB] を返す。
+    補正後の true-peak が 0 dBTP を超えない範囲に抑え、無音の曲は 0 にします。
+    """
+    if not math.isfinite(loudness):
+        return 0.0
+    gain = REFERENCE_LOUDNESS - loudness
+    if peak > 0:
+        gain = min(gain, -20.0 * math.log10(peak))
+    return gain
+
+
+def scan_replay_gain(
+    items, cache=None, max_workers=None, on_progress=None, is_cancelled=None
+):
+    """
+    (パス, アルバムのキー) の組ごとにラウドネスを測り、
+    {パス: (トラックゲイン, アルバムゲイン)} [dB] を返す。
+
+    アルバムのラウドネスは、同じキーの曲のブロックをまとめてゲート処理した値です
+    （キーが None の曲はアルバムゲイン = トラックゲイン）。デコードできなかった曲は None です。
+    測定結果は失敗も含めてキャッシュに保存し、2回目以降は読み込むだけで済みます。
+    is_cancelled() が真になったら打ち切って None を返します。
+    """
+    album_of = dict(items)
+    total = len(album_of)
+    track_gains = {}
+    failed = []
+    # アルバムのキー -> [ヒストグラムの合計, true-peak の最大]
+    albums = {}
+    done = 0
+    results = iter_analysis(
+        list(album_of), LOUDNESS_KIND, measure_file, cache, max_workers
+    )
+    try:
+        for path, data in results:
+            if is_cancelled and is_cancelled():
+                return None
+            done += 1
+            if on_progress:
+                on_progress(done, total)
+            if not data:
+                failed.append(path)
+                continue
+            loudness, peak, histogram = loudness_from_bytes(data)
+            track_gains[path] = replay_gain(loudness, peak)
+
+            key = album_of[path]
+            if key is None:
+                continue
+            album = albums.get(key)
+            if album is None:
+                albums[key] = [histogram.astype("int64"), peak]
+            else:
+                album[0] += histogram
+                album[1] = max(album[1], peak)
+    finally:
+        results.close()
+
+    album_gains = {
+        key: replay_gain(histogram_loudness(histogram), peak)
+        for key, (histogram, peak) in albums.items()
+    }
+    gains = {
+        path: (gain, album_gains.get(album_of[path], gain))
+        for path, gain in track_gains.items()
+    }
+    gains.update(dict.fromkeys(failed))
+    return gains
+
+
+class LoudnessScanner(QObject):
+    """
+    ライブラリのラウドネス解析をバックグラウンドで実行するクラス。
+
+    解析自体は scan_replay_gain がプロセスプールで全コアに分散して行い、
+    このクラスは専用スレッドで待ち受けて、結果を GUI スレッドへ届けます。
+    """
+
+    # {パス: (トラックゲイン, アルバムゲイン)}（デコードできなかった曲は None）
+    gains_ready = Signal(dict)
+    # (処理済みの曲数, 総曲数)
+    progress_changed = Signal(int, int)
+
+    # ワーカースレッドからの内部通知（ジョブIDを付けて古い結果を捨てる）
+    _gains = Signal(int, dict)
+    _progress = Signal(int, int, int)
+
+    def __init__(self, cache=None, max_workers=None, progress_interval=0.2):
+        super().__init__()
+        self.cache = cache
+        self.max_workers = max_workers
+        self.progress_interval = progress_interval
+        self._job_id = 0
+        self._lock = threading.Lock()
+
+        self._gains.connect(self._on_gains)
+        self._progress.connect(self._on_progress)
+
+    def scan(self, items):
+        """
+        (パス, アルバムのキー) の組を解析する。
+        実行中の解析があれば打ち切り、新しい解析に置き換えます。
+        """
+        with self._lock:
+            self._job_id += 1
+            job_id = self._job_id
+        threading.Thread(
+            target=self._run, args=(job_id, list(items)), daemon=True
+        ).start()
+
+    def cancel(self):
+        """実行中の解析を打ち切る"""
+        with self._lock:
+            self._job_id += 1
+
+    def _run(self, job_id, items):
+        # 存在しないファイルはプロセスを起こす前に除く
+        items = [(path, album) for path, album in items if os.path.isfile(path)]
+        last_report = 0.0
+
+        def report(done, total):
+            nonlocal last_report
+            now = time.monotonic()
+            if done == total or now - last_report >= self.progress_interval:
+                last_report = now
+                self._progress.emit(job_id, done, total)
+
+        try:
+            gains = scan_replay_gain(
+                items,
+                self.cache,
+                self.max_workers,
+                on_progress=report,
+                is_cancelled=lambda: job_id != self._job_id,
+            )
+        except Exception as e:
+            print(f"Loudness scan error: {e}")
+            return
+        if gains is not None:
+            self._gains.emit(job_id, gains)
+
+    # --- 以下は GUI スレッドで実行される ---
+    def _on_gains(self, job_id, gains):
+        if job_id == self._job_id:
+            self.gains_ready.emit(gains)
+
+    def _on_progress(self, job_id, done, total):
+        if job_id == self._job_id:
+            self.progress_changed.emit(done, total)
@@ -0,0 +1,53 @@
+import os
+
+# 拡張子で判別するプレイリストファイル
+PLAYLIST_EXTENSIONS = (".m3u8", ".m3u")
+
+
+def is_playlist_file(path):
+    return path.lower().endswith(PLAYLIST_EXTENSIONS)
+
+
+def read_m3u(path):
+    """
+    M3U / M3U8 プレイリストから音声ファイルのパスを順に返す。
+    相対パスはプレイリストのあるフォルダを基準に解決し、URL は読み飛ばします。
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    # .m3u8 は UTF-8。.m3u も最近は UTF-8 が大半なので同じく読む（BOM は除く）
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        lines = f.read().splitlines()
+
+    paths = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "://" in line and not line.lower().startswith("file://"):
+            continue
+        if line.lower().startswith("file://"):
+            line = line[len("file://") :]
+        if not os.path.isabs(line):
+            line = os.path.join(base_dir, line)
+        paths.append(os.path.normpath(line))
+    return paths
+
+
+def write_m3u(path, songs):
+    """曲のメタデータ群を拡張 M3U（UTF-8）として書き出す"""
+    lines = ["#EXTM3U"]
+    for metadata in songs:
+        file_path = metadata.get("file_path")
+        if not file_path:
+            continue
+        duration = metadata.get("duration")
+        if not isinstance(duration, (int, float)):
+            duration = -1
+        title = metadata.get("title") or os.path.basename(file_path)
+        artist = metadata.get("artist")
+        label = f"{artist} - {title}" if artist else title
+        lines.append(f"#EXTINF:{int(duration)},{label}")
+        lines.append(file_path)
+
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write("\n".join(lines) + "\n")
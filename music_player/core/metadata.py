@@ -1,57 +1,316 @@
+import base64
 import os
 from mutagen import File as MutagenFile
+from mutagen.aac import AAC
+from mutagen.flac import Picture, StreamInfo as FLACStreamInfo, VCFLACDict
+from mutagen.id3 import ID3, ID3NoHeaderError
+from mutagen.mp3 import MPEGInfo
+from .art_store import ArtStore
 
+# extract_metadata が透過的に参照する永続キャッシュ（未設定なら常に Mutagen で解析）
+_metadata_cache = None
 
-def extract_metadata(file_path):
+# 重複排除されたアルバムアートの保存先（画像が必要になった時だけ読み込む）
+_art_store = ArtStore(loader=lambda path: extract_album_art(path))
+
+
+def set_metadata_cache(cache):
+    """extract_metadata が使用する MetadataCache を設定する（None で無効化）"""
+    global _metadata_cache
+    _metadata_cache = cache
+
+
+def get_metadata_cache():
+    """現在設定されている MetadataCache を返す"""
+    return _metadata_cache
+
+
+def set_art_store(store):
+    """アルバムアートの保存先となる ArtStore を差し替える"""
+    global _art_store
+    _art_store = store
+
+
+def get_art_store():
+    """現在使用している ArtStore を返す"""
+    return _art_store
+
+
+def extract_metadata(file_path, include_art=True):
     """
     指定された音声ファイルからメタデータを抽出する。
+    キャッシュが設定されていれば、未変更のファイルは Mutagen を介さずに返します。
+
+    include_art=False の場合はタグと再生時間だけを読む高速モードになり、
+    埋め込み画像は読み込みません（結果に "art_key" キーが含まれません）。
+    画像は load_album_art で表示する曲の分だけ後から取得します。
     """
+    cache = _metadata_cache
+    if cache is not None:
+        # 画像込みの要求には、画像を走査済みのエントリだけを使う
+        info = cache.get(file_path, required_keys=("art_key",) if include_art else ())
+        if info is not None:
+            return info
+
+    info = _read_metadata(file_path, include_art)
+    if info is not None and cache is not None:
+        cache.put(file_path, info)
+    return info
+
+
+def _read_metadata(file_path, include_art=True):
+    """ファイルを開いてメタデータを解析する"""
     try:
-        audio = MutagenFile(file_path)
+        if not include_art:
+            try:
+                info = _read_tags_only(file_path)
+            except Exception:
+                # 自前の解析で読めないファイルも、Mutagen でなら読めることがある
+                info = None
+            if info is not None:
+                return info
+
+        audio = _open_mutagen(file_path)
         if audio is None:
             return None
 
-        # デフォルト値（ファイル名）
-        info = {
-            "file_path": file_path,
-            "title": os.path.basename(file_path),
-            "artist": "Unknown Artist",
-            "album": "Unknown Album",
-            "composer": "Unknown Composer",
-            "duration": int(audio.info.length),
-            "album_art": None,
-        }
+        info = _default_info(file_path, audio.info.length)
 
         # タグ情報の解析
         if hasattr(audio, "tags") and audio.tags is not None:
-            tags = audio.tags
-
-            # MP3 (ID3) の場合
-            if file_path.lower().endswith(".mp3"):
-                info["title"] = tags.get("TIT2", [info["title"]])[0]
-                info["artist"] = tags.get("TPE1", [info["artist"]])[0]
-                info["album"] = tags.get("TALB", [info["album"]])[0]
-                # APICタグ (Attached Picture) から取得
-                art = tags.getall("APIC")
-                if art:
-                    info["album_art"] = art[0].data
-
-            # FLAC の場合
-            elif file_path.lower().endswith(".flac"):
-                info["title"] = tags.get("title", [info["title"]])[0]
-                info["artist"] = tags.get("artist", [info["artist"]])[0]
-                info["album"] = tags.get("album", [info["album"]])[0]
-                # pictures属性から取得
-                if getattr(audio, "pictures", None):
-                    info["album_art"] = audio.pictures[0].data
-
-            # その他 (Vorbis等)
-            else:
-                info["title"] = tags.get("title", [info["title"]])[0]
-                info["artist"] = tags.get("artist", [info["artist"]])[0]
+            _apply_tags(info, audio.tags, _TAG_KEYS[_tag_format(file_path)])
+
+        if include_art:
+            info["art_key"] = None
+            art = _find_album_art(audio, file_path)
+            if art:
+                info["art_key"] = _art_store.put(art, source_path=file_path)
 
         return info
 
     except Exception as e:
         print(f"Metadata extraction error ({os.path.basename(file_path)}): {e}")
         return None
+
+
+def _open_mutagen(file_path):
+    """Mutagen でファイルを開く（認識できない形式なら None）"""
+    if os.path.splitext(file_path)[1].lower() == ".aac":
+        # 生の ADTS は ID3 が付いていると MP3 と判定されて開けず、AAC クラスは
+        # タグを読まないので、ID3 は別に読んで付け足す
+        audio = AAC(file_path)
+        try:
+            audio.tags = ID3(file_path)
+        except ID3NoHeaderError:
+            pass
+        return audio
+    return MutagenFile(file_path)
+
+
+def _default_info(file_path, length):
+    """デフォルト値（ファイル名）で埋めたメタデータ"""
+    return {
+        "file_path": file_path,
+        "title": os.path.basename(file_path),
+        "artist": "Unknown Artist",
+        "album": "Unknown Album",
+        "composer": "Unknown Composer",
+        "duration": int(length),
+    }
+
+
+# フォーマットごとのタグ名（共通キー -> タグ名）
+_TAG_KEYS = {
+    "id3": {"title": "TIT2", "artist": "TPE1", "album": "TALB", "composer": "TCOM"},
+    "mp4": {
+        "title": "\xa9nam",
+        "artist": "\xa9ART",
+        "album": "\xa9alb",
+        "composer": "\xa9wrt",
+    },
+    # FLAC / Ogg Vorbis / Opus の Vorbis コメント
+    "vorbis": {
+        "title": "title",
+        "artist": "artist",
+        "album": "album",
+        "composer": "composer",
+    },
+}
+
+
+def _tag_format(file_path):
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in (".mp3", ".aac", ".wav", ".aiff", ".aif"):
+        return "id3"
+    if ext in (".m4a", ".mp4", ".alac"):
+        return "mp4"
+    return "vorbis"
+
+
+def _apply_tags(info, tags, keys):
+    """tags から各項目を読み取り、値があるものだけ info を上書きする"""
+    for field, tag_name in keys.items():
+        value = tags.get(tag_name, [info[field]])[0]
+        if value:
+            info[field] = value
+
+
+def _find_album_art(audio, file_path):
+    """Mutagen で開いたオブジェクトから埋め込み画像のバイト列を取り出す"""
+    art = None
+    tags = getattr(audio, "tags", None)
+    tag_format = _tag_format(file_path)
+
+    # MP3 (ID3) は APICタグ (Attached Picture) から取得
+    if tag_format == "id3":
+        if tags is not None:
+            frames = tags.getall("APIC")
+            if frames:
+                art = frames[0].data
+
+    # M4A は covr アトムから取得
+    elif tag_format == "mp4":
+        if tags is not None:
+            covers = tags.get("covr")
+            if covers:
+                art = bytes(covers[0])
+
+    # FLAC は pictures属性から取得
+    elif getattr(audio, "pictures", None):
+        art = audio.pictures[0].data
+
+    # Ogg Vorbis / Opus は Base64 化された METADATA_BLOCK_PICTURE から取得
+    elif tags is not None:
+        pictures = tags.get("metadata_block_picture")
+        if pictures and isinstance(pictures[0], str):
+            art = Picture(base64.b64decode(pictures[0])).data
+
+    # モック等でバイト列以外が入っている場合は画像なしとして扱う
+    return art if isinstance(art, (bytes, bytearray)) else None
+
+
+def _read_tags_only(file_path):
+    """
+    画像を読まずにタグと再生時間だけを取得する。
+    FLAC と ID3v2.3/2.4 の MP3 はメタデータブロック（フレーム）を自前で辿り、
+    画像などの不要な部分はシークで読み飛ばします。
+    それ以外のフォーマットや解析できない場合は None を返し、Mutagen に任せます。
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    with open(file_path, "rb") as f:
+        if ext == ".flac":
+            return _read_flac_tags(f, file_path)
+        if ext == ".mp3":
+            return _read_id3_tags(f, file_path)
+    return None
+
+
+def _read_flac_tags(f, file_path):
+    if f.read(4) != b"fLaC":
+        return None
+
+    info = None
+    tags = None
+    last = False
+    while not last and (info is None or tags is None):
+        header = f.read(4)
+        if len(header) < 4:
+            break
+        last = bool(header[0] & 0x80)
+        block_type = header[0] & 0x7F
+        size = int.from_bytes(header[1:4], "big")
+
+        if block_type == 0:  # STREAMINFO
+            info = _default_info(file_path, FLACStreamInfo(f.read(size)).length)
+        elif block_type == 4:  # VORBIS_COMMENT
+            tags = VCFLACDict(f.read(size))
+        else:
+            # PICTURE や PADDING などは読まずに読み飛ばす
+            f.seek(size, os.SEEK_CUR)
+
+    if info is None:
+        return None
+    if tags is not None:
+        _apply_tags(info, tags, _TAG_KEYS["vorbis"])
+    return info
+
+
+# 読み取る ID3 テキストフレーム（フレームID -> 共通キー）
+_ID3_TEXT_FRAMES = {v.encode("ascii"): k for k, v in _TAG_KEYS["id3"].items()}
+_ID3_TEXT_ENCODINGS = ("latin-1", "utf-16", "utf-16-be", "utf-8")
+
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _read_id3_tags(f, file_path):
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return None
+    major, flags = header[3], header[5]
+    # 非同期化・拡張ヘッダ付き、v2.2 以前のタグは Mutagen に任せる
+    if major not in (3, 4) or flags & 0xC0:
+        return None
+
+    tag_end = 10 + _syncsafe(header[6:10])
+    fields = {}
+    pos = 10
+    while pos + 10 <= tag_end:
+        frame_header = f.read(10)
+        frame_id = frame_header[:4]
+        if len(frame_header) < 10 or frame_id[:1] == b"\x00":
+            break  # パディング
+        if major == 4:
+            size = _syncsafe(frame_header[4:8])
+        else:
+            size = int.from_bytes(frame_header[4:8], "big")
+
+        field = _ID3_TEXT_FRAMES.get(frame_id)
+        if field is not None:
+            # 圧縮・暗号化などのフラグが付いたフレームは Mutagen に任せる
+            if frame_header[9] & (0x4F if major == 4 else 0xE0):
+                return None
+            data = f.read(size)
+            if data and data[0] < len(_ID3_TEXT_ENCODINGS):
+                text = data[1:].decode(_ID3_TEXT_ENCODINGS[data[0]], errors="replace")
+                fields[field] = text.split("\x00")[0]
+        else:
+            # APIC（画像）などは読まずに読み飛ばす
+            f.seek(size, os.SEEK_CUR)
+        pos += 10 + size
+
+    # v2.4 のフッタを考慮して音声データの先頭から MPEG ヘッダを解析する
+    audio_offset = tag_end + (10 if major == 4 and flags & 0x10 else 0)
+    info = _default_info(file_path, MPEGInfo(f, audio_offset).length)
+    info.update((field, text) for field, text in fields.items() if text)
+    return info
+
+
+def extract_album_art(file_path):
+    """音声ファイルから埋め込み画像だけを読み出す（ArtStore の再読み込み用）"""
+    try:
+        audio = _open_mutagen(file_path)
+        if audio is None:
+            return None
+        return _find_album_art(audio, file_path)
+    except Exception as e:
+        print(f"Album art extraction error ({os.path.basename(file_path)}): {e}")
+        return None
+
+
+def load_album_art(metadata):
+    """
+    曲のメタデータに対応するアルバムアートのバイト列を取得する（無ければ None）。
+    高速モードで読み込んだ曲は、ここで初めて画像を読み込んで art_key を記録します。
+    """
+    file_path = metadata.get("file_path")
+    if "art_key" not in metadata:
+        art = extract_album_art(file_path)
+        metadata["art_key"] = (
+            _art_store.put(art, source_path=file_path) if art else None
+        )
+        if _metadata_cache is not None:
+            _metadata_cache.put(file_path, dict(metadata))
+        return art
+    return _art_store.get(metadata["art_key"], file_path)
@@ -0,0 +1,215 @@
+import json
+import os
+import sqlite3
+import threading
+
+
+class MetadataCache:
+    """
+    extract_metadata の結果を SQLite に永続化するキャッシュ。
+
+    キーは (正規化パス, ファイルサイズ, 更新時刻[ns]) の組です。
+    サイズと更新時刻が一致する限り、同じファイルを Mutagen で再解析しません。
+    インポート用のワーカースレッドからも呼べるよう、接続はロックで保護しています。
+    """
+
+    # スキーマを変更したらインクリメントする（古いキャッシュは破棄して作り直す）
+    SCHEMA_VERSION = 2
+
+    def __init__(self, db_path, commit_interval=256):
+        self.db_path = db_path
+        # 書き込みはまとめてコミットし、大量インポート時の fsync を減らす
+        self.commit_interval = commit_interval
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+
+    def _init_schema(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS metadata")
+            self._conn.execute("DROP TABLE IF EXISTS analysis")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS metadata (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                data TEXT NOT NULL
+            )
+            """
+        )
+        # 音声の解析結果（フィンガープリント等）。kind ごとにバイト列で持つ
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analysis (
+                path TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (path, kind)
+            )
+            """
+        )
+        self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self._conn.commit()
+
+    @staticmethod
+    def _normalize(file_path):
+        """キャッシュキーとして使うパス表記を揃える"""
+        return os.path.normcase(os.path.abspath(file_path))
+
+    @staticmethod
+    def _stat(file_path):
+        """(サイズ, 更新時刻[ns]) を返す。ファイルが無ければ None"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def get(self, file_path, required_keys=()):
+        """
+        キャッシュ済みのメタデータを返す。
+        ファイルが変更されている・未登録の場合、または required_keys の
+        いずれかを含まないエントリの場合は None（ミス）を返します。
+        """
+        stat = self._stat(file_path)
+        row = None
+        if stat is not None:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT size, mtime_ns, data FROM metadata WHERE path = ?",
+                    (self._normalize(file_path),),
+                ).fetchone()
+
+        info = None
+        if row is not None and (row[0], row[1]) == stat:
+            info = json.loads(row[2])
+            if any(key not in info for key in required_keys):
+                info = None
+
+        # 取り込みと先読みのスレッドから同時に呼ばれるので、集計もロックの中で行う
+        with self._lock:
+            if info is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if info is None:
+            return None
+        info["file_path"] = file_path
+        return info
+
+    def put(self, file_path, info):
+        """メタデータを現在のサイズ・更新時刻と紐付けて保存する"""
+        stat = self._stat(file_path)
+        if stat is None or info is None:
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (path, size, mtime_ns, data)"
+                " VALUES (?, ?, ?, ?)",
+                (
+                    self._normalize(file_path),
+                    stat[0],
+                    stat[1],
+                    json.dumps(info, ensure_ascii=False),
+                ),
+            )
+            self._pending_writes += 1
+            if self._pending_writes >= self.commit_interval:
+                self._commit_locked()
+
+    def get_analysis(self, file_path, kind):
+        """
+        音声の解析結果（kind ごとのバイト列）を返す。
+        ファイルが変更されている・未登録の場合は None を返します。
+        """
+        stat = self._stat(file_path)
+        if stat is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, data FROM analysis WHERE path = ? AND kind = ?",
+                (self._normalize(file_path), kind),
+            ).fetchone()
+        if row is None or (row[0], row[1]) != stat:
+            return None
+        return bytes(row[2])
+
+    def put_analysis(self, file_path, kind, data):
+        """音声の解析結果を現在のサイズ・更新時刻と紐付けて保存する"""
+        stat = self._stat(file_path)
+        if stat is None or data is None:
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis (path, kind, size, mtime_ns, data)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self._normalize(file_path), kind, stat[0], stat[1], data),
+            )
+            self._pending_writes += 1
+            if self._pending_writes >= self.commit_interval:
+                self._commit_locked()
+
+    def invalidate(self, file_paths):
+        """指定したパス群のエントリ（解析結果も含む）を一括で破棄し、削除件数を返す"""
+        keys = [(self._normalize(p),) for p in file_paths]
+        if not keys:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("DELETE FROM metadata WHERE path = ?", keys)
+            removed = self._conn.total_changes - before
+            self._conn.executemany("DELETE FROM analysis WHERE path = ?", keys)
+            self._commit_locked()
+            return removed
+
+    def clear(self):
+        """全エントリを破棄する"""
+        with self._lock:
+            self._conn.execute("DELETE FROM metadata")
+            self._conn.execute("DELETE FROM analysis")
+            self._commit_locked()
+
+    def flush(self):
+        """未コミットの書き込みを確定する"""
+        with self._lock:
+            self._commit_locked()
+
+    def close(self):
+        """書き込みを確定して接続を閉じる"""
+        with self._lock:
+            self._commit_locked()
+            self._conn.close()
+
+    def _commit_locked(self):
+        self._conn.commit()
+        self._pending_writes = 0
+
+    @property
+    def stats(self):
+        """ヒット/ミス回数の集計"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
@@ -0,0 +1,361 @@
+import threading
+import numpy as np
+from dsp.crossfade import mix_crossfade
+from .decoder import open_audio
+from .gapless import gapless_range
+from .ring_buffer import RingBuffer
+
+
+class PcmStream:
+    """
+    音声ファイルを専用スレッドでブロックごとにデコードし、処理フックを通して
+    リングバッファへ貯めるストリーム。出力側は read() で取り出します。
+
+    processors は (サンプル, サンプリングレート) を受け取り処理後のサンプルを返す
+    呼び出し可能オブジェクトのリストで、デコードスレッドで先頭から順に呼ばれます
+    （再生中に追加・削除してもよい）。reset() を持つものは、再生開始とシークの
+    たびに呼ばれます（フィルタの内部状態を捨てるため）。
+    出力が入力より遅れて出てくる処理は flush() を持ち、曲の最後まで読んだ時に
+    残りの出力を返します（出力の合計が入力と同じ長さになるように）。
+
+    エンコーダが曲の前後に足した無音（LAME ヘッダ・iTunSMPB）は取り除き、
+    chain() でつないだ次の曲とは、処理フックの状態を引き継いで切れ目なく続けます。
+    クロスフェードする場合は、重なる部分の次の曲もこのストリームのデコードスレッドが
+    読んで混ぜてから処理フックに通します（処理フックは常に1本の音だけを見る）。
+    """
+
+    def __init__(
+        self, file_path, processors=None, block_frames=4096, buffer_seconds=0.5
+    ):
+        self.file_path = file_path
+        self.processors = processors if processors is not None else []
+        self.block_frames = block_frames
+        self.buffer_seconds = buffer_seconds
+        # 開けないファイルはここで DecodeError になる
+        self._file = open_audio(file_path)
+        self.sample_rate = self._file.samplerate
+        self.channels = self._file.channels
+        # エンコーダが足した無音を除いた、曲本来の範囲 [フレーム]
+        self._first_frame, self._end_frame = gapless_range(file_path, self._file.frames)
+        self.frames = self._end_frame - self._first_frame
+        self.output_rate = self.sample_rate
+        self.output_channels = self.channels
+        # デコード中に起きたエラー（途中で壊れているファイルなど）
+        self.error = None
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._ring = None
+        self._resampler = None
+        self._thread = None
+        self._closed = False
+        # デコードスレッドへのシーク要求 [フレーム]
+        self._seek_frame = None
+        # 再生位置 = 最後にシークした位置 [ms] + その後に取り出したフレーム数
+        self._base_position = 0
+        self._consumed = 0
+        self._eof = False
+        # 最後まで読み、次の曲へ引き継ぐかどうかを決めた後か
+        self._finishing = False
+        # chain() でつないだ次の曲と、前の曲から処理フックを引き継ぐかどうか
+        self._next = None
+        self._keep_state = False
+        # 前の曲が最後までデコードし終えたら（つないでいなければすぐに）セットされる
+        self._may_start = threading.Event()
+        # 次の曲と重ねる長さ [フレーム] と、次の曲に掛ける倍率
+        self._crossfade_frames = 0
+        self._crossfade_gain = 1.0
+        # 重ね始めてからのフレーム数（重ねていなければ None）と、重ねる長さ
+        self._fade_position = None
+        self._fade_length = 0
+        # デコードスレッドが次の曲のファイルを読んでいる間は保持する
+        self._mix_lock = threading.Lock()
+
+    @property
+    def duration(self):
+        """曲の長さ [ms]"""
+        return self.frames * 1000 // self.sample_rate
+
+    def start(
+        self,
+        start_position=0,
+        output_rate=None,
+        output_channels=None,
+        previous=None,
+        crossfade_frames=0,
+        crossfade_gain=1.0,
+    ):
+        """
+        start_position [ms] からデコードを始める。
+        出力先が曲と違うサンプリングレート・チャンネル数しか扱えない場合は、
+        変換先を指定します。
+
+        previous に再生中のストリームを渡すと、その曲の続きとしてつなぎます。
+        処理フックは同時に2曲分を処理できないため、デコードは previous が
+        最後まで読み終えてから始めます。
+        crossfade_frames を指定すると、previous の最後とこの曲の先頭を重ねます。
+        """
+        if previous is not None and previous.chain(
+            self, crossfade_frames, crossfade_gain
+        ):
+            self._keep_state = True
+        else:
+            self._may_start.set()
+        self.output_rate = output_rate or self.sample_rate
+        self.output_channels = output_channels or self.channels
+        if self.output_rate != self.sample_rate:
+            self._resampler = _LinearResampler(self.sample_rate, self.output_rate)
+        capacity = max(self.block_frames, int(self.output_rate * self.buffer_seconds))
+        self._ring = RingBuffer(capacity, self.output_channels)
+        self.seek(start_position)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def seek(self, position):
+        """再生位置 [ms] を移動する（貯めてあった PCM は捨てる）"""
+        position = max(0, min(int(position), self.duration))
+        with self._lock:
+            self._seek_frame = position * self.sample_rate // 1000
+            self._base_position = position
+            self._consumed = 0
+            self._eof = False
+            self._finishing = False
+            self._ring.clear()
+        self._wake.set()
+
+    def chain(self, stream, crossfade_frames=0, crossfade_gain=1.0):
+        """
+        stream をこの曲の続きとしてつなぐ（stream.start(previous=self) から呼ばれる）。
+        既に最後まで読み、処理フックの残りを出し切っていれば False を返します。
+        つないだ後にシークする場合は、先に unchain() してください。
+
+        crossfade_frames > 0 なら、この曲の最後とそのフレーム数だけ重ねて
+        イコールパワーのクロスフェードで混ぜます（次の曲には crossfade_gain を掛ける）。
+        重ねる長さは次の曲の長さまでで、この曲の残りがそれより短ければ残りの分だけです。
+        """
+        with self._mix_lock, self._lock:
+            if self._finishing:
+                return False
+            self._next = stream
+            self._crossfade_frames = max(0, min(crossfade_frames, stream.frames))
+            self._crossfade_gain = crossfade_gain
+            self._fade_position = None
+        return True
+
+    def unchain(self):
+        """chain() でつないだ次の曲を外す（重ねている途中なら、それ以降は重ねない）"""
+        with self._mix_lock, self._lock:
+            self._next = None
+            self._fade_position = None
+
+    def read(self, frames):
+        """最大 frames フレームを (フレーム数, 出力チャンネル数) の float32 で取り出す"""
+        with self._lock:
+            samples = self._ring.read(frames)
+            self._consumed += len(samples)
+        return samples
+
+    def available(self):
+        """すぐに取り出せるフレーム数"""
+        return len(self._ring)
+
+    def position(self, latency_frames=0):
+        """
+        再生位置 [ms]。取り出したがまだ鳴っていない latency_frames の分を差し引きます。
+        """
+        with self._lock:
+            played = max(0, self._consumed - latency_frames)
+            position = self._base_position + played * 1000 // self.output_rate
+        return min(position, self.duration)
+
+    @property
+    def at_end(self):
+        """最後までデコードし、貯めた分もすべて取り出したか"""
+        with self._lock:
+            return self._eof and len(self._ring) == 0
+
+    def close(self):
+        """デコードを止めてファイルを閉じる"""
+        self._closed = True
+        self._may_start.set()
+        if self._thread is None:
+            self._file.close()
+            return
+        self._ring.close()
+        self._wake.set()
+        self._thread.join(timeout=1.0)
+
+    # --- 以下はデコードスレッドで実行される ---
+    def _run(self):
+        try:
+            self._may_start.wait()
+            self._decode()
+        except Exception as e:
+            self.error = e
+            print(f"Playback decode error ({self.file_path}): {e}")
+            with self._lock:
+                self._eof = True
+        finally:
+            self._file.close()
+
+    def _decode(self):
+        while not self._closed:
+            self._wake.clear()
+            with self._lock:
+                seek_frame, self._seek_frame = self._seek_frame, None
+                generation = self._ring.generation
+                at_eof = self._eof
+            if seek_frame is not None:
+                self._file.seek(self._first_frame + seek_frame)
+                self._fade_position = None
+                if self._keep_state:
+                    # 前の曲から続ける時は、フィルタの状態もそのまま引き継ぐ
+                    self._keep_state = False
+                else:
+                    self._reset_processors()
+            elif at_eof:
+                # 最後まで読んだらシークか終了の指示を待つ
+                self._wake.wait()
+                continue
+
+            with self._mix_lock:
+                block = self._read_block()
+            if len(block) == 0:
+                with self._lock:
+                    if generation != self._ring.generation:
+                        continue
+                    self._finishing = True
+                    following = self._next
+                if following is None:
+                    # 遅延のある処理（直線位相 EQ など）に残っている分を出し切る
+                    tail = self._flush_processors()
+                    if len(tail):
+                        self._ring.write(tail, generation)
+                else:
+                    # 次の曲がつながっていれば、残りはその曲の先頭と一緒に出てくる。
+                    # 重ねた分はもう読んだので、次の曲はその続きから始める
+                    faded = self._fade_length if self._fade_position is not None else 0
+                    following._continue_from(faded)
+                    following._may_start.set()
+                with self._lock:
+                    # 読んでいる間にシークされていなければ、ここが曲の終わり
+                    if generation == self._ring.generation:
+                        self._eof = True
+                continue
+            # シークで世代が変わっていれば、書き込みは捨てられる
+            self._ring.write(self._process(block), generation)
+
+    def _read_block(self):
+        with self._lock:
+            following = self._next
+        remaining = self._end_frame - self._file.tell()
+        frames = min(self.block_frames, max(remaining, 0))
+        if following is not None and self._fade_position is None:
+            fade = self._crossfade_frames
+            if remaining > fade:
+                # 重ね始める位置でブロックを区切る
+                frames = min(frames, remaining - fade)
+            elif fade > 0:
+                # ここから曲の最後までを、次の曲の先頭と重ねる
+                self._fade_position = 0
+                self._fade_length = remaining
+                following._file.seek(following._first_frame)
+        block = self._file.read(frames, dtype="float32", always_2d=True)
+        if following is None or self._fade_position is None or len(block) == 0:
+            return block
+
+        incoming = following._file.read(len(block), dtype="float32", always_2d=True)
+        if len(incoming) < len(block):
+            incoming = np.pad(incoming, ((0, len(block) - len(incoming)), (0, 0)))
+        block = mix_crossfade(
+            block,
+            _convert_channels(incoming, block.shape[1]),
+            self._fade_position,
+            self._fade_length,
+            self._crossfade_gain,
+        )
+        self._fade_position += len(block)
+        return block
+
+    def _continue_from(self, frame):
+        # 前の曲と重ねて frame フレーム目まで鳴らした続きから始める
+        with self._lock:
+            self._seek_frame = frame
+            self._base_position = frame * 1000 // self.sample_rate
+            self._consumed = 0
+
+    def _process(self, block):
+        for processor in tuple(self.processors):
+            block = processor(block, self.sample_rate)
+        return self._convert(block)
+
+    def _flush_processors(self):
+        # flush() を持つ処理の残りは、その後ろの処理を通してから出力する
+        block = np.zeros((0, self.channels), dtype=np.float32)
+        for processor in tuple(self.processors):
+            if len(block):
+                block = processor(block, self.sample_rate)
+            flush = getattr(processor, "flush", None)
+            tail = flush() if flush is not None else None
+            if tail is not None and len(tail):
+                block = np.concatenate([block, tail])
+        return self._convert(block)
+
+    def _convert(self, block):
+        block = _convert_channels(block, self.output_channels)
+        if self._resampler is not None:
+            block = self._resampler.process(block)
+        return np.asarray(block, dtype=np.float32)
+
+    def _reset_processors(self):
+        for processor in tuple(self.processors):
+            reset = getattr(processor, "reset", None)
+            if reset is not None:
+                reset()
+        if self._resampler is not None:
+            self._resampler.reset()
+
+
+def _convert_channels(samples, channels):
+    # 出力先のチャンネル数に合わせる（モノラルは複製、モノラル出力は平均、それ以外は先頭から）
+    count = samples.shape[1]
+    if count == channels:
+        return samples
+    if count == 1:
+        return np.repeat(samples, channels, axis=1)
+    if channels == 1:
+        return samples.mean(axis=1, keepdims=True)
+    if count > channels:
+        return samples[:, :channels]
+    return np.pad(samples, ((0, 0), (0, channels - count)))
+
+
+class _LinearResampler:
+    """
+    出力デバイスが曲のサンプリングレートを扱えない時のための、
+    線形補間による簡易なサンプリングレート変換（ブロックをまたいで連続させる）。
+    """
+
+    def __init__(self, source_rate, target_rate):
+        self._step = source_rate / target_rate
+        self.reset()
+
+    def reset(self):
+        # 次に出力するサンプルの位置（前のブロックの最後のフレームを 0 とする）
+        self._position = 0.0
+        self._last = None
+
+    def process(self, samples):
+        buffer = (
+            samples if self._last is None else np.concatenate([self._last, samples])
+        )
+        if len(buffer) == 0:
+            return buffer
+        self._last = buffer[-1:]
+        positions = np.arange(self._position, len(buffer) - 1, self._step)
+        if len(positions):
+            self._position = positions[-1] + self._step
+        self._position -= len(buffer) - 1
+        index = positions.astype(np.int64)
+        fraction = (positions - index)[:, None]
+        return buffer[index] * (1.0 - fraction) + buffer[index + 1] * fraction
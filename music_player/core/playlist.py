@@ -1,26 +1,412 @@
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from .collation import collation_key
+from .metadata import load_album_art
+from .search import SearchIndex
+from .song_store import SongRow, SongSequence, SongStore
+
+# 並び替えの種類 -> 比較する項目（先頭から順に比較し、同じなら追加順）
+SORT_ORDERS = {
+    "added": ("added",),
+    "artist": ("artist", "album", "title"),
+    "album": ("album", "title"),
+    "title": ("title", "artist"),
+    "duration": ("duration", "title"),
+}
+
+# 照合キーを事前計算しておく文字列項目
+_COLLATED_FIELDS = ("artist", "album", "title")
+
+
+def _put(column, slot, value):
+    """スロット番号で引く列に値を書き込む（足りない分は同じ値で埋める）"""
+    if slot >= len(column):
+        column.extend([value] * (slot + 1 - len(column)))
+    column[slot] = value
+
+
 class PlaylistManager:
-    """プレイリストのデータ管理を担当するクラス"""
+    """
+    プレイリストのデータ管理を担当するクラス
+
+    楽曲は列指向の SongStore に保持し、並び順はスロット番号の array で管理します。
+    get_all_songs() などが返す各曲は辞書のように扱える SongRow ビューです。
+    """
 
     def __init__(self):
-        self.songs = []
+        self._store = SongStore()
+        self._order = array("l")
+        self._songs = SongSequence(self._store, self._order)
+        # ファイルパス -> スロット（再生開始時にファイルを再解析しないための索引）
+        self._by_path = {}
+        # 同じファイルが複数回追加された場合に備えた登録数
+        self._path_counts = {}
+        # タイトル・アーティスト等の検索用インデックス
+        self._search = SearchIndex()
+        # スロット -> プレイリスト上の位置（削除後は次の検索時に作り直す）
+        self._positions = {}
+        # 並び替え用のキー（スロット番号で引く列。照合キーは追加時に1回だけ計算する）
+        self._sort_columns = {field: [] for field in _COLLATED_FIELDS}
+        self._sort_columns["duration"] = array("d")
+        self._sort_columns["added"] = array("d")
+        # 並び替えの種類 -> 昇順に並べたスロット番号（曲の追加・削除で破棄）
+        self._sorted_cache = {}
+        # まとめて復元した曲のうち、検索・並び替え用のキーをまだ作っていないもの
+        # (スロット番号, 曲ID)。index_pending() か最初の検索・並び替えで処理する
+        self._unindexed = deque()
 
-    def add_song(self, metadata):
+    @property
+    def songs(self):
+        return self._songs
+
+    @staticmethod
+    def is_valid_song(metadata):
+        """プレイリストに追加できるデータかどうか"""
+        return isinstance(metadata, (dict, SongRow))
+
+    def add_song(self, metadata, added_at=None):
         """楽曲を追加（Noneや無効なデータはスキップ）"""
         # バリデーションを追加してテストをパスさせる
-        if metadata is None or not isinstance(metadata, dict):
+        if not self.is_valid_song(metadata):
             return
-        self.songs.append(metadata)
+        slot = self._store.add(metadata)
+        if self._positions is not None:
+            self._positions[slot] = len(self._order)
+        self._order.append(slot)
+        self._search.add(slot, metadata)
+        self._set_sort_keys(slot, metadata, added_at)
+
+        file_path = metadata.get("file_path")
+        if file_path is not None:
+            self._by_path[file_path] = slot
+            self._path_counts[file_path] = self._path_counts.get(file_path, 0) + 1
+
+    def add_songs(self, songs, added_at=None):
+        """複数の楽曲をまとめて追加（追加時刻はすべて同じ値にする）"""
+        if added_at is None:
+            added_at = time.time()
+        for metadata in songs:
+            self.add_song(metadata, added_at=added_at)
+
+    def export_songs(self):
+        """全曲をプレイリスト順に項目ごとのリストへまとめる（セッションの保存用）"""
+        data = self._store.export_columns(self._order)
+        data["added_at"] = list(
+            map(self._sort_columns["added"].__getitem__, self._order)
+        )
+        return data
+
+    def import_songs(self, data):
+        """
+        export_songs() の結果から曲をまとめて末尾に追加する（タグは再解析しない）。
+        検索・並び替え用のキーは後回しにし、index_pending() か
+        最初の検索・並び替えの時に作ります。
+        """
+        slots = self._store.import_columns(data)
+        if not slots:
+            return
+        start = len(self._order)
+        self._order.extend(slots)
+        if self._positions is not None:
+            self._positions.update(zip(slots, range(start, start + len(slots))))
+
+        # 復元した曲は末尾の連続したスロットに入る
+        added = self._sort_columns["added"]
+        _put(added, slots[0], 0.0)
+        del added[slots[0] :]
+        added.extend(data.get("added_at") or [time.time()] * len(slots))
+
+        paths = data["columns"].get("file_path") or ()
+        self._by_path.update(
+            (path, slot) for path, slot in zip(paths, slots) if path is not None
+        )
+        counts = Counter(path for path in paths if path is not None)
+        if self._path_counts:
+            for path, count in counts.items():
+                self._path_counts[path] = self._path_counts.get(path, 0) + count
+        else:
+            self._path_counts = dict(counts)
+
+        first_id = self._store.id_of(slots[0])
+        self._unindexed.extend(zip(slots, range(first_id, first_id + len(slots))))
+        self._sorted_cache = {}
+
+    def index_pending(self, limit=None):
+        """後回しにしていた検索・並び替え用のキーを最大 limit 曲分作り、残りの曲数を返す"""
+        pending = self._unindexed
+        count = len(pending) if limit is None else min(limit, len(pending))
+        added = self._sort_columns["added"]
+        for _ in range(count):
+            slot, song_id = pending.popleft()
+            # キーを作る前に削除された曲は飛ばす
+            if self._store.id_of(slot) != song_id:
+                continue
+            row = self._store.row(slot)
+            self._search.add(slot, row)
+            self._set_sort_keys(slot, row, added[slot])
+        return len(pending)
+
+    def update_song(self, song_id, metadata):
+        """
+        曲IDの曲のメタデータを読み直した内容に置き換え、その位置を返す
+        （削除済みなら -1）。並び順と追加時刻は変えません。
+        """
+        slot = self._store.slot_of(song_id)
+        if slot is None or not self.is_valid_song(metadata):
+            return -1
+        file_path = self._store.row(slot).get("file_path")
+        self._store.replace(slot, metadata)
+        # パスの索引はそのまま使えるよう、パスは元の値を保つ
+        if file_path is not None:
+            self._store.set(slot, "file_path", file_path)
+        self._search.add(slot, metadata)
+        self._set_sort_keys(slot, metadata, self._sort_columns["added"][slot])
+        return self._position_map().get(slot, -1)
 
     def remove_song(self, index):
-        """指定したインデックスの楽曲をリストから削除"""
-        if 0 <= index < len(self.songs):
-            return self.songs.pop(index)
+        """指定したインデックスの楽曲をリストから削除（削除した曲の辞書を返す）"""
+        if 0 <= index < len(self._order):
+            slot = self._order.pop(index)
+            return self._forget([slot])[0]
         return None
 
+    def remove_songs(self, indexes):
+        """
+        複数のインデックスの楽曲をまとめて削除し、削除した曲の辞書を位置順のリストで返す。
+        1曲ずつ pop せず、残す区間をつなぎ直すだけなので、何曲消しても並びの
+        作り直しは1回で済みます。
+        """
+        count = len(self._order)
+        indexes = sorted({i for i in indexes if 0 <= i < count})
+        if not indexes:
+            return []
+        order = self._order
+        slots = [order[i] for i in indexes]
+        kept = array("l")
+        previous = 0
+        for i in indexes:
+            kept.extend(order[previous:i])
+            previous = i + 1
+        kept.extend(order[previous:])
+        order[:] = kept
+        return self._forget(slots)
+
+    def move_songs(self, indexes, destination):
+        """
+        複数のインデックスの楽曲を、元の並びのまま destination の位置の前へ移動する
+        （destination が曲数と同じなら末尾へ）。
+        sort() と同じく permutation[新しい位置] = 元の位置 のリストを返します。
+        """
+        count = len(self._order)
+        indexes = sorted({i for i in indexes if 0 <= i < count})
+        destination = max(0, min(destination, count))
+        # 移動する曲を除いた並びの中での挿入位置
+        insert_at = destination - bisect_left(indexes, destination)
+
+        kept = array("l")
+        previous = 0
+        for i in indexes:
+            kept.extend(range(previous, i))
+            previous = i + 1
+        kept.extend(range(previous, count))
+        permutation = kept[:insert_at] + array("l", indexes) + kept[insert_at:]
+
+        order = self._order
+        order[:] = array("l", map(order.__getitem__, permutation))
+        self._positions = None
+        return permutation.tolist()
+
+    def song_id(self, index):
+        """指定したインデックスの曲の曲ID（並び替え・削除をしても変わらない）"""
+        return self._store.id_of(self._order[index])
+
+    def index_of(self, song_id):
+        """曲IDの現在のインデックス（削除済みなら -1）"""
+        slot = self._store.slot_of(song_id)
+        if slot is None:
+            return -1
+        return self._position_map().get(slot, -1)
+
+    def song_ids(self):
+        """全曲の曲IDをプレイリスト順のリストで返す"""
+        return list(map(self._store.id_of, self._order))
+
+    def has_song(self, song_id):
+        """曲IDの曲がまだプレイリストにあるか"""
+        return self._store.slot_of(song_id) is not None
+
+    @property
+    def next_song_id(self):
+        """次に追加される曲に振られる曲ID（これより小さい曲IDは追加済み）"""
+        return self._store.next_id
+
+    def song_ids_since(self, song_id):
+        """曲ID song_id 以降に追加され、まだプレイリストにある曲の曲ID"""
+        return [i for i in range(song_id, self._store.next_id) if self.has_song(i)]
+
+    def _forget(self, slots):
+        """並びから外したスロットの曲を索引・ストアから消し、辞書のリストを返す"""
+        removed = [self._store.to_dict(slot) for slot in slots]
+        stale_paths = set()
+        for slot, metadata in zip(slots, removed):
+            file_path = metadata.get("file_path")
+            count = self._path_counts.get(file_path, 0) - 1
+            if count > 0:
+                self._path_counts[file_path] = count
+                # 索引が削除する曲を指していたら、後で同じパスの別の曲に付け替える
+                if self._by_path.get(file_path) == slot:
+                    stale_paths.add(file_path)
+            else:
+                self._path_counts.pop(file_path, None)
+                self._by_path.pop(file_path, None)
+            self._search.remove(slot)
+            self._store.free(slot)
+
+        if stale_paths:
+            paths = self._store.values("file_path", self._order)
+            for slot, file_path in zip(self._order, paths):
+                if file_path in stale_paths:
+                    self._by_path[file_path] = slot
+                    stale_paths.discard(file_path)
+                    if not stale_paths:
+                        break
+        self._positions = None
+        self._sorted_cache = {}
+        return removed
+
     def clear(self):
         """プレイリストを空にする（テストの期待値に合わせて名称変更）"""
-        self.songs = []
+        self._store.clear()
+        del self._order[:]
+        self._by_path = {}
+        self._path_counts = {}
+        self._search.clear()
+        self._positions = {}
+        for column in self._sort_columns.values():
+            del column[:]
+        self._sorted_cache = {}
+        self._unindexed.clear()
 
     def get_all_songs(self):
         """全楽曲リストを取得"""
-        return self.songs
+        return self._songs
+
+    def get_column(self, key, default=None):
+        """指定した項目の値をプレイリスト順のリストで返す（全曲の走査用）"""
+        return self._store.values(key, self._order, default)
+
+    def get_song_by_path(self, file_path):
+        """登録済みの楽曲をファイルパスから O(1) で取得（未登録なら None）"""
+        slot = self._by_path.get(file_path)
+        if slot is None:
+            return None
+        return self._store.row(slot)
+
+    def search(self, query):
+        """
+        タイトル・アーティスト・アルバム・作曲者から検索し、
+        一致した曲の位置をプレイリスト順のリストで返す（空の検索語なら None）
+        """
+        self.index_pending()
+        slots = self._search.search(query)
+        if slots is None:
+            return None
+        return sorted(map(self._position_map().__getitem__, slots))
+
+    def sort(self, order, reverse=False):
+        """
+        SORT_ORDERS の種類で並び替え、新しい並びの各曲が元の何番目だったかのリスト
+        （permutation[新しい位置] = 元の位置）を返す。
+        並び替えの結果は曲が追加・削除されるまで保持するので、種類を切り替えるだけなら
+        比較をやり直しません。
+        """
+        self.index_pending()
+        sorted_slots = self._sorted_cache.get(order)
+        if sorted_slots is None:
+            sorted_slots = self._sorted_cache[order] = self._sort_slots(order)
+        if reverse:
+            sorted_slots = sorted_slots[::-1]
+
+        permutation = list(map(self._position_map().__getitem__, sorted_slots))
+        self._order[:] = sorted_slots
+        self._positions = None
+        return permutation
+
+    def _sort_slots(self, order):
+        slots = list(self._order)
+        columns = [self._sort_columns[field] for field in SORT_ORDERS[order]]
+        # 同じキーの曲は追加順（曲ID順）に並べる
+        keys = list(
+            zip(
+                *[map(column.__getitem__, slots) for column in columns],
+                map(self._store.id_of, slots),
+            )
+        )
+        ranks = sorted(range(len(slots)), key=keys.__getitem__)
+        return array("l", map(slots.__getitem__, ranks))
+
+    def _set_sort_keys(self, slot, metadata, added_at):
+        duration = metadata.get("duration")
+        if not isinstance(duration, (int, float)):
+            duration = 0
+        values = {
+            field: collation_key(metadata.get(field)) for field in _COLLATED_FIELDS
+        }
+        values["duration"] = duration
+        values["added"] = time.time() if added_at is None else added_at
+
+        for field, column in self._sort_columns.items():
+            _put(column, slot, values[field])
+        self._sorted_cache = {}
+
+    def get_added_at(self, index):
+        """指定したインデックスの曲がプレイリストに追加された時刻（UNIX 時間）"""
+        return self._sort_columns["added"][self._order[index]]
+
+    def _position_map(self):
+        if self._positions is None:
+            self._positions = {slot: i for i, slot in enumerate(self._order)}
+        return self._positions
+
+    def __len__(self):
+        return len(self._order)
+
+
+class SongPrefetcher:
+    """
+    次に再生されそうな曲（前後の曲）をバックグラウンドで先読みするクラス。
+
+    アルバムアートを ArtStore に読み込み、音声ファイルの先頭を読んで
+    OS のファイルキャッシュを温めておくことで、曲送り時の待ち時間を
+    デコーダの起動だけに抑えます。
+    """
+
+    def __init__(self, read_bytes=256 * 1024):
+        self.read_bytes = read_bytes
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = []
+
+    def prefetch(self, songs):
+        """曲のメタデータ群を先読みする（まだ始まっていない前回の依頼は取り消す）"""
+        for future in self._pending:
+            future.cancel()
+        self._pending = [
+            self._executor.submit(self._warm, metadata)
+            for metadata in songs
+            if metadata is not None
+        ]
+
+    def _warm(self, metadata):
+        try:
+            load_album_art(metadata)
+            with open(metadata["file_path"], "rb") as f:
+                f.read(self.read_bytes)
+        except Exception as e:
+            print(f"Prefetch error ({metadata.get('file_path')}): {e}")
+
+    def shutdown(self):
+        """待機中の先読みを破棄してワーカーを停止する"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,231 @@
+import random
+from collections import deque
+
+
+class PlaybackQueue:
+    """
+    次・前に再生する曲を決めるクラス。
+
+    曲は並び替えや削除で変わらない曲IDで扱います。次の曲は
+    「次に再生」の予約 → (シャッフル中は) 戻った分の履歴 → シャッフル / プレイリスト順
+    の順に選びます。
+
+    シャッフルは Fisher–Yates を1曲ずつ進める形で、周回の最初に曲IDの一覧を
+    作るだけです。次・前の曲はプレイリストの長さによらず O(1) で決まります。
+    途中で追加された曲は残りの候補に加え、削除された曲は引いた時に読み飛ばします。
+    """
+
+    def __init__(self, manager, history_size=1000, rng=None):
+        self.manager = manager
+        self.shuffle = False
+        self.current_id = None
+        # 現在の曲が削除された時に、次の曲を決める基準にする位置
+        self._current_position = -1
+        # 「次に再生」で予約された曲
+        self._up_next = deque()
+        # 再生した曲の履歴と、前の曲に戻った後に「次へ」で進み直すための履歴
+        self._history = deque(maxlen=history_size)
+        self._forward = []
+        self._rng = rng if rng is not None else random.Random()
+        # シャッフルでこの周回にまだ引いていない曲ID（None は周回前）
+        self._pool = None
+        # 候補に加え済みの曲IDの上限（これ以降の曲IDは途中で追加された曲）
+        self._pool_limit = 0
+        # この周回で再生済みの曲ID
+        self._played = set()
+        # peek_next() でシャッフルから引いておいた曲ID（next() が最初に使う）
+        self._peeked = None
+
+    def set_shuffle(self, enabled):
+        """シャッフルの切り替え（候補は次の曲を選ぶ時に作る）"""
+        self.shuffle = bool(enabled)
+        self._pool = None
+        self._played = set()
+        self._peeked = None
+        self._forward.clear()
+
+    def set_current(self, song_id):
+        """ユーザーが選んだ曲を現在の曲にする（前の曲は履歴に積む）"""
+        if song_id == self.current_id:
+            self._current_position = self.manager.index_of(song_id)
+            return
+        self._forward.clear()
+        self._return_peeked()
+        self._advance(song_id)
+
+    def play_next(self, song_ids):
+        """曲を「次に再生」に予約する（予約した順に再生される）"""
+        self._up_next.extend(song_ids)
+
+    def before_remove(self, indexes):
+        """
+        プレイリストから曲を削除する直前に呼ぶ。
+        現在の曲が削除されても、その位置に詰めてくる曲から続けられるようにします。
+        """
+        if self.current_id is None:
+            return
+        position = self.manager.index_of(self.current_id)
+        if position >= 0:
+            self._current_position = position - sum(
+                1 for i in set(indexes) if i < position
+            )
+
+    def clear(self):
+        """現在の曲・予約・履歴をすべて消す（シャッフルの設定は残す）"""
+        self.current_id = None
+        self._current_position = -1
+        self._up_next.clear()
+        self._history.clear()
+        self._forward.clear()
+        self._pool = None
+        self._played = set()
+        self._peeked = None
+
+    def next(self):
+        """次の曲を現在の曲にしてその曲IDを返す（曲が無ければ None）"""
+        song_id = self._take(self._up_next, self._up_next.popleft)
+        if song_id is None and self.shuffle:
+            song_id = self._take(self._forward, self._forward.pop)
+            if song_id is None:
+                song_id = self._take_peeked()
+            if song_id is None:
+                song_id = self._draw()
+        if song_id is None:
+            song_id = self._sequential(1)
+        if song_id is not None:
+            self._advance(song_id)
+        return song_id
+
+    def peek_next(self):
+        """
+        次の曲の曲IDを、現在の曲を変えずに返す（曲が無ければ None）。
+        この後に予約やシャッフルの切り替えが無ければ、next() は同じ曲を返します。
+        """
+        song_id = self._peek(self._up_next, 0)
+        if song_id is None and self.shuffle:
+            song_id = self._peek(self._forward, -1)
+            if song_id is None:
+                # 引いた曲は next() で同じ曲になるよう取っておく。別の曲が選ばれたら
+                # 候補に戻すので、先読みしてもこの周回から曲が抜けることはない
+                song_id = self._take_peeked()
+                if song_id is None:
+                    song_id = self._draw()
+                self._peeked = song_id
+        if song_id is None:
+            song_id = self._sequential(1)
+        return song_id
+
+    def peek_previous(self):
+        """前の曲の曲IDを、現在の曲を変えずに返す（previous() が返す曲。無ければ None）"""
+        song_id = None
+        if self.shuffle:
+            song_id = self._peek(self._history, -1)
+        if song_id is None:
+            song_id = self._sequential(-1)
+        return song_id
+
+    def previous(self):
+        """
+        前の曲を現在の曲にしてその曲IDを返す（曲が無ければ None）。
+        シャッフル中は再生した順に戻り、それ以外はプレイリスト上の1つ前の曲です。
+        """
+        song_id = None
+        if self.shuffle:
+            song_id = self._take(self._history, self._history.pop)
+        if song_id is None:
+            song_id = self._sequential(-1)
+        if song_id is None:
+            return None
+        if self.shuffle and self.current_id is not None:
+            self._forward.append(self.current_id)
+        self._set(song_id)
+        return song_id
+
+    def _advance(self, song_id):
+        if self.current_id is not None:
+            self._history.append(self.current_id)
+        self._set(song_id)
+
+    def _set(self, song_id):
+        self.current_id = song_id
+        self._current_position = self.manager.index_of(song_id)
+        if self._pool is not None:
+            self._played.add(song_id)
+
+    def _take(self, container, pop):
+        # 削除済みの曲を読み飛ばして取り出す
+        while container:
+            song_id = pop()
+            if self.manager.has_song(song_id):
+                return song_id
+        return None
+
+    def _peek(self, container, index):
+        # 削除済みの曲を読み飛ばして、取り出さずに返す
+        while container:
+            if self.manager.has_song(container[index]):
+                return container[index]
+            del container[index]
+        return None
+
+    def _take_peeked(self):
+        song_id, self._peeked = self._peeked, None
+        if (
+            song_id is None
+            or song_id in self._played
+            or not self.manager.has_song(song_id)
+        ):
+            return None
+        return song_id
+
+    def _return_peeked(self):
+        # 引いておいた曲を、この周回の残りの候補に戻す
+        song_id, self._peeked = self._peeked, None
+        if song_id is not None and self._pool is not None:
+            self._pool.append(song_id)
+
+    def _sequential(self, step):
+        count = len(self.manager)
+        if count == 0:
+            return None
+        position = -1
+        if self.current_id is not None:
+            position = self.manager.index_of(self.current_id)
+        if position < 0:
+            # 現在の曲が削除されていたら、その位置に詰めてきた曲を次の曲にする
+            position = self._current_position
+            if position < 0:
+                position = 0
+            if step > 0:
+                position -= 1
+        return self.manager.song_id((position + step) % count)
+
+    def _draw(self):
+        manager = self.manager
+        for _ in range(2):
+            if self._pool is None:
+                self._start_round()
+            elif self._pool_limit < manager.next_song_id:
+                # 周回の途中で追加された曲も、残りの候補に混ぜる
+                self._pool.extend(manager.song_ids_since(self._pool_limit))
+                self._pool_limit = manager.next_song_id
+
+            pool = self._pool
+            while pool:
+                # Fisher–Yates の1手：残りから1つ選んで末尾と入れ替えて取り出す
+                i = self._rng.randrange(len(pool))
+                pool[i], pool[-1] = pool[-1], pool[i]
+                song_id = pool.pop()
+                if song_id not in self._played and manager.has_song(song_id):
+                    return song_id
+            # 全曲を再生し終えたら次の周回へ
+            self._pool = None
+        return None
+
+    def _start_round(self):
+        self._pool = self.manager.song_ids()
+        self._pool_limit = self.manager.next_song_id
+        self._played = set()
+        if self.current_id is not None:
+            # 周回の最初に今の曲がもう一度選ばれないようにする
+            self._played.add(self.current_id)
@@ -0,0 +1,90 @@
+import threading
+import numpy as np
+
+
+class RingBuffer:
+    """
+    デコードスレッド（書き込み側）と音声出力（読み出し側）の間で PCM を受け渡す
+    リングバッファ。
+
+    容量はフレーム数で固定し、(フレーム数, チャンネル数) の float32 配列で
+    読み書きします。書き込みは空きができるまで待ち、読み出しは待たずに
+    今あるだけを返します（出力側を止めないため）。
+    clear() で世代が進み、それより前の世代を指定した書き込みは捨てられます。
+    """
+
+    def __init__(self, capacity, channels):
+        self.capacity = capacity
+        self.channels = channels
+        self.generation = 0
+        self._data = np.zeros((capacity, channels), dtype=np.float32)
+        # これまでに読み書きした累計フレーム数（差が中身の量）
+        self._read = 0
+        self._write = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond:
+            return self._write - self._read
+
+    def write(self, samples, generation=None, timeout=None):
+        """
+        samples をすべて書き込むまで待ち、書き込めたフレーム数を返す。
+        途中で clear()・close() された場合や timeout 秒待っても空かない場合は、
+        そこまでで打ち切ります。
+        """
+        if generation is None:
+            generation = self.generation
+        written = 0
+        with self._cond:
+            while written < len(samples):
+                while (
+                    self._write - self._read == self.capacity
+                    and not self._closed
+                    and generation == self.generation
+                ):
+                    if not self._cond.wait(timeout):
+                        return written
+                if self._closed or generation != self.generation:
+                    return written
+                count = min(
+                    self.capacity - (self._write - self._read), len(samples) - written
+                )
+                self._copy_in(samples[written : written + count])
+                self._write += count
+                written += count
+                self._cond.notify_all()
+        return written
+
+    def _copy_in(self, samples):
+        start = self._write % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._data[start : start + first] = samples[:first]
+        self._data[: len(samples) - first] = samples[first:]
+
+    def read(self, frames):
+        """最大 frames フレームを取り出す（足りなければ今ある分だけ）"""
+        with self._cond:
+            count = min(frames, self._write - self._read)
+            start = self._read % self.capacity
+            first = min(count, self.capacity - start)
+            samples = np.concatenate(
+                [self._data[start : start + first], self._data[: count - first]]
+            )
+            self._read += count
+            self._cond.notify_all()
+        return samples
+
+    def clear(self):
+        """中身を捨てて世代を進める（待っている書き込みも打ち切られる）"""
+        with self._cond:
+            self._read = self._write
+            self.generation += 1
+            self._cond.notify_all()
+
+    def close(self):
+        """以後の書き込みをすべて打ち切る"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
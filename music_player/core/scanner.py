@@ -0,0 +1,146 @@
+import json
+import os
+
+# ライブラリとして取り込む音声ファイルの拡張子
+AUDIO_EXTENSIONS = (".mp3", ".flac", ".m4a", ".wav", ".ogg", ".opus", ".aac")
+
+
+class ScanResult:
+    """1回のフォルダスキャンの結果"""
+
+    def __init__(self, root, files, added, changed, removed, entries=None):
+        self.root = root
+        # フォルダ内の全音声ファイル（フォルダ順・名前順）
+        self.files = files
+        # 前回スキャンからの差分
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        # ジャーナルに記録する {パス: [サイズ, 更新時刻]}（commit() で使う）
+        self.entries = entries if entries is not None else {}
+
+    @property
+    def has_changes(self):
+        return bool(self.added or self.changed or self.removed)
+
+
+class LibraryScanner:
+    """
+    フォルダを再帰的に走査して音声ファイルを列挙するクラス。
+
+    os.scandir でディレクトリを1回ずつ読み、前回スキャン時の
+    (サイズ, 更新時刻) をジャーナルとして保存しておくことで、
+    再スキャン時には追加・削除・更新されたファイルだけを差分として返します。
+    """
+
+    JOURNAL_VERSION = 1
+
+    def __init__(self, journal_path=None, extensions=AUDIO_EXTENSIONS):
+        # None の場合はジャーナルをメモリ上にだけ保持する
+        self.journal_path = journal_path
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self._journal = None
+
+    def walk(self, root):
+        """
+        root 以下の音声ファイルを (パス, サイズ, 更新時刻[ns]) で列挙する。
+        シンボリックリンクのフォルダは循環を避けるため辿りません。
+        """
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda e: e.name.lower())
+            except OSError as e:
+                print(f"Scan error ({directory}): {e}")
+                continue
+
+            subdirs = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(self.extensions):
+                        st = entry.stat()
+                        yield entry.path, st.st_size, st.st_mtime_ns
+                except OSError:
+                    continue
+
+            # 名前順に処理されるよう、逆順でスタックに積む
+            stack.extend(reversed(subdirs))
+
+    def scan(self, root, commit=True):
+        """
+        root を走査し、前回スキャンとの差分を含む ScanResult を返す。
+        commit=False ならジャーナルは更新しないので、差分の曲を取り込み終えてから
+        commit(result) してください（途中でやめれば、次回も同じ差分が返る）。
+        """
+        root = os.path.abspath(root)
+        previous = self._load_journal().get(root, {})
+
+        current = {}
+        files = []
+        added = []
+        changed = []
+        for path, size, mtime_ns in self.walk(root):
+            files.append(path)
+            current[path] = [size, mtime_ns]
+            old = previous.get(path)
+            if old is None:
+                added.append(path)
+            elif old[0] != size or old[1] != mtime_ns:
+                changed.append(path)
+
+        removed = [path for path in previous if path not in current]
+
+        result = ScanResult(root, files, added, changed, removed, current)
+        if commit:
+            self.commit(result)
+        return result
+
+    def commit(self, result):
+        """scan() の結果をジャーナルに記録する（次回のスキャンはこの状態との差分になる）"""
+        journal = self._load_journal()
+        # 変化が無ければジャーナルの書き直しも省く
+        if result.has_changes or result.root not in journal:
+            journal[result.root] = result.entries
+            self._save_journal()
+
+    def forget(self, root):
+        """root のジャーナルを破棄する（次回は全件が追加扱いになる）"""
+        journal = self._load_journal()
+        if journal.pop(os.path.abspath(root), None) is not None:
+            self._save_journal()
+
+    def _load_journal(self):
+        if self._journal is not None:
+            return self._journal
+
+        self._journal = {}
+        if self.journal_path and os.path.exists(self.journal_path):
+            try:
+                with open(self.journal_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == self.JOURNAL_VERSION:
+                    self._journal = data.get("roots", {})
+            except (OSError, ValueError) as e:
+                print(f"Scan journal load error: {e}")
+        return self._journal
+
+    def _save_journal(self):
+        if not self.journal_path:
+            return
+        try:
+            # 書きかけのジャーナルを読まないよう、一時ファイル経由で置き換える
+            tmp_path = f"{self.journal_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"version": self.JOURNAL_VERSION, "roots": self._journal},
+                    f,
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
+            os.replace(tmp_path, self.journal_path)
+        except OSError as e:
+            print(f"Scan journal save error: {e}")
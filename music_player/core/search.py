@@ -0,0 +1,186 @@
+import re
+import unicodedata
+from array import array
+
+# 検索対象とするメタデータ項目
+SEARCH_FIELDS = ("title", "artist", "album", "composer")
+
+# かな・漢字・ハングルなど、単語の区切りが無い文字の連続
+_CJK = "぀-ヿ㐀-䶿一-鿿가-힯豈-﫿"
+_PART_RE = re.compile(f"[{_CJK}]+|[^\\W{_CJK}]+")
+_CJK_RE = re.compile(f"[{_CJK}]")
+
+# カタカナをひらがなに寄せて「サクラ」と「さくら」を同一視する
+_KANA_TABLE = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+# 英数字の単語は先頭 2〜4 文字をキーにする
+# （1文字のクエリはほぼ全曲に一致するため、索引を使わず全件を照合する）
+_MIN_KEY_LENGTH = 2
+_MAX_KEY_LENGTH = 4
+
+
+def normalize_text(text):
+    """全角/半角・大文字/小文字・カタカナ/ひらがなの違いを吸収する"""
+    return unicodedata.normalize("NFKC", text).casefold().translate(_KANA_TABLE)
+
+
+def _split_parts(text):
+    """正規化済みの文字列を単語（かな・漢字は連続部分ごと）に分ける"""
+    return _PART_RE.findall(text)
+
+
+def _is_cjk(part):
+    return _CJK_RE.match(part) is not None
+
+
+class SearchIndex:
+    """
+    プレイリストのインクリメンタル検索用の転置インデックス。
+
+    英数字の単語は先頭 2〜4 文字を、かな・漢字は1文字ずつをキーにして
+    曲のスロット番号を記録します。検索時は最も件数の少ないキーで候補を絞り、
+    候補だけを正規化済み文字列で照合するため、全曲を走査しません。
+
+    照合の規則は「英数字の語は単語の先頭一致、かな・漢字は部分一致、
+    空白区切りの複数語はすべてを満たす（AND）」です。
+    """
+
+    def __init__(self):
+        # キー -> スロット番号の array（削除は照合時に除外する遅延方式）
+        self._postings = {}
+        # スロット番号 -> 照合用の正規化済み文字列（" 単語 単語 ..." の形、空きは ""）
+        self._texts = []
+        self._count = 0
+        # 削除済みで postings に残っている件数
+        self._garbage = 0
+        # 直前の検索結果（入力を1文字ずつ伸ばす場合の絞り込みに使う）
+        self._last_query = None
+        self._last_result = None
+
+    def add(self, slot, metadata):
+        """曲を索引に追加する（スロットが使用中なら置き換える）"""
+        parts = []
+        for field in SEARCH_FIELDS:
+            value = metadata.get(field)
+            if isinstance(value, str):
+                parts.extend(_split_parts(normalize_text(value)))
+
+        texts = self._texts
+        if slot >= len(texts):
+            texts.extend([""] * (slot + 1 - len(texts)))
+        if texts[slot]:
+            self.remove(slot)
+        texts[slot] = " " + " ".join(parts)
+        self._count += 1
+
+        postings = self._postings
+        for key in self._keys_for(parts):
+            posting = postings.get(key)
+            if posting is None:
+                posting = postings[key] = array("i")
+            posting.append(slot)
+        self._last_query = None
+
+    def remove(self, slot):
+        """曲を索引から外す"""
+        if slot < len(self._texts) and self._texts[slot]:
+            self._texts[slot] = ""
+            self._count -= 1
+            self._garbage += 1
+            self._last_query = None
+            # 削除済みの記録が増えすぎたら作り直してメモリを回収する
+            if self._garbage > max(1024, self._count):
+                self._compact()
+
+    def clear(self):
+        self.__init__()
+
+    def __len__(self):
+        return self._count
+
+    @staticmethod
+    def _keys_for(parts):
+        keys = set()
+        for part in parts:
+            if _is_cjk(part):
+                keys.update(part)
+            else:
+                for n in range(_MIN_KEY_LENGTH, min(len(part), _MAX_KEY_LENGTH) + 1):
+                    keys.add(part[:n])
+        return keys
+
+    def search(self, query):
+        """
+        クエリに一致する曲のスロット番号の集合を返す。
+        空のクエリの場合は None（絞り込みなし）を返します。
+        """
+        parts = _split_parts(normalize_text(query))
+        if not parts:
+            return None
+
+        candidates, exact = self._candidates(parts)
+        normalized = " ".join(parts)
+        if (
+            self._last_query is not None
+            and normalized.startswith(self._last_query)
+            and len(self._last_result) < len(candidates)
+        ):
+            # 直前のクエリを伸ばしただけなら、前回の結果から絞り込む
+            candidates, exact = self._last_result, False
+
+        if exact and not self._garbage:
+            result = set(candidates)
+        else:
+            result = self._verify(candidates, parts)
+
+        self._last_query = normalized
+        self._last_result = result
+        return result
+
+    def _candidates(self, parts):
+        """
+        最も件数の少ないキーの posting を候補として返す。
+        2つ目の値は、その posting がそのままクエリの答えになるかどうか。
+        """
+        best = None
+        best_is_part = False
+        for part in parts:
+            if _is_cjk(part):
+                keys = part
+            elif len(part) >= _MIN_KEY_LENGTH:
+                keys = (part[:_MAX_KEY_LENGTH],)
+            else:
+                continue
+            for key in keys:
+                posting = self._postings.get(key)
+                if posting is None:
+                    return (), True
+                if best is None or len(posting) < len(best):
+                    best = posting
+                    best_is_part = key == part
+        if best is None:
+            # 1文字の英数字だけのクエリは全曲が候補
+            return range(len(self._texts)), False
+        return best, best_is_part and len(parts) == 1
+
+    def _verify(self, candidates, parts):
+        """候補を正規化済み文字列で照合する（削除済み・再利用されたスロットもここで除く）"""
+        # 英数字の語は直前の空白を含めて探すことで単語の先頭一致にする
+        needles = [part if _is_cjk(part) else " " + part for part in parts]
+        # 長い（絞り込みの効きやすい）語から順に候補を減らしていく
+        needles.sort(key=len, reverse=True)
+        texts = self._texts
+        matched = candidates
+        for needle in needles:
+            matched = [slot for slot in matched if needle in texts[slot]]
+        return set(matched)
+
+    def _compact(self):
+        texts = self._texts
+        for key in list(self._postings):
+            posting = array("i", (slot for slot in self._postings[key] if texts[slot]))
+            if posting:
+                self._postings[key] = posting
+            else:
+                del self._postings[key]
+        self._garbage = 0
@@ -0,0 +1,114 @@
+import json
+import os
+
+# セッションファイルの形式が変わったら上げる（古いファイルは読み捨てる）
+SESSION_VERSION = 1
+
+
+def save_session(path, manager, state):
+    """
+    プレイリストと再生状態（現在の曲・再生位置・音量・EQ など）を保存する。
+
+    曲は1曲ずつの辞書ではなく項目ごとの配列として書き出すため、
+    10万曲でもファイルが小さく、読み込みも配列の連結だけで済みます。
+    """
+    data = {
+        "version": SESSION_VERSION,
+        "state": state,
+        "songs": manager.export_songs(),
+    }
+    try:
+        # 書きかけのファイルを読まないよう、一時ファイル経由で置き換える
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Session save error ({path}): {e}")
+
+
+def load_session(path):
+    """
+    保存したセッションを読み込み、(曲データ, 再生状態の辞書) を返す。
+    曲データは PlaylistManager.import_songs() にそのまま渡せます。
+    ファイルが無い・壊れている・形式が古い場合は None を返します。
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != SESSION_VERSION:
+            return None
+        songs = data["songs"]
+        state = data.get("state")
+    except (OSError, KeyError, TypeError, ValueError, AttributeError) as e:
+        print(f"Session load error ({path}): {e}")
+        return None
+
+    # 途中で切れた・手で書き換えたファイルでも起動できるよう、曲データが
+    # 壊れていれば空のプレイリストにする（再生状態は読めた項目だけ使われる）
+    if not _is_valid_songs(songs):
+        print(f"Session load error ({path}): invalid song data")
+        songs = {"count": 0}
+    return songs, state if isinstance(state, dict) else {}
+
+
+def _is_list(value, count):
+    return isinstance(value, list) and len(value) == count
+
+
+def _is_valid_songs(songs):
+    """曲データが import_songs() に渡せる形（配列の長さ・番号の範囲）になっているか"""
+    if not isinstance(songs, dict):
+        return False
+    count = songs.get("count")
+    if type(count) is not int or count < 0:
+        return False
+    columns = songs.get("columns")
+    missing = songs.get("missing", {})
+    extras = songs.get("extras", {})
+    if not all(isinstance(value, dict) for value in (columns, missing, extras)):
+        return False
+
+    for values in columns.values():
+        if isinstance(values, dict):
+            distinct = values.get("values")
+            codes = values.get("codes")
+            if not isinstance(distinct, list) or not _is_list(codes, count):
+                return False
+            if not all(
+                type(code) is int and 0 <= code < len(distinct) for code in codes
+            ):
+                return False
+            values = distinct
+        elif not _is_list(values, count):
+            return False
+        # 列の項目（パス・タイトルなど）は1つの値（パスは索引のキーにもなる）
+        if any(isinstance(value, (list, dict)) for value in values):
+            return False
+    for rows in missing.values():
+        if not isinstance(rows, list) or not all(
+            type(row) is int and 0 <= row < count for row in rows
+        ):
+            return False
+    for row, extra in extras.items():
+        if not (row.isdecimal() and int(row) < count and isinstance(extra, dict)):
+            return False
+
+    durations = songs.get("durations")
+    if durations is not None and not (
+        _is_list(durations, count)
+        and all(
+            value is None or (type(value) is int and 0 <= value < 1 << 62)
+            for value in durations
+        )
+    ):
+        return False
+    added_at = songs.get("added_at")
+    if added_at is not None and not (
+        _is_list(added_at, count)
+        and all(type(value) in (int, float) for value in added_at)
+    ):
+        return False
+    return True
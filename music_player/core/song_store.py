@@ -0,0 +1,326 @@
+import sys
+from array import array
+from collections.abc import Sequence
+
+# 列として保持するメタデータ項目（それ以外のキーは曲ごとの辞書に入れる）
+STRING_FIELDS = ("file_path", "title", "artist", "album", "composer", "art_key")
+# 同じ値が多くの曲で繰り返されるため、intern して1つの文字列を共有する項目
+INTERNED_FIELDS = ("artist", "album", "composer", "art_key")
+
+# 列の中で「キーそのものが無い」ことを表す印
+_MISSING = object()
+# 再生時間の列で「キーが無い」ことを表す値
+_NO_DURATION = -1
+
+
+class SongStore:
+    """
+    楽曲メタデータを列指向で保持するストア。
+
+    曲ごとに辞書を作る代わりに、項目ごとのリスト（文字列は intern して共有）と
+    array（再生時間・曲ID）に値を並べて持ちます。各曲は「スロット番号」で
+    参照し、削除されたスロットは次の追加で再利用します。
+    """
+
+    def __init__(self):
+        self._columns = {field: [] for field in STRING_FIELDS}
+        self._durations = array("q")
+        # スロットごとの曲ID（空きスロットは -1）
+        self._ids = array("q")
+        # 曲ID -> スロット
+        self._slots = {}
+        # 列に収まらないキーを持つ曲だけの追加項目 {スロット: dict}
+        self._extras = {}
+        self._free = []
+        self._next_id = 0
+
+    def add(self, metadata):
+        """メタデータを登録してスロット番号を返す"""
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._ids)
+            for column in self._columns.values():
+                column.append(_MISSING)
+            self._durations.append(_NO_DURATION)
+            self._ids.append(-1)
+
+        self._ids[slot] = self._next_id
+        self._slots[self._next_id] = slot
+        self._next_id += 1
+        for key, value in metadata.items():
+            self.set(slot, key, value)
+        return slot
+
+    def replace(self, slot, metadata):
+        """スロットの曲のメタデータを丸ごと置き換える（曲IDはそのまま）"""
+        self._reset(slot)
+        for key, value in metadata.items():
+            self.set(slot, key, value)
+
+    def free(self, slot):
+        """スロットを解放する（値への参照も手放す）"""
+        self._reset(slot)
+        self._slots.pop(self._ids[slot], None)
+        self._ids[slot] = -1
+        self._free.append(slot)
+
+    def _reset(self, slot):
+        for column in self._columns.values():
+            column[slot] = _MISSING
+        self._durations[slot] = _NO_DURATION
+        self._extras.pop(slot, None)
+
+    def clear(self):
+        # 曲IDは振り直さない（消す前に取得したビューを無効のままにする）
+        next_id = self._next_id
+        self.__init__()
+        self._next_id = next_id
+
+    def id_of(self, slot):
+        return self._ids[slot]
+
+    @property
+    def next_id(self):
+        """次に登録される曲に振る曲ID（曲IDは登録順に増えていく）"""
+        return self._next_id
+
+    def slot_of(self, song_id):
+        """曲IDのスロット番号（削除済み・未登録なら None）"""
+        return self._slots.get(song_id)
+
+    def get(self, slot, key):
+        """値を返す。キーが無い場合は KeyError"""
+        column = self._columns.get(key)
+        if column is not None:
+            value = column[slot]
+        elif key == "duration" and self._durations[slot] != _NO_DURATION:
+            value = self._durations[slot]
+        else:
+            value = self._extras.get(slot, {}).get(key, _MISSING)
+
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def set(self, slot, key, value):
+        column = self._columns.get(key)
+        if column is not None:
+            if key in INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            column[slot] = value
+        elif key == "duration" and type(value) is int and value >= 0:
+            self._durations[slot] = value
+            self._extras.get(slot, {}).pop("duration", None)
+        else:
+            # 整数でない再生時間などは追加項目として保持する
+            if key == "duration":
+                self._durations[slot] = _NO_DURATION
+            self._extras.setdefault(slot, {})[key] = value
+
+    def keys(self, slot):
+        """スロットに存在するキーを列挙する"""
+        for field, column in self._columns.items():
+            if column[slot] is not _MISSING:
+                yield field
+        if self._durations[slot] != _NO_DURATION:
+            yield "duration"
+        yield from self._extras.get(slot, ())
+
+    def to_dict(self, slot):
+        return {key: self.get(slot, key) for key in self.keys(slot)}
+
+    def values(self, key, slots, default=None):
+        """複数スロットの値を列から直接まとめて取り出す（行ごとのビューを作らない）"""
+        column = self._columns.get(key)
+        if column is not None:
+            return [
+                default if value is _MISSING else value
+                for value in map(column.__getitem__, slots)
+            ]
+        if key == "duration" and not self._extras:
+            durations = self._durations
+            return [
+                default if value == _NO_DURATION else value
+                for value in map(durations.__getitem__, slots)
+            ]
+        return [self.row(slot).get(key, default) for slot in slots]
+
+    def row(self, slot):
+        return SongRow(self, slot, self._ids[slot])
+
+    def export_columns(self, slots):
+        """
+        指定したスロットの曲を項目ごとのリストにまとめる（セッションの保存用）。
+        キーが無い箇所は None にして、その行番号を "missing" に記録します。
+        """
+        columns = {}
+        missing = {}
+        for field, column in self._columns.items():
+            values = list(map(column.__getitem__, slots))
+            rows = [i for i, value in enumerate(values) if value is _MISSING]
+            for i in rows:
+                values[i] = None
+            if rows:
+                missing[field] = rows
+            if field in INTERNED_FIELDS:
+                # 繰り返しの多い項目は「値の一覧 + 番号の列」にして小さくする
+                index = {}
+                codes = [index.setdefault(value, len(index)) for value in values]
+                values = {"values": list(index), "codes": codes}
+            columns[field] = values
+        durations = [
+            None if value == _NO_DURATION else value
+            for value in map(self._durations.__getitem__, slots)
+        ]
+        extras = {
+            str(i): self._extras[slot]
+            for i, slot in enumerate(slots)
+            if slot in self._extras
+        }
+        return {
+            "count": len(slots),
+            "columns": columns,
+            "missing": missing,
+            "durations": durations,
+            "extras": extras,
+        }
+
+    def import_columns(self, data):
+        """
+        export_columns() の結果をまとめて末尾のスロットに登録し、スロット番号のリストを返す。
+        曲ごとに add() するより速く、10万曲でも列の連結だけで済みます。
+        """
+        count = data["count"]
+        start = len(self._ids)
+        columns = data.get("columns", {})
+        missing = data.get("missing", {})
+        for field, column in self._columns.items():
+            values = columns.get(field)
+            if values is None:
+                column.extend([_MISSING] * count)
+                continue
+            if isinstance(values, dict):
+                # 値の一覧を引くだけなので、同じ文字列は1つのオブジェクトを共有する
+                distinct = [
+                    sys.intern(v) if type(v) is str else v for v in values["values"]
+                ]
+                values = map(distinct.__getitem__, values["codes"])
+            column.extend(values)
+            for i in missing.get(field, ()):
+                column[start + i] = _MISSING
+
+        durations = data.get("durations") or [None] * count
+        self._durations.extend(
+            _NO_DURATION if value is None else value for value in durations
+        )
+        ids = range(self._next_id, self._next_id + count)
+        self._ids.extend(ids)
+        self._slots.update(zip(ids, range(start, start + count)))
+        self._next_id += count
+        for i, extra in data.get("extras", {}).items():
+            self._extras[start + int(i)] = dict(extra)
+        return list(range(start, start + count))
+
+
+class SongRow:
+    """
+    SongStore の1曲分を辞書のように読み書きするための軽量なビュー。
+    曲が削除された後のビューは無効になり、読み出すと LookupError になります。
+    """
+
+    __slots__ = ("_store", "_slot", "_id")
+
+    def __init__(self, store, slot, song_id):
+        self._store = store
+        self._slot = slot
+        self._id = song_id
+
+    @property
+    def song_id(self):
+        return self._id
+
+    def is_valid(self):
+        """ビューが指す曲がまだストアに存在するか"""
+        slot = self._slot
+        return slot < len(self._store._ids) and self._store._ids[slot] == self._id
+
+    def _checked_slot(self):
+        if not self.is_valid():
+            raise LookupError("song has been removed from the playlist")
+        return self._slot
+
+    def __getitem__(self, key):
+        return self._store.get(self._checked_slot(), key)
+
+    def __setitem__(self, key, value):
+        # 別スレッドの先読み等が削除済みの曲へ書き込んでも無視する
+        if self.is_valid():
+            self._store.set(self._slot, key, value)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def keys(self):
+        return list(self._store.keys(self._checked_slot()))
+
+    def items(self):
+        slot = self._checked_slot()
+        return [(key, self._store.get(slot, key)) for key in self._store.keys(slot)]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def to_dict(self):
+        return self._store.to_dict(self._checked_slot())
+
+    def __eq__(self, other):
+        if isinstance(other, SongRow):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        if not self.is_valid():
+            return "SongRow(<removed>)"
+        return f"SongRow({self.to_dict()!r})"
+
+
+class SongSequence(Sequence):
+    """プレイリストの並び順（スロット番号の配列）を SongRow の列として見せるビュー"""
+
+    def __init__(self, store, order):
+        self._store = store
+        self._order = order
+
+    def __len__(self):
+        return len(self._order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._store.row(slot) for slot in self._order[index]]
+        return self._store.row(self._order[index])
+
+    def __iter__(self):
+        row = self._store.row
+        for slot in self._order:
+            yield row(slot)
+
+    def __repr__(self):
+        return f"SongSequence(len={len(self)})"
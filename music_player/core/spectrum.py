@@ -0,0 +1,63 @@
+import threading
+from PySide6.QtCore import QObject, Signal
+from dsp.analyzer import SpectrumAnalyzer
+
+
+class SpectrumWorker(QObject):
+    """
+    再生中の音のスペクトルを専用スレッドで解析し、GUI スレッドへ届けるクラス。
+
+    feed() を PcmAudioEngine の taps に登録すると、出力デバイスへ渡す直前の
+    サンプルがリングバッファへ書き込まれます（GUI スレッドではコピーだけ）。
+    解析スレッドは frame_rate 回/秒だけ起きて、前回から新しい音が届いていれば
+    直近の窓を FFT し、spectrum_ready で届けます。
+    """
+
+    # (各バンドのレベル [dB] の配列, 各バンドの中心周波数 (Hz) の配列)
+    spectrum_ready = Signal(object, object)
+
+    def __init__(self, fft_size=2048, bands=32, frame_rate=30):
+        super().__init__()
+        self.fft_size = fft_size
+        self.bands = bands
+        self.frame_rate = frame_rate
+        self._analyzer = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def feed(self, samples, rate):
+        """出力する PCM（(フレーム数, チャンネル数) の float）を受け取る"""
+        analyzer = self._analyzer
+        if analyzer is None or analyzer.sample_rate != rate:
+            # サンプリングレートが変わったら作り直す（差し替えは1回の代入で済ませる）
+            analyzer = SpectrumAnalyzer(rate, self.fft_size, self.bands)
+            self._analyzer = analyzer
+        analyzer.write(samples)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def _run(self):
+        interval = 1.0 / self.frame_rate
+        while not self._stop.wait(interval):
+            analyzer = self._analyzer
+            # 一時停止中などで新しい音が無ければ解析しない
+            if analyzer is None or analyzer.pending == 0:
+                continue
+            try:
+                levels = analyzer.analyze()
+            except Exception as e:
+                print(f"Spectrum analysis error: {e}")
+                continue
+            self.spectrum_ready.emit(levels, analyzer.frequencies)
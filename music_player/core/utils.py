@@ -15,3 +15,18 @@ def get_asset_path(relative_path):
     # 通常の Python スクリプトとして動いている場合
     # プロジェクトのルートディレクトリを基準にします
     return os.path.join(os.path.abspath("."), relative_path)
+
+
+def get_user_data_dir():
+    """
+    キャッシュやセッションなど、ユーザーごとのファイルを保存するディレクトリを返します。
+    ディレクトリ (~/.music_player) が無ければ作成します。
+    """
+    data_dir = os.path.join(os.path.expanduser("~"), ".music_player")
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
+
+
+def get_user_data_path(filename):
+    """ユーザーデータディレクトリ内のファイルパスを返します。"""
+    return os.path.join(get_user_data_dir(), filename)
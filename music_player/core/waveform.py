@@ -0,0 +1,99 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from PySide6.QtCore import QObject, Signal
+from dsp.waveform import (
+    WAVEFORM_VERSION,
+    PeakAccumulator,
+    waveform_from_bytes,
+    waveform_to_bytes,
+)
+from .analysis import iter_analysis
+from .decoder import DecodeError, open_audio
+
+# MetadataCache の解析結果として保存する時の種類名
+WAVEFORM_KIND = f"waveform:{WAVEFORM_VERSION}"
+
+
+def compute_waveform(file_path, block_frames=1 << 18, cancelled=None):
+    """
+    音声ファイル全体の波形の概形（区間ごとの最小値・最大値の多段解像度）を求め、
+    保存用のバイト列で返す（デコードできなければ None）。
+    cancelled() がブロックの合間に True を返したら、デコードをやめて None を返します。
+    """
+    try:
+        with open_audio(file_path) as f:
+            if f.frames <= 0:
+                return None
+            peaks = PeakAccumulator(f.frames)
+            for block in f.blocks(block_frames, dtype="float32", always_2d=True):
+                if cancelled is not None and cancelled():
+                    return None
+                peaks.add(block)
+    except (DecodeError, RuntimeError, OSError) as e:
+        print(f"Waveform error ({file_path}): {e}")
+        return None
+    return waveform_to_bytes(peaks.levels())
+
+
+class WaveformLoader(QObject):
+    """
+    シークバーに描く波形の概形をバックグラウンドで用意するクラス。
+
+    MetadataCache に保存済みならそれを読むだけで、無ければ1本のワーカースレッドで
+    デコードして計算し、保存します。再生の開始は待たせません。
+    曲を送ると前の曲の計算はブロックの合間で打ち切るので、デコードが溜まりません。
+    """
+
+    # (パス, [(最小値, 最大値), ...])
+    waveform_ready = Signal(str, object)
+
+    # ワーカースレッドからの内部通知（ジョブIDを付けて古い結果を捨てる）
+    _loaded = Signal(int, str, object)
+
+    def __init__(self, cache=None):
+        super().__init__()
+        self.cache = cache
+        self._job_id = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+
+        self._loaded.connect(self._on_loaded)
+
+    def load(self, file_path):
+        """file_path の波形を用意する。前の曲の読み込みは結果を捨てます"""
+        with self._lock:
+            self._job_id += 1
+            job_id = self._job_id
+        if self._pending is not None:
+            self._pending.cancel()
+        self._pending = self._executor.submit(self._run, job_id, file_path)
+
+    def cancel(self):
+        with self._lock:
+            self._job_id += 1
+
+    def shutdown(self):
+        """計算中の波形を打ち切り、ワーカーを停止する"""
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job_id, file_path):
+        analyze = partial(compute_waveform, cancelled=lambda: self._job_id != job_id)
+        levels = None
+        try:
+            for _, data in iter_analysis(
+                [file_path], WAVEFORM_KIND, analyze, self.cache, max_workers=1
+            ):
+                levels = waveform_from_bytes(data) if data is not None else None
+        except Exception as e:
+            print(f"Waveform load error ({file_path}): {e}")
+            return
+        if levels is not None:
+            self._loaded.emit(job_id, file_path, levels)
+
+    # --- 以下は GUI スレッドで実行される ---
+    def _on_loaded(self, job_id, file_path, levels):
+        if job_id == self._job_id:
+            self.waveform_ready.emit(file_path, levels)
@@ -0,0 +1,116 @@
+import threading
+from functools import lru_cache
+import numpy as np
+
+# これより小さいレベルは無音として扱う [dB]
+SILENCE_DB = -100.0
+
+
+@lru_cache(maxsize=8)
+def hann_window(size):
+    """FFT 用のハニング窓（同じ長さは作り直さない。書き換え不可）"""
+    window = np.hanning(size + 1)[:-1]
+    window.flags.writeable = False
+    return window
+
+
+def log_band_edges(bands, min_freq, max_freq):
+    """min_freq から max_freq までを対数で等間隔に bands 個に分けた境界 (Hz)"""
+    return np.geomspace(min_freq, max_freq, bands + 1)
+
+
+def band_matrix(fft_size, sample_rate, edges):
+    """
+    FFT のビンのパワーを対数間隔のバンドにまとめる行列（形状 (バンド数, ビン数)）。
+
+    バンドに入るビンはすべて足し合わせます。低域ではバンドの幅がビンの間隔より
+    狭くなるので、ビンを含まないバンドは中心周波数の両隣のビンから線形補間します。
+    """
+    bins = np.fft.rfftfreq(fft_size, 1.0 / sample_rate)
+    spacing = bins[1]
+    matrix = np.zeros((len(edges) - 1, len(bins)))
+    for band, (low, high) in enumerate(zip(edges[:-1], edges[1:])):
+        inside = (bins >= low) & (bins < high)
+        if inside.any():
+            matrix[band, inside] = 1.0
+            continue
+        position = min(np.sqrt(low * high) / spacing, len(bins) - 1.0)
+        index = min(int(position), len(bins) - 2)
+        fraction = position - index
+        matrix[band, index] = 1.0 - fraction
+        matrix[band, index + 1] = fraction
+    return matrix
+
+
+class SpectrumAnalyzer:
+    """
+    PCM を少しずつ受け取り、直近 fft_size サンプルのスペクトルを対数間隔の
+    バンドごとのレベル [dB] で返すストリーミング解析器。
+
+    write() は受け取ったサンプルをモノラルにして、あらかじめ確保したリング
+    バッファへ書くだけです。FFT は analyze() を呼んだ時（表示の1フレームに1回）
+    だけ行うので、流れてくる音の量が多くても解析の計算量は増えません。
+    write() と analyze() は別のスレッドから呼んでかまいません。
+
+    レベルはフルスケールの正弦波が 0 dB になるように正規化しています。
+    """
+
+    def __init__(
+        self,
+        sample_rate,
+        fft_size=2048,
+        bands=32,
+        min_freq=20.0,
+        max_freq=20000.0,
+    ):
+        self.sample_rate = sample_rate
+        self.fft_size = fft_size
+        max_freq = min(max_freq, sample_rate / 2)
+        self.edges = log_band_edges(bands, min_freq, max_freq)
+        # 表示用の各バンドの中心周波数 (Hz)
+        self.frequencies = np.sqrt(self.edges[:-1] * self.edges[1:])
+        self._matrix = band_matrix(fft_size, sample_rate, self.edges)
+        window = hann_window(fft_size)
+        # 片側スペクトルのパワーを、振幅 1 の正弦波が 1 になるよう揃える
+        self._scale = 4.0 / (fft_size * np.sum(window**2))
+
+        # 2周分の長さを持ち、同じ内容を2か所に書いて常に連続した窓を切り出せるようにする
+        self._ring = np.zeros(2 * fft_size, dtype=np.float32)
+        self._position = 0
+        self._frame = np.empty(fft_size)
+        self._lock = threading.Lock()
+        # 前回 analyze() してから書き込まれたサンプル数
+        self.pending = 0
+
+    def reset(self):
+        with self._lock:
+            self._ring[:] = 0.0
+            self.pending = 0
+
+    def write(self, samples):
+        """(フレーム数, チャンネル数) のサンプルを書き込む"""
+        mono = samples.mean(axis=1) if samples.ndim == 2 else samples
+        # 窓より長いブロックは最後の fft_size サンプルだけ残せば足りる
+        mono = mono[-self.fft_size :]
+        size = self.fft_size
+        with self._lock:
+            start = self._position
+            first = min(len(mono), size - start)
+            for offset in (0, size):
+                self._ring[offset + start : offset + start + first] = mono[:first]
+                self._ring[offset : offset + len(mono) - first] = mono[first:]
+            self._position = (start + len(mono)) % size
+            self.pending += len(samples)
+
+    def analyze(self):
+        """直近 fft_size サンプルのバンドごとのレベル [dB] を返す"""
+        with self._lock:
+            np.multiply(
+                self._ring[self._position : self._position + self.fft_size],
+                hann_window(self.fft_size),
+                out=self._frame,
+            )
+            self.pending = 0
+        power = np.abs(np.fft.rfft(self._frame)) ** 2 * self._scale
+        levels = self._matrix @ power
+        return 10.0 * np.log10(np.maximum(levels, 10 ** (SILENCE_DB / 10.0)))
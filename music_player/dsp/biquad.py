@@ -0,0 +1,169 @@
+import numpy as np
+from .kernels import (
+    NUMBA_BACKEND,
+    available_backends,
+    default_backend,
+    sosfilt_inplace,
+)
+
+
+def sos_to_state_space(sos):
+    """
+    2次セクション（各行 [b0, b1, b2, a1, a2]）の縦続接続を、状態空間表現
+    (A, B, C, D) にまとめる。
+
+    各セクションは転置ダイレクトフォーム II で、状態はセクションの順に
+    2個ずつ並びます（sosfilt_direct の state と同じ並び）。
+    """
+    sos = np.atleast_2d(np.asarray(sos, dtype=np.float64))
+    A = np.zeros((0, 0))
+    B = np.zeros(0)
+    C = np.zeros(0)
+    D = 1.0
+    for b0, b1, b2, a1, a2 in sos:
+        # y = b0 x + s1,  s1' = (b1 - a1 b0) x - a1 s1 + s2,  s2' = (b2 - a2 b0) x - a2 s1
+        A2 = np.array([[-a1, 1.0], [-a2, 0.0]])
+        B2 = np.array([b1 - a1 * b0, b2 - a2 * b0])
+        C2 = np.array([1.0, 0.0])
+        # 前段までの出力 y = C s + D x を次のセクションの入力にする
+        n = len(B)
+        A = np.block([[A, np.zeros((n, 2))], [np.outer(B2, C), A2]])
+        B = np.concatenate([B, B2 * D])
+        C = np.concatenate([b0 * C, C2])
+        D = b0 * D
+    return A, B, C, D
+
+
+def sosfilt_direct(sos, samples, state=None):
+    """
+    SOS をサンプルごとの差分方程式どおりに掛ける参照実装（遅いので検証用）。
+
+    samples は (フレーム数, チャンネル数)、state は (2 * セクション数, チャンネル数)
+    で、(出力, 処理後の state) を返します。
+    """
+    sos = np.atleast_2d(np.asarray(sos, dtype=np.float64))
+    y = np.array(samples, dtype=np.float64)
+    if state is None:
+        state = np.zeros((2 * len(sos), y.shape[1]))
+    state = np.array(state, dtype=np.float64)
+    for section, (b0, b1, b2, a1, a2) in enumerate(sos):
+        s1, s2 = state[2 * section], state[2 * section + 1]
+        for n in range(len(y)):
+            x = y[n].copy()
+            y[n] = b0 * x + s1
+            s1, s2 = b1 * x - a1 * y[n] + s2, b2 * x - a2 * y[n]
+        state[2 * section], state[2 * section + 1] = s1, s2
+    return y, state
+
+
+class BiquadCascade:
+    """
+    SOS（2次セクションの縦続接続）を多チャンネルのブロックに掛けるフィルタ。
+
+    サンプルごとの再帰を Python で回す代わりに、縦続接続全体を1つの状態空間
+    表現にまとめ、block_size サンプルずつの「ブロック状態空間」で計算します。
+    ブロック内の出力はインパルス応答のテプリッツ行列と初期状態の寄与の和に
+    なるため、行列積（BLAS）にまとめて掛けられます。Python のループは
+    ブロックごとの状態の更新（block_size サンプルに1回）だけです。
+    フィルタの状態は process() の呼び出しをまたいで引き継ぎます。
+
+    Numba がある環境では、既定でサンプルごとの再帰をコンパイルしたカーネル
+    （backend="numba"）を使います（warm_up() でのコンパイルが済んでから）。
+    backend="numpy" で上記の計算に固定できます。
+    """
+
+    def __init__(self, sos, channels, block_size=128, backend=None):
+        if backend is None:
+            backend = default_backend()
+        elif backend not in available_backends():
+            raise ValueError(f"Filter backend is not available: {backend}")
+        self.backend = backend
+        self.channels = channels
+        self.block_size = block_size
+        self.set_sos(sos)
+
+    def set_sos(self, sos):
+        """
+        係数を差し替える。セクション数が同じなら状態はそのまま引き継ぎます
+        （セクションごとの状態の意味は係数が変わっても同じため）。
+        """
+        self.sos = np.atleast_2d(np.asarray(sos, dtype=np.float64))
+        self._A, self._B, self._C, self._D = sos_to_state_space(self.sos)
+        # ブロック長ごとの行列（端数のブロック用にも作るので辞書で持つ）
+        self._matrices = {}
+        order = len(self._B)
+        if getattr(self, "state", None) is None or self.state.shape[0] != order:
+            self.state = np.zeros((order, self.channels))
+
+    def reset(self):
+        """状態を捨てる（曲の切り替え・シーク時）"""
+        self.state = np.zeros_like(self.state)
+
+    def _block_matrices(self, length):
+        matrices = self._matrices.get(length)
+        if matrices is not None:
+            return matrices
+        A, B, C, D = self._A, self._B, self._C, self._D
+        order = len(B)
+        # observe[k] = C A^k（初期状態の寄与）, control[:, k] = A^k B
+        observe = np.empty((length, order))
+        control = np.empty((order, length))
+        row, column = C.copy(), B.copy()
+        for k in range(length):
+            observe[k], control[:, k] = row, column
+            row, column = row @ A, A @ column
+        # インパルス応答 h[0] = D, h[k] = C A^(k-1) B と、そのテプリッツ行列
+        impulse = np.concatenate([[D], observe[: length - 1] @ B])
+        index = np.arange(length)
+        lag = index[:, None] - index[None, :]
+        toeplitz = np.where(lag >= 0, impulse[np.maximum(lag, 0)], 0.0)
+        # ブロック末の状態 = A^L s + Σ A^(L-1-j) B x[j]
+        matrices = (
+            toeplitz,
+            observe,
+            control[:, ::-1].copy(),
+            np.linalg.matrix_power(A, length),
+        )
+        self._matrices[length] = matrices
+        return matrices
+
+    def process(self, samples):
+        """(フレーム数, チャンネル数) のブロックにフィルタを掛けて返す"""
+        if self.backend == NUMBA_BACKEND:
+            y = np.array(samples, dtype=np.float64, order="C")
+            return sosfilt_inplace(self.sos, y, self.state)
+        x = np.asarray(samples, dtype=np.float64)
+        frames = len(x)
+        out = np.empty_like(x)
+        full = frames // self.block_size
+        if full:
+            length = full * self.block_size
+            out[:length] = self._process_blocks(x[:length], self.block_size, full)
+        if frames > full * self.block_size:
+            rest = frames - full * self.block_size
+            out[full * self.block_size :] = self._process_blocks(
+                x[full * self.block_size :], rest, 1
+            )
+        return out
+
+    def _process_blocks(self, x, length, count):
+        toeplitz, observe, control, transition = self._block_matrices(length)
+        channels = x.shape[1]
+        # (ブロック内の位置, ブロック番号 × チャンネル) の行列にしてまとめて掛ける
+        blocks = x.reshape(count, length, channels).transpose(1, 0, 2)
+        blocks = blocks.reshape(length, count * channels)
+        inputs = (control @ blocks).reshape(-1, count, channels)
+
+        # 各ブロック先頭の状態だけは順に求める（ブロックごとに1回の小さな行列積）
+        starts = np.empty((count,) + self.state.shape)
+        state = self.state
+        for k in range(count):
+            starts[k] = state
+            state = transition @ state + inputs[:, k]
+        self.state = state
+
+        starts = starts.transpose(1, 0, 2).reshape(-1, count * channels)
+        y = toeplitz @ blocks + observe @ starts
+        return (
+            y.reshape(length, count, channels).transpose(1, 0, 2).reshape(-1, channels)
+        )
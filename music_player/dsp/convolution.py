@@ -0,0 +1,146 @@
+import numpy as np
+
+
+class PartitionedConvolver:
+    """
+    長い FIR フィルタを多チャンネルのブロックに掛ける、一様分割の
+    overlap-save 方式の FFT 畳み込み。
+
+    フィルタを partition_size ごとに分割してそれぞれの FFT を持ち、入力も
+    partition_size ごとに FFT して周波数領域の遅延線に貯めます。出力は
+    遅延線とフィルタの積和を逆 FFT するだけなので、タップ数が長くても
+    1サンプルあたりの計算量は分割数に比例する程度で済みます。
+
+    入力は partition_size 単位で処理するため、出力はその分遅れて出てきます。
+    delay には取り除きたいフィルタ自体の遅延（直線位相なら (タップ数 - 1) / 2）を
+    指定し、出力は入力と時刻を揃えて返します。残りは flush() で取り出せます。
+    """
+
+    def __init__(self, kernel, channels, partition_size=1024, delay=0):
+        self.channels = channels
+        self.partition_size = partition_size
+        self.delay = delay
+        self._spectra = self._split(kernel)
+        # set_kernel() の直後の1回だけ、旧フィルタの出力からクロスフェードする
+        self._previous_spectra = None
+        self.reset()
+
+    @property
+    def latency(self):
+        """入力してから出力に現れるまでのフレーム数（分割による遅れ + delay）"""
+        return self.partition_size + self.delay
+
+    @property
+    def pending(self):
+        """入力済みで、まだ出力していないフレーム数"""
+        return self._inputs - self._emitted
+
+    def _split(self, kernel):
+        size = self.partition_size
+        kernel = np.asarray(kernel, dtype=np.float64)
+        count = max(1, -(-len(kernel) // size))
+        parts = np.zeros((count, 2 * size))
+        parts[:, :size] = np.pad(kernel, (0, count * size - len(kernel))).reshape(
+            count, size
+        )
+        # 周波数ビンごとの行列積にするため (周波数, 1, 分割数) に並べる
+        return np.ascontiguousarray(np.fft.rfft(parts, axis=1).T[:, None, :])
+
+    def set_kernel(self, kernel):
+        """フィルタを差し替える（長さが変わらなければ入力の履歴は引き継ぐ）"""
+        spectra = self._split(kernel)
+        if spectra.shape != self._spectra.shape:
+            self._spectra = spectra
+            self.reset()
+            return
+        self._previous_spectra = self._spectra
+        self._spectra = spectra
+
+    def reset(self):
+        size = self.partition_size
+        # 周波数領域の遅延線。同じ内容を2周分持ち、[head:head + 分割数] が
+        # 新しい順の並びになるようにする（毎回ずらしてコピーしないため）
+        count = self._spectra.shape[2]
+        self._delay_line = np.zeros(
+            (size + 1, 2 * count, self.channels), dtype=np.complex128
+        )
+        self._head = 0
+        self._last_input = np.zeros((size, self.channels))
+        self._pending_input = np.zeros((0, self.channels))
+        self._inputs = 0
+        self._emitted = 0
+        # 出力の先頭から捨てるフレーム数（フィルタの遅延の分）
+        self._skip = self.delay
+        self._previous_spectra = None
+
+    def prime(self, history):
+        """
+        history を入力したことにして内部の履歴を埋める（出力は捨てる）。
+        途中から処理を始める時に、次の入力から正しい出力が得られるようにします。
+        """
+        self.reset()
+        self.process(history)
+        produced = self._inputs - len(self._pending_input)
+        self._skip = len(history) + self.delay - produced
+        self._emitted = self._inputs
+
+    def process(self, samples):
+        """(フレーム数, チャンネル数) のブロックを入力し、出せるだけの出力を返す"""
+        size = self.partition_size
+        samples = np.asarray(samples, dtype=np.float64)
+        self._inputs += len(samples)
+        buffer = np.concatenate([self._pending_input, samples])
+        count = len(buffer) // size
+        self._pending_input = buffer[count * size :]
+
+        outputs = []
+        previous = self._previous_spectra
+        for k in range(count):
+            chunk = buffer[k * size : (k + 1) * size]
+            # 最新の入力の FFT を遅延線の先頭に入れる
+            partitions = self._spectra.shape[2]
+            self._head = (self._head - 1) % partitions
+            spectrum = np.fft.rfft(np.concatenate([self._last_input, chunk]), axis=0)
+            self._delay_line[:, self._head] = spectrum
+            self._delay_line[:, self._head + partitions] = spectrum
+            self._last_input = chunk
+            output = self._convolve(self._spectra)
+            if previous is not None:
+                fade = np.arange(k * size + 1, (k + 1) * size + 1)[:, None] / (
+                    count * size
+                )
+                output = self._convolve(previous) * (1.0 - fade) + output * fade
+            outputs.append(output)
+        if count:
+            self._previous_spectra = None
+        return self._emit(outputs)
+
+    def _convolve(self, spectra):
+        recent = self._delay_line[:, self._head : self._head + spectra.shape[2]]
+        spectrum = np.matmul(spectra, recent)[:, 0]
+        return np.fft.irfft(spectrum, axis=0)[self.partition_size :]
+
+    def _emit(self, outputs):
+        if not outputs:
+            return np.zeros((0, self.channels))
+        output = np.concatenate(outputs)
+        skip = min(self._skip, len(output))
+        self._skip -= skip
+        output = output[skip:]
+        self._emitted += len(output)
+        return output
+
+    def flush(self):
+        """入力の続きを無音として、入力済みの分の出力をすべて取り出す"""
+        pending = self.pending
+        outputs = []
+        while pending > 0:
+            output = self.process(np.zeros((self.partition_size, self.channels)))
+            self._inputs -= self.partition_size
+            outputs.append(output)
+            pending -= len(output)
+        output = np.concatenate(outputs) if outputs else np.zeros((0, self.channels))
+        # 無音を入れた分の余りは捨てる
+        output = output[: len(output) + pending]
+        self.reset()
+        return output
@@ -0,0 +1,23 @@
+import numpy as np
+
+
+def equal_power_curves(start, frames, length):
+    """
+    長さ length フレームのクロスフェードのうち、start フレーム目から frames 個分の
+    (前の曲に掛ける倍率, 次の曲に掛ける倍率) を返す。
+
+    cos / sin の曲線なので、2曲のパワーの和はフェード中ずっと 1 のままです
+    （相関の無い曲どうしで、音量が真ん中でへこまない）。
+    """
+    theta = (np.arange(start, start + frames) + 0.5) * (0.5 * np.pi / length)
+    theta = np.minimum(theta, 0.5 * np.pi)
+    return np.cos(theta).astype(np.float32), np.sin(theta).astype(np.float32)
+
+
+def mix_crossfade(outgoing, incoming, start, length, gain=1.0):
+    """
+    同じ長さの2つのブロック（(フレーム数, チャンネル数)）をクロスフェードして混ぜる。
+    gain は次の曲に掛ける倍率（2曲の音量補正の差）です。
+    """
+    fade_out, fade_in = equal_power_curves(start, len(outgoing), length)
+    return outgoing * fade_out[:, None] + incoming * (fade_in * gain)[:, None]
@@ -0,0 +1,260 @@
+import re
+import time
+import numpy as np
+from .biquad import BiquadCascade
+from .convolution import PartitionedConvolver
+from .filter_design import cached_peaking_eq_coefficients, design_linear_phase_fir
+
+# ナイキスト周波数に近すぎるバンドは係数が不安定になるので掛けない
+_MAX_BAND_RATIO = 0.45
+
+# 掛け方: バイカッドの縦続接続（遅延なし）と、同じ振幅特性の直線位相 FIR
+IIR_MODE = "iir"
+LINEAR_PHASE_MODE = "linear_phase"
+EQ_MODES = (IIR_MODE, LINEAR_PHASE_MODE)
+
+
+def parse_frequency(label):
+    """「1kHz」「125Hz」のような表記を周波数 (Hz) に変換する"""
+    match = re.fullmatch(r"\s*([\d.]+)\s*(k?)Hz\s*", label, re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Invalid frequency label: {label}")
+    value = float(match.group(1))
+    return value * 1000 if match.group(2) else value
+
+
+class Equalizer:
+    """
+    グラフィックイコライザ（バンドごとのピーキングEQの縦続接続）。
+
+    PcmStream の処理フックとして (サンプル, サンプリングレート) で呼ばれます。
+    ゲインは GUI スレッドから set_gain() で変更でき、ブロックの間に何度変わっても
+    次のブロックで1回だけ設計し直し、そのブロックの間に新しい特性へ
+    クロスフェードします。
+
+    mode が IIR_MODE の間は、バンドごとの係数（設計結果はキャッシュする）を
+    BiquadCascade で掛けます。ゲインが 0dB のバンドは掛けず、全バンドが
+    0dB の間は入力をそのまま返します。
+    LINEAR_PHASE_MODE の間は、同じ振幅特性の直線位相 FIR を
+    PartitionedConvolver で掛けます（FIR はゲインが変わった時だけ作り直す）。
+    FIR の遅延は差し引いて入力と時刻を揃えるため、出力は latency の分だけ
+    遅れて出てきて、曲の最後の分は flush() で取り出します。
+    """
+
+    def __init__(
+        self,
+        frequencies,
+        q=1.414,
+        block_size=128,
+        mode=IIR_MODE,
+        fir_taps=16383,
+        partition_size=1024,
+    ):
+        self.frequencies = np.asarray(frequencies, dtype=np.float64)
+        self.q = q
+        self.block_size = block_size
+        self.fir_taps = fir_taps
+        self.partition_size = partition_size
+        # 配列ごと差し替えるので、デコードスレッドは常に揃った値を読む
+        self._gains = np.zeros(len(self.frequencies))
+        self._mode = IIR_MODE
+        self.set_mode(mode)
+        # 処理に掛かった時間 / 処理した音の長さ（なめらかにした値）
+        self.cpu_load = 0.0
+        self._stream = None
+        self._active_mode = None
+        self._history = None
+        self._cascade = None
+        # 今の係数を設計した時のゲインと、掛けているバンド
+        self._design = None
+        self._bands = ()
+        self._convolver = None
+        self._fir_gains = None
+
+    @property
+    def gains(self):
+        """各バンドのゲイン [dB]"""
+        return self._gains.copy()
+
+    def set_gain(self, index, gain_db):
+        gains = self._gains.copy()
+        gains[index] = gain_db
+        self._gains = gains
+
+    def set_gains(self, gains_db):
+        gains = np.asarray(gains_db, dtype=np.float64)
+        if gains.shape != self._gains.shape:
+            raise ValueError(f"Expected {len(self._gains)} gains, got {len(gains)}")
+        self._gains = gains.copy()
+
+    @property
+    def mode(self):
+        return self._mode
+
+    def set_mode(self, mode):
+        """掛け方を切り替える（再生中でも次のブロックから切り替わる）"""
+        if mode not in EQ_MODES:
+            raise ValueError(f"Unknown equalizer mode: {mode}")
+        self._mode = mode
+
+    @property
+    def latency(self):
+        """入力してから出力に現れるまでのフレーム数（IIR では 0）"""
+        if self._active_mode != LINEAR_PHASE_MODE or self._convolver is None:
+            return 0
+        return self._convolver.latency
+
+    @property
+    def latency_ms(self):
+        if self._stream is None:
+            return 0
+        return self.latency * 1000 // self._stream[0]
+
+    def reset(self):
+        """フィルタの状態を捨てる（再生開始・シーク時）"""
+        if self._cascade is not None:
+            self._cascade.reset()
+        if self._convolver is not None:
+            self._convolver.reset()
+        self._history = None
+
+    def flush(self):
+        """曲の終わりで、まだ出していない分の出力を取り出す（無ければ None）"""
+        if self._active_mode != LINEAR_PHASE_MODE or self._convolver is None:
+            return None
+        return self._convolver.flush().astype(np.float32)
+
+    def __call__(self, samples, rate):
+        start = time.perf_counter()
+        # スライダーを何度動かしても、反映するのはブロックの頭で読んだ最新の値だけ
+        gains = self._gains
+        mode = self._mode
+        stream = (rate, samples.shape[1])
+        if stream != self._stream:
+            # 曲の切り替えなどで形式が変わった時は、つなぐ音が無いので作り直す
+            self._stream = stream
+            self._active_mode = None
+            self._cascade = self._convolver = self._history = None
+            self._design = self._fir_gains = None
+            self._bands = ()
+
+        switched = self._active_mode is not None and mode != self._active_mode
+        if mode == LINEAR_PHASE_MODE:
+            output = self._linear_phase(samples, gains, switched)
+        else:
+            output = self._iir(samples, gains, switched)
+        self._active_mode = mode
+        self._remember(samples)
+
+        if len(samples):
+            load = (time.perf_counter() - start) * rate / len(samples)
+            self.cpu_load += (load - self.cpu_load) * 0.1
+        return output
+
+    def _remember(self, samples):
+        # モードを切り替えた時に新しい側の状態を作るため、直近の入力を残しておく
+        size = self.fir_taps + self.partition_size
+        if self._history is None or len(samples) >= size:
+            self._history = np.array(samples[-size:], dtype=np.float64)
+        else:
+            self._history = np.concatenate([self._history, samples])[-size:]
+
+    def _recent(self, frames=None):
+        # 直近 frames フレームの入力（None なら残してある分すべて）
+        if self._history is None or frames == 0:
+            return np.zeros((0, self._stream[1]))
+        return self._history if frames is None else self._history[-frames:]
+
+    def _linear_phase(self, samples, gains, switched):
+        fresh = self._convolver is None
+        if fresh or not np.array_equal(gains, self._fir_gains):
+            kernel = design_linear_phase_fir(
+                self.frequencies, self._stream[0], gains, self.q, self.fir_taps
+            )
+            if fresh:
+                self._convolver = PartitionedConvolver(
+                    kernel, self._stream[1], self.partition_size, len(kernel) // 2
+                )
+            else:
+                # 入力の履歴はそのままに、新しい FIR の出力へクロスフェードする
+                self._convolver.set_kernel(kernel)
+            self._fir_gains = gains
+        if switched:
+            # IIR から切り替えた時は、直近の入力で履歴を埋めて続きから出力する
+            self._convolver.prime(self._recent())
+        return self._convolver.process(samples).astype(np.float32)
+
+    def _iir(self, samples, gains, switched):
+        prefix = None
+        if switched:
+            # 直線位相から切り替えた時は、FIR がまだ出していない分を IIR で出し、
+            # その前の入力で IIR の状態を作っておく
+            pending = self._convolver.pending if self._convolver is not None else 0
+            self._cascade, self._bands = self._redesign(gains, None)
+            self._design = tuple(gains)
+            warm = self._recent()
+            if self._cascade is not None:
+                self._cascade.process(warm[: len(warm) - pending])
+            prefix = self._filter(self._recent(pending).astype(np.float32))
+            if self._convolver is not None:
+                self._convolver.reset()
+
+        output = self._iir_block(samples, gains)
+        if prefix is not None and len(prefix):
+            output = np.concatenate([prefix, output])
+        return output
+
+    def _iir_block(self, samples, gains):
+        design = tuple(gains)
+        if design == self._design:
+            return self._filter(samples)
+
+        previous = self._cascade
+        fresh = self._design is None
+        self._cascade, self._bands = self._redesign(gains, None if fresh else previous)
+        self._design = design
+        if fresh:
+            return self._filter(samples)
+
+        # 係数を急に切り替えるとプツッというノイズ（ジッパーノイズ）が出るので、
+        # 旧係数と新係数の出力をこのブロックの間でクロスフェードする
+        old = samples if previous is None else previous.process(samples)
+        new = samples if self._cascade is None else self._cascade.process(samples)
+        ramp = np.linspace(0.0, 1.0, len(samples) + 1)[1:, None]
+        return (old + (new - old) * ramp).astype(np.float32)
+
+    def _filter(self, samples):
+        if self._cascade is None:
+            return samples
+        return self._cascade.process(samples).astype(np.float32)
+
+    def _redesign(self, gains, previous):
+        """
+        新しいゲインの縦続接続と掛けるバンドを返す。previous の状態は引き継ぎ、
+        previous 自体は（クロスフェード用に）変更しません。
+        """
+        rate, channels = self._stream
+        bands = tuple(
+            int(band)
+            for band in np.flatnonzero(
+                (gains != 0) & (self.frequencies < rate * _MAX_BAND_RATIO)
+            )
+        )
+        if not bands:
+            return None, ()
+        sos = [
+            cached_peaking_eq_coefficients(
+                float(self.frequencies[band]), rate, float(gains[band]), self.q
+            )
+            for band in bands
+        ]
+        cascade = BiquadCascade(sos, channels, self.block_size)
+        if previous is not None:
+            # 続けて掛けるバンドは状態を引き継ぎ、音が途切れないようにする
+            for position, band in enumerate(bands):
+                if band in self._bands:
+                    old = self._bands.index(band)
+                    cascade.state[2 * position : 2 * position + 2] = previous.state[
+                        2 * old : 2 * old + 2
+                    ]
+        return cascade, bands
@@ -1,3 +1,4 @@
+from functools import lru_cache
 import numpy as np
 
 
@@ -33,3 +34,136 @@ def calculate_peaking_eq_coefficients(freq, sample_rate, gain_db, q=1.414):
     # a0で正規化し、フィルタ演算に必要な5つの定数を返す
     # (a0が常に1になるよう正規化するのがデジタルフィルタの実装標準)
     return np.array([b0 / a0, b1 / a0, b2 / a0, a1 / a0, a2 / a0])
+
+
+def calculate_k_weighting_coefficients(sample_rate):
+    """
+    ITU-R BS.1770 のラウドネス測定で使う K 特性フィルタの係数を算出します。
+    頭部の影響を模した高域シェルフと、低域を落とすハイパス（RLB 特性）の2段です。
+
+    BS.1770 は 48kHz の係数だけを示しているため、アナログ原型の値から
+    任意のサンプリングレートの係数を求めます（libebur128 と同じ式）。
+
+    Args:
+        sample_rate: サンプリングレート (Hz)
+
+    Returns:
+        np.ndarray: 2段分の [b0, b1, b2, a1, a2]（形状 (2, 5)）
+    """
+    # 1段目: 高域シェルフ（約 +4 dB）
+    f0 = 1681.974450955533
+    gain_db = 3.999843853973347
+    q = 0.7071752369554196
+    K = np.tan(np.pi * f0 / sample_rate)
+    Vh = 10 ** (gain_db / 20.0)
+    Vb = Vh**0.4996667741545416
+    a0 = 1.0 + K / q + K * K
+    shelf = [
+        (Vh + Vb * K / q + K * K) / a0,
+        2.0 * (K * K - Vh) / a0,
+        (Vh - Vb * K / q + K * K) / a0,
+        2.0 * (K * K - 1.0) / a0,
+        (1.0 - K / q + K * K) / a0,
+    ]
+
+    # 2段目: ハイパス（約 38 Hz）
+    f0 = 38.13547087602444
+    q = 0.5003270373238773
+    K = np.tan(np.pi * f0 / sample_rate)
+    a0 = 1.0 + K / q + K * K
+    high_pass = [
+        1.0,
+        -2.0,
+        1.0,
+        2.0 * (K * K - 1.0) / a0,
+        (1.0 - K / q + K * K) / a0,
+    ]
+    return np.array([shelf, high_pass])
+
+
+def calculate_peaking_eq_sos(freqs, sample_rate, gains_db, q=1.414):
+    """
+    複数バンドのピーキングEQ係数を1回の呼び出しでまとめて算出します。
+    calculate_peaking_eq_coefficients は配列を受け取るとバンドごとに計算するので、
+    その結果をバンドごとの行に並べ替えます。
+
+    Args:
+        freqs: 各バンドの中心周波数 (Hz) の配列
+        sample_rate: サンプリングレート (Hz)
+        gains_db: 各バンドのゲイン (dB) の配列
+        q: Q値（全バンド共通、またはバンドごとの配列）
+
+    Returns:
+        np.ndarray: バンドごとの [b0, b1, b2, a1, a2]（形状 (バンド数, 5)）
+    """
+    freqs = np.asarray(freqs, dtype=np.float64)
+    gains_db = np.broadcast_to(np.asarray(gains_db, dtype=np.float64), freqs.shape)
+    coefficients = calculate_peaking_eq_coefficients(freqs, sample_rate, gains_db, q)
+    return np.ascontiguousarray(coefficients.T)
+
+
+@lru_cache(maxsize=4096)
+def cached_peaking_eq_coefficients(freq, sample_rate, gain_db, q=1.414):
+    """
+    calculate_peaking_eq_coefficients の結果を (周波数, サンプリングレート, ゲイン, Q)
+    ごとに覚えておく版。スライダーの値は整数 dB なので、ドラッグ中に同じ係数を
+    何度も設計し直さずに済みます。
+
+    Returns:
+        tuple: (b0, b1, b2, a1, a2)
+    """
+    return tuple(
+        float(c)
+        for c in calculate_peaking_eq_coefficients(freq, sample_rate, gain_db, q)
+    )
+
+
+def sos_frequency_response(sos, freqs, sample_rate):
+    """
+    SOS（各行 [b0, b1, b2, a1, a2]）の縦続接続の周波数特性を算出します。
+
+    Args:
+        sos: 形状 (セクション数, 5) の係数
+        freqs: 周波数 (Hz) の配列
+        sample_rate: サンプリングレート (Hz)
+
+    Returns:
+        np.ndarray: 各周波数の複素応答
+    """
+    sos = np.atleast_2d(np.asarray(sos, dtype=np.float64))
+    z = np.exp(-2j * np.pi * np.asarray(freqs, dtype=np.float64) / sample_rate)
+    response = np.ones_like(z)
+    for b0, b1, b2, a1, a2 in sos:
+        response *= (b0 + b1 * z + b2 * z * z) / (1.0 + a1 * z + a2 * z * z)
+    return response
+
+
+def design_linear_phase_fir(freqs, sample_rate, gains_db, q=1.414, taps=16383):
+    """
+    ピーキングEQを縦続接続した時と同じ振幅特性を持つ、直線位相の FIR フィルタを
+    周波数サンプリング法で設計します。
+
+    振幅特性を細かい周波数グリッドで求めて零位相のインパルス応答に戻し、
+    中央の taps 個を窓（Hann）で切り出すため、遅延は (taps - 1) / 2 サンプルです。
+
+    Args:
+        freqs: 各バンドの中心周波数 (Hz) の配列
+        sample_rate: サンプリングレート (Hz)
+        gains_db: 各バンドのゲイン (dB) の配列
+        q: Q値
+        taps: タップ数（奇数）
+
+    Returns:
+        np.ndarray: 長さ taps の左右対称な係数
+    """
+    if taps % 2 == 0:
+        raise ValueError(f"taps must be odd: {taps}")
+    # 切り出す長さより十分細かいグリッドで設計し、周波数サンプリングの誤差を抑える
+    size = 1 << int(np.ceil(np.log2(taps * 4)))
+    grid = np.fft.rfftfreq(size, 1.0 / sample_rate)
+    sos = calculate_peaking_eq_sos(freqs, sample_rate, gains_db, q)
+    magnitude = np.abs(sos_frequency_response(sos, grid, sample_rate))
+    impulse = np.fft.irfft(magnitude, size)
+    half = taps // 2
+    centered = np.concatenate([impulse[-half:], impulse[: half + 1]])
+    return centered * np.hanning(taps)
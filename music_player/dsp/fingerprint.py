@@ -0,0 +1,111 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# フィンガープリントの形式を変えたら上げる（キャッシュ済みのものは作り直す）
+FINGERPRINT_VERSION = 1
+
+# 時間・周波数の刻みは秒・Hz で決め、サンプリングレートが違っても同じ値になるようにする
+HOP_SECONDS = 0.032
+MIN_FREQ = 250.0
+MAX_FREQ = 4000.0
+# ハッシュに入れる周波数の単位 [Hz]
+FREQ_UNIT = 10.0
+
+# ピーク（周囲で最も強い点）を探す範囲：時間 ±フレーム数, 周波数 ±Hz
+PEAK_TIME_RADIUS = 5
+PEAK_FREQ_RADIUS = 100.0
+# 1秒あたりに残すピークの上限（強い順）
+PEAKS_PER_SECOND = 15
+# 1つのピークと組にする後続ピークの数と、組にできる時間・周波数の差の上限
+FAN_OUT = 4
+MAX_DT = 63
+MAX_DF = 255
+# ハッシュの最大ビット数（周波数 9 + 周波数の差 9 + 時間差 6）
+HASH_BITS = 24
+
+
+def spectrogram(samples, sample_rate):
+    """
+    モノラル PCM から対数振幅スペクトログラムを作り、
+    (スペクトログラム[フレーム, 周波数], 各列の周波数[Hz]) を返す。
+    """
+    hop = max(1, int(round(sample_rate * HOP_SECONDS)))
+    # 窓はホップの2倍以上の2のべき乗
+    n_fft = 1 << int(np.ceil(np.log2(2 * hop)))
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    band = (freqs >= MIN_FREQ) & (freqs <= MAX_FREQ)
+    if len(samples) < n_fft:
+        return np.zeros((0, int(band.sum())), dtype=np.float32), freqs[band]
+
+    frames = sliding_window_view(np.asarray(samples, dtype=np.float32), n_fft)[::hop]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(n_fft).astype(np.float32)))
+    return np.log(spectrum[:, band] + 1e-6).astype(np.float32), freqs[band]
+
+
+def _max_filter(values, radius, axis):
+    # 前後 radius の範囲の最大値（端は範囲外を無視する）
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(values, pad, constant_values=-np.inf)
+    return sliding_window_view(padded, 2 * radius + 1, axis=axis).max(axis=-1)
+
+
+def find_peaks(log_spec, freqs):
+    """スペクトログラムの局所的なピークを (フレーム番号, 周波数[Hz]) の配列で返す"""
+    if log_spec.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    bin_width = freqs[1] - freqs[0] if len(freqs) > 1 else MAX_FREQ
+    freq_radius = max(1, int(round(PEAK_FREQ_RADIUS / bin_width)))
+    local_max = _max_filter(_max_filter(log_spec, PEAK_TIME_RADIUS, 0), freq_radius, 1)
+    # 無音や背景ノイズの平らな部分はピークにしない
+    threshold = np.median(log_spec) + 1.0
+    peaks = (log_spec == local_max) & (log_spec > threshold)
+    times, bins = np.nonzero(peaks)
+
+    limit = int(PEAKS_PER_SECOND * len(log_spec) * HOP_SECONDS) + 1
+    if len(times) > limit:
+        strongest = np.argsort(log_spec[times, bins])[::-1][:limit]
+        times, bins = times[strongest], bins[strongest]
+    order = np.lexsort((bins, times))
+    return times[order], freqs[bins[order]]
+
+
+def compute_fingerprint(samples, sample_rate):
+    """
+    モノラル PCM のフィンガープリントを返す。
+
+    近いピーク同士の組（周波数, 周波数の差, 時間差）を HASH_BITS ビットのハッシュにした
+    ランドマーク方式で、(ハッシュ, 基準ピークのフレーム番号) を行とする
+    uint32 の (N, 2) 配列です。音量・エンコード形式・先頭の無音が違っても
+    同じ録音なら多くのハッシュが同じ時間差で一致します。
+    """
+    times, peak_freqs = find_peaks(*spectrogram(samples, sample_rate))
+    units = np.round(peak_freqs / FREQ_UNIT).astype(np.int64)
+
+    rows = []
+    count = len(times)
+    for i in range(count):
+        paired = 0
+        for j in range(i + 1, count):
+            dt = times[j] - times[i]
+            if dt > MAX_DT:
+                break
+            df = units[j] - units[i]
+            if dt == 0 or abs(df) > MAX_DF:
+                continue
+            rows.append(((units[i] << 15) | ((df + MAX_DF + 1) << 6) | dt, times[i]))
+            paired += 1
+            if paired >= FAN_OUT:
+                break
+    if not rows:
+        return np.zeros((0, 2), dtype=np.uint32)
+    return np.array(rows, dtype=np.uint32)
+
+
+def fingerprint_to_bytes(fingerprint):
+    """キャッシュ保存用のバイト列にする"""
+    return np.ascontiguousarray(fingerprint, dtype="<u4").tobytes()
+
+
+def fingerprint_from_bytes(data):
+    return np.frombuffer(data, dtype="<u4").reshape(-1, 2).astype(np.uint32)
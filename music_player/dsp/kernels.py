@@ -0,0 +1,114 @@
+import threading
+import numpy as np
+
+# Numba があればサンプルごとの再帰計算を機械語にコンパイルして使う
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMPY_BACKEND = "numpy"
+NUMBA_BACKEND = "numba"
+
+# Numba でのコンパイルに失敗した時のエラー（以後は NumPy のバックエンドだけを使う）
+_numba_error = None
+# warm_up() で初回のコンパイルが済んだか
+_warmed_up = threading.Event()
+
+
+def available_backends():
+    """使えるフィルタ演算のバックエンド（先頭が既定）"""
+    if numba is not None and _numba_error is None:
+        return [NUMBA_BACKEND, NUMPY_BACKEND]
+    return [NUMPY_BACKEND]
+
+
+def default_backend():
+    """
+    backend を指定しない時に使うバックエンド。
+    Numba は warm_up() でコンパイルが済むまで選びません（初回のコンパイルで
+    デコードスレッドが数秒止まり、再生が途切れるのを避けるため）。
+    """
+    if _warmed_up.is_set() and NUMBA_BACKEND in available_backends():
+        return NUMBA_BACKEND
+    return NUMPY_BACKEND
+
+
+def jit(function):
+    """
+    Numba があれば function をコンパイルする（無ければそのまま返す）。
+
+    コンパイル結果はディスク（__pycache__）にキャッシュし、2回目以降の起動では
+    コンパイルし直しません。デコードスレッドから呼ぶため GIL も解放します。
+    キャッシュの置き場所が無い（PyInstaller の onefile など）といった理由で
+    デコレートに失敗した場合も、NumPy のバックエンドに切り替えて続けます。
+    """
+    if numba is None:
+        return function
+    try:
+        return numba.njit(cache=True, nogil=True)(function)
+    except Exception as e:
+        _disable_numba(e)
+        return function
+
+
+def warm_up():
+    """
+    Numba のカーネルを小さな入力で1回呼んでコンパイルを済ませる（成功したら True）。
+    時間がかかるので、再生とは別のスレッドから呼んでください。
+    """
+    if NUMBA_BACKEND not in available_backends():
+        return False
+    try:
+        sosfilt_inplace(np.zeros((1, 5)), np.zeros((2, 1)), np.zeros((2, 1)))
+    except Exception as e:
+        _disable_numba(e)
+        return False
+    _warmed_up.set()
+    return True
+
+
+def warm_up_async():
+    """warm_up() をバックグラウンドのスレッドで実行する"""
+    if NUMBA_BACKEND in available_backends() and not _warmed_up.is_set():
+        threading.Thread(target=warm_up, daemon=True).start()
+
+
+def _disable_numba(error):
+    global _numba_error
+    print(f"Numba compile error: {error}")
+    _numba_error = error
+
+
+def _sosfilt_loop(sos, samples, state):
+    # 転置ダイレクトフォーム II。サンプルを外側のループにすると、隣り合う
+    # セクション・チャンネルの計算が依存しないので CPU が並行して進められる
+    for n in range(samples.shape[0]):
+        for channel in range(samples.shape[1]):
+            x = samples[n, channel]
+            for section in range(sos.shape[0]):
+                row = 2 * section
+                y = sos[section, 0] * x + state[row, channel]
+                state[row, channel] = (
+                    sos[section, 1] * x - sos[section, 3] * y + state[row + 1, channel]
+                )
+                state[row + 1, channel] = sos[section, 2] * x - sos[section, 4] * y
+                x = y
+            samples[n, channel] = x
+
+
+_sosfilt_jit = jit(_sosfilt_loop)
+
+
+def sosfilt_inplace(sos, samples, state):
+    """
+    SOS を samples（(フレーム数, チャンネル数) の float64）にその場で掛け、
+    state（(2 * セクション数, チャンネル数)）を更新する。
+    Numba が無い環境では純粋な Python で動くため、短い信号の検証用にしか使えません。
+    """
+    _sosfilt_jit(
+        np.ascontiguousarray(sos, dtype=np.float64),
+        samples,
+        state,
+    )
+    return samples
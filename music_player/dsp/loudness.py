@@ -0,0 +1,199 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .filter_design import calculate_k_weighting_coefficients
+
+# 測定方法や保存形式を変えたら上げる（キャッシュ済みの結果は作り直す）
+LOUDNESS_VERSION = 1
+
+# ITU-R BS.1770: 400ms のブロックを 100ms ずつずらして測る
+STEP_SECONDS = 0.1
+STEPS_PER_BLOCK = 4
+# 絶対ゲート [LUFS] と相対ゲート [LU]
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+
+# アルバム単位で合算するための、ブロックのラウドネスのヒストグラム（0.1 LU 刻み）
+HISTOGRAM_MIN = ABSOLUTE_GATE
+HISTOGRAM_STEP = 0.1
+HISTOGRAM_BINS = 800
+
+# K 特性フィルタの応答が十分に減衰する長さ [秒]（前のブロックから持ち越す）
+FILTER_SETTLE_SECONDS = 0.2
+# true-peak を求めるオーバーサンプリングの補間フィルタ（1相あたりのタップ数）
+TRUE_PEAK_TAPS = 12
+
+
+def channel_weights(channels):
+    """チャンネルごとの重み（5.1ch の LFE は測らず、サラウンドは +1.5 dB）"""
+    if channels == 6:
+        return np.array([1.0, 1.0, 1.0, 0.0, 1.41, 1.41])
+    if channels == 5:
+        return np.array([1.0, 1.0, 1.0, 1.41, 1.41])
+    return np.ones(channels)
+
+
+def block_loudness(energy):
+    """ブロックの平均二乗（チャンネルの重み付き和）をラウドネス [LUFS] にする"""
+    with np.errstate(divide="ignore"):
+        return -0.691 + 10.0 * np.log10(energy)
+
+
+def _oversampling_factor(sample_rate):
+    # BS.1770 は 48kHz で4倍。元のレートが高いほど倍率は小さくてよい
+    if sample_rate < 96000:
+        return 4
+    if sample_rate < 192000:
+        return 2
+    return 1
+
+
+def _interpolation_matrix(factor):
+    # factor 倍に補間する窓付き sinc を多相に分け、直近 TRUE_PEAK_TAPS サンプル
+    # （古い順）に掛けると各相の補間値が出る (タップ, 相) の行列にする
+    n = factor * TRUE_PEAK_TAPS
+    t = (np.arange(n) - (n - 1) / 2.0) / factor
+    phases = (np.sinc(t) * np.kaiser(n, 8.0)).reshape(TRUE_PEAK_TAPS, factor)
+    phases /= phases.sum(axis=0)
+    return phases[::-1]
+
+
+class LoudnessMeter:
+    """
+    ITU-R BS.1770 / EBU R128 のラウドネスと true-peak を測るクラス。
+
+    PCM をブロックごとに process() へ渡すと、K 特性フィルタを FFT でまとめて
+    掛け（重なりを持ち越す overlap-save 方式）、100ms ごとの平均二乗を貯めます。
+    曲全体を一度にメモリへ載せなくても、一括で測った場合と同じ値になります。
+    """
+
+    def __init__(self, sample_rate, channels):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.weights = channel_weights(channels)
+        self._step = max(1, int(round(sample_rate * STEP_SECONDS)))
+        self._overlap = int(sample_rate * FILTER_SETTLE_SECONDS)
+        self._history = np.zeros((self._overlap, channels))
+        self._responses = {}
+        # 100ms に満たず次のブロックへ持ち越す二乗値と、100ms ごとの平均二乗
+        self._partial = np.zeros(0)
+        self._steps = []
+
+        self._oversampling = _oversampling_factor(sample_rate)
+        self._interpolation = _interpolation_matrix(self._oversampling)
+        self._peak_history = np.zeros((TRUE_PEAK_TAPS - 1, channels))
+        self._peak = 0.0
+
+    @property
+    def block_frames(self):
+        """FFT の長さが2のべき乗になる、process() に渡すと効率の良いフレーム数"""
+        return (1 << 18) - self._overlap
+
+    def _response(self, n_fft):
+        # 2段の K 特性フィルタの周波数応答（FFT の長さごとに一度だけ計算する）
+        response = self._responses.get(n_fft)
+        if response is None:
+            z = np.exp(-2j * np.pi * np.fft.rfftfreq(n_fft))
+            response = np.ones(len(z), dtype=complex)
+            for b0, b1, b2, a1, a2 in calculate_k_weighting_coefficients(
+                self.sample_rate
+            ):
+                response *= (b0 + b1 * z + b2 * z * z) / (1.0 + a1 * z + a2 * z * z)
+            self._responses[n_fft] = response
+        return response
+
+    def process(self, samples):
+        """(フレーム数, チャンネル数) の PCM を続きとして測る"""
+        samples = np.asarray(samples, dtype=np.float64).reshape(-1, self.channels)
+        if len(samples) == 0:
+            return
+        self._update_peak(samples)
+
+        buffer = np.concatenate([self._history, samples])
+        self._history = buffer[len(buffer) - self._overlap :]
+        n_fft = 1 << int(np.ceil(np.log2(len(buffer))))
+        spectrum = np.fft.rfft(buffer, n_fft, axis=0) * self._response(n_fft)[:, None]
+        # 先頭の持ち越し分は巡回畳み込みの折り返しを含むので捨てる
+        filtered = np.fft.irfft(spectrum, n_fft, axis=0)[self._overlap : len(buffer)]
+
+        power = np.concatenate([self._partial, (filtered * filtered) @ self.weights])
+        usable = len(power) // self._step * self._step
+        self._steps.append(power[:usable].reshape(-1, self._step).mean(axis=1))
+        self._partial = power[usable:]
+
+    def _update_peak(self, samples):
+        buffer = np.concatenate([self._peak_history, samples])
+        self._peak_history = buffer[len(buffer) - (TRUE_PEAK_TAPS - 1) :]
+        peak = np.abs(samples).max()
+        if self._oversampling > 1:
+            # 相ごと・チャンネルごとに補間フィルタを畳み込む（タップが少ないので直接計算）
+            for channel in buffer.T:
+                for taps in self._interpolation.T:
+                    interpolated = np.convolve(channel, taps[::-1], mode="valid")
+                    peak = max(peak, np.abs(interpolated).max())
+        self._peak = max(self._peak, float(peak))
+
+    def block_energies(self):
+        """400ms ブロックごとの平均二乗（チャンネルの重み付き和）"""
+        steps = np.concatenate(self._steps) if self._steps else np.zeros(0)
+        if len(steps) < STEPS_PER_BLOCK:
+            return np.zeros(0)
+        return sliding_window_view(steps, STEPS_PER_BLOCK).mean(axis=1)
+
+    def integrated_loudness(self):
+        """ゲート処理した統合ラウドネス [LUFS]（無音なら -inf）"""
+        energy = self.block_energies()
+        energy = energy[block_loudness(energy) > ABSOLUTE_GATE]
+        if len(energy) == 0:
+            return float("-inf")
+        threshold = block_loudness(energy.mean()) + RELATIVE_GATE
+        return float(block_loudness(energy[block_loudness(energy) > threshold].mean()))
+
+    def true_peak(self):
+        """true-peak（オーバーサンプリングして求めたサンプルの最大の絶対値）"""
+        return self._peak
+
+    def histogram(self):
+        """絶対ゲートを通ったブロックのラウドネスの度数分布（HISTOGRAM_BINS 個）"""
+        loudness = block_loudness(self.block_energies())
+        loudness = loudness[loudness > ABSOLUTE_GATE]
+        bins = np.clip(
+            ((loudness - HISTOGRAM_MIN) / HISTOGRAM_STEP).astype(np.int64),
+            0,
+            HISTOGRAM_BINS - 1,
+        )
+        return np.bincount(bins, minlength=HISTOGRAM_BINS).astype(np.uint32)
+
+
+def histogram_loudness(histogram):
+    """
+    ヒストグラムから統合ラウドネス [LUFS] を求める（無音なら -inf）。
+    複数の曲のヒストグラムを足してから求めると、アルバム全体のラウドネスになります。
+    """
+    counts = np.asarray(histogram, dtype=np.float64)
+    if counts.sum() == 0:
+        return float("-inf")
+    centers = HISTOGRAM_MIN + (np.arange(HISTOGRAM_BINS) + 0.5) * HISTOGRAM_STEP
+    energy = 10.0 ** ((centers + 0.691) / 10.0)
+    threshold = block_loudness((counts * energy).sum() / counts.sum()) + RELATIVE_GATE
+    gated = counts * (centers > threshold)
+    if gated.sum() == 0:
+        return float("-inf")
+    return float(block_loudness((gated * energy).sum() / gated.sum()))
+
+
+def loudness_to_bytes(loudness, peak, histogram):
+    """キャッシュ保存用のバイト列にする（ヒストグラムは値のある範囲だけ保存）"""
+    nonzero = np.flatnonzero(histogram)
+    first, last = (nonzero[0], nonzero[-1] + 1) if len(nonzero) else (0, 0)
+    header = np.array([loudness, peak, first], dtype="<f8")
+    counts = np.asarray(histogram[first:last], dtype="<u4")
+    return header.tobytes() + counts.tobytes()
+
+
+def loudness_from_bytes(data):
+    """loudness_to_bytes の逆。(ラウドネス, true-peak, ヒストグラム) を返す"""
+    loudness, peak, first = np.frombuffer(data[:24], dtype="<f8")
+    counts = np.frombuffer(data[24:], dtype="<u4")
+    histogram = np.zeros(HISTOGRAM_BINS, dtype=np.uint32)
+    histogram[int(first) : int(first) + len(counts)] = counts
+    return float(loudness), float(peak), histogram
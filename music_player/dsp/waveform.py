@@ -0,0 +1,110 @@
+import numpy as np
+
+WAVEFORM_VERSION = 1
+# 一番細かい段の区間数と、それを半分ずつにまとめていく段の数
+BASE_BUCKETS = 8192
+LEVELS = 6
+
+
+class PeakAccumulator:
+    """
+    曲全体を buckets 個の区間に分け、区間ごとの最小値・最大値（全チャンネル）を
+    ブロックを受け取りながら求める。ブロックの切れ目と区間の境目は一致しなくてよい。
+    """
+
+    def __init__(self, total_frames, buckets=BASE_BUCKETS):
+        self.buckets = max(1, min(buckets, total_frames))
+        # 区間 i は [edges[i], edges[i + 1]) フレーム
+        self._edges = np.arange(self.buckets + 1) * total_frames // self.buckets
+        self.minimum = np.zeros(self.buckets, dtype=np.float32)
+        self.maximum = np.zeros(self.buckets, dtype=np.float32)
+        self._position = 0
+
+    def add(self, block):
+        """(フレーム数, チャンネル数) のブロックを追加する"""
+        if len(block) == 0:
+            return
+        low = block.min(axis=1)
+        high = block.max(axis=1)
+        start = self._position
+        self._position += len(block)
+        # ブロックがかかる区間（曲の長さの申告より長ければ最後の区間にまとめる）
+        last_bucket = self.buckets - 1
+        first = min(np.searchsorted(self._edges, start, "right") - 1, last_bucket)
+        last = min(
+            np.searchsorted(self._edges, self._position - 1, "right") - 1, last_bucket
+        )
+        offsets = np.clip(self._edges[first : last + 1] - start, 0, None)
+        offsets[0] = 0
+        span = slice(first, last + 1)
+        np.minimum(
+            self.minimum[span],
+            np.minimum.reduceat(low, offsets),
+            out=self.minimum[span],
+        )
+        np.maximum(
+            self.maximum[span],
+            np.maximum.reduceat(high, offsets),
+            out=self.maximum[span],
+        )
+
+    def levels(self, count=LEVELS):
+        """区間数を半分ずつにした (最小値, 最大値) の段のリスト（先頭が一番細かい）"""
+        return build_levels(self.minimum, self.maximum, count)
+
+
+def build_levels(minimum, maximum, count=LEVELS):
+    levels = [(minimum, maximum)]
+    for _ in range(count - 1):
+        low, high = levels[-1]
+        if len(low) < 2:
+            break
+        # 隣り合う2区間ずつまとめる（奇数個なら最後は1区間のまま）
+        pairs = np.arange(0, len(low), 2)
+        levels.append(
+            (np.minimum.reduceat(low, pairs), np.maximum.reduceat(high, pairs))
+        )
+    return levels
+
+
+def waveform_columns(levels, columns):
+    """
+    描画する横幅 columns [px] に合わせた (最小値, 最大値) を返す。
+    columns 以上の区間を持つ中で一番粗い段から、1列ずつにまとめます。
+    """
+    low, high = levels[0]
+    for candidate in levels[1:]:
+        if len(candidate[0]) < columns:
+            break
+        low, high = candidate
+    columns = max(1, min(columns, len(low)))
+    edges = np.arange(columns) * len(low) // columns
+    return np.minimum.reduceat(low, edges), np.maximum.reduceat(high, edges)
+
+
+def waveform_to_bytes(levels):
+    """キャッシュ保存用のバイト列にする（値は -127..127 の整数に丸める）"""
+    header = [WAVEFORM_VERSION, len(levels)] + [len(low) for low, _ in levels]
+    parts = [np.array(header, dtype="<u4").tobytes()]
+    for low, high in levels:
+        # 丸めで山が小さくならないよう、最小値は切り下げ・最大値は切り上げる
+        parts.append(np.floor(np.clip(low, -1, 1) * 127).astype(np.int8).tobytes())
+        parts.append(np.ceil(np.clip(high, -1, 1) * 127).astype(np.int8).tobytes())
+    return b"".join(parts)
+
+
+def waveform_from_bytes(data):
+    """waveform_to_bytes の逆。[(最小値, 最大値), ...] を返す（形式が違えば None）"""
+    version, count = np.frombuffer(data[:8], dtype="<u4")
+    if version != WAVEFORM_VERSION:
+        return None
+    lengths = np.frombuffer(data[8 : 8 + 4 * count], dtype="<u4")
+    offset = 8 + 4 * int(count)
+    levels = []
+    for length in lengths:
+        values = np.frombuffer(data[offset : offset + 2 * length], dtype=np.int8)
+        levels.append(
+            (values[:length] / np.float32(127), values[length:] / np.float32(127))
+        )
+        offset += 2 * int(length)
+    return levels
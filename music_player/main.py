@@ -1,9 +1,15 @@
+import multiprocessing
 import sys
 import os
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QPalette, QColor
 from PySide6.QtCore import Qt
 from ui.main_window import MainWindow
+from core.engine import PcmAudioEngine
+from core.metadata import set_metadata_cache, set_art_store, extract_album_art
+from core.art_store import ArtStore
+from core.metadata_cache import MetadataCache
+from core.utils import get_user_data_dir, get_user_data_path
 
 
 def resource_path(relative_path):
@@ -35,10 +41,26 @@ def main():
     palette.setColor(QPalette.HighlightedText, Qt.black)
     app.setPalette(palette)
 
-    window = MainWindow()
+    # タグ解析結果の永続キャッシュ（未変更のファイルは再解析しない）
+    metadata_cache = MetadataCache(get_user_data_path("metadata_cache.db"))
+    set_metadata_cache(metadata_cache)
+    # アルバムアートは重複排除し、メモリから溢れた分はディスクへ退避する
+    set_art_store(
+        ArtStore(spill_dir=get_user_data_path("art_cache"), loader=extract_album_art)
+    )
+
+    # --pcm: QMediaPlayer に任せず、自前でデコードした PCM を鳴らすエンジンを使う
+    engine = PcmAudioEngine() if "--pcm" in sys.argv[1:] else None
+    window = MainWindow(data_dir=get_user_data_dir(), engine=engine)
     window.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+
+    metadata_cache.close()
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
+    # PyInstaller で固めた exe では、解析用のワーカープロセスがアプリ全体を
+    # もう一度起動しないよう、ここでワーカーとしての処理に切り替える
+    multiprocessing.freeze_support()
     main()
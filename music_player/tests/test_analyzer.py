@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from core.spectrum import SpectrumWorker
+from dsp.analyzer import SILENCE_DB, SpectrumAnalyzer, band_matrix, hann_window
+
+RATE = 48000
+
+
+def _sine(freq, seconds=0.5, amplitude=1.0):
+    t = np.arange(int(RATE * seconds)) / RATE
+    mono = amplitude * np.sin(2 * np.pi * freq * t)
+    return np.stack([mono, mono], axis=1).astype(np.float32)
+
+
+def test_band_matrix_has_no_empty_band():
+    analyzer = SpectrumAnalyzer(RATE, bands=32)
+    matrix = band_matrix(2048, RATE, analyzer.edges)
+    assert matrix.shape == (32, 1025)
+    # ビンを含まない低域のバンドも、両隣のビンの補間（重みの合計 1）で値を持つ
+    assert np.all(matrix.sum(axis=1) >= 1.0 - 1e-9)
+    # 20Hz-20kHz の範囲のビンは、補間に使うもの以外ちょうど1つのバンドに入る
+    bins = np.fft.rfftfreq(2048, 1 / RATE)
+    in_range = (bins >= 200) & (bins < 20000)
+    assert np.all(matrix[:, in_range].sum(axis=0) == 1.0)
+    assert hann_window(2048) is hann_window(2048)
+
+
+@pytest.mark.parametrize("freq", [1000, 5000])
+def test_sine_level_in_its_band(freq):
+    """フルスケールの正弦波が、その周波数のバンドで 0 dB になるか検証"""
+    analyzer = SpectrumAnalyzer(RATE)
+    analyzer.write(_sine(freq))
+    levels = analyzer.analyze()
+    band = np.searchsorted(analyzer.edges, freq) - 1
+    assert np.argmax(levels) == band
+    assert levels[band] == pytest.approx(0.0, abs=0.1)
+    assert analyzer.pending == 0
+
+    analyzer.write(_sine(freq, amplitude=0.1))
+    assert analyzer.analyze()[band] == pytest.approx(-20.0, abs=0.1)
+    analyzer.reset()
+    assert np.all(analyzer.analyze() == SILENCE_DB)
+
+
+def test_streaming_writes_match_one_block():
+    samples = _sine(440) + _sine(3000, amplitude=0.3)
+    whole = SpectrumAnalyzer(RATE)
+    whole.write(samples)
+    split = SpectrumAnalyzer(RATE)
+    for start in range(0, len(samples), 700):
+        split.write(samples[start : start + 700])
+    assert split.pending == len(samples)
+    assert np.allclose(split.analyze(), whole.analyze())
+
+
+def test_worker_decimates_to_frame_rate(qtbot):
+    """大量の音を流しても解析は表示のフレームごとに1回で、新しい音が無ければ止まるか検証"""
+    worker = SpectrumWorker(frame_rate=50)
+    frames = []
+    worker.spectrum_ready.connect(lambda levels, freqs: frames.append(levels))
+    worker.start()
+    with qtbot.waitSignal(worker.spectrum_ready, timeout=2000) as blocker:
+        # 10秒分を一度に流し込んでも、解析するのは直近の窓だけ
+        worker.feed(np.tile(_sine(1000), (20, 1)), RATE)
+    levels, freqs = blocker.args
+    assert len(levels) == len(freqs) == 32
+    assert levels.max() == pytest.approx(0.0, abs=0.1)
+
+    with qtbot.assertNotEmitted(worker.spectrum_ready, wait=200):
+        pass
+    worker.stop()
+    assert len(frames) == 1
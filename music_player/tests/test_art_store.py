@@ -0,0 +1,71 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from core.art_store import ArtStore
+from core.metadata import extract_metadata, get_art_store, load_album_art, set_art_store
+
+
+@pytest.fixture
+def store():
+    """テストごとに新しい ArtStore を extract_metadata に差し込む"""
+    previous = get_art_store()
+    s = ArtStore(max_bytes=1024)
+    set_art_store(s)
+    yield s
+    set_art_store(previous)
+
+
+def test_identical_art_is_stored_once(store):
+    # 同じ画像は同じキーになり、メモリ上には1枚だけ保持されるか
+    cover = b"\x89PNG" + b"x" * 100
+    keys = {store.put(bytes(cover)) for _ in range(15)}
+
+    assert len(keys) == 1
+    assert store.memory_usage == len(cover)
+    assert store.get(keys.pop()) == cover
+
+
+def test_lru_eviction_respects_limit(store):
+    # 上限を超えると古い画像から追い出されるか
+    first = store.put(b"a" * 600)
+    second = store.put(b"b" * 600)
+
+    assert store.memory_usage == 600
+    assert first not in store
+    assert store.get(second) == b"b" * 600
+
+
+def test_evicted_art_is_spilled_to_disk(tmp_path):
+    # 退避先を指定すると、追い出した画像をディスクから読み戻せるか
+    s = ArtStore(max_bytes=1024, spill_dir=str(tmp_path))
+    first = s.put(b"a" * 600)
+    s.put(b"b" * 600)
+
+    assert first in s
+    assert s.get(first) == b"a" * 600
+
+
+def test_evicted_art_is_reloaded_from_source(store):
+    # 退避先が無くても、元ファイルから読み直せるか
+    store.loader = MagicMock(return_value=b"a" * 600)
+    first = store.put(b"a" * 600, source_path="song.flac")
+    store.put(b"b" * 600)
+
+    assert store.get(first) == b"a" * 600
+    store.loader.assert_called_once_with("song.flac")
+
+
+def test_extract_metadata_keeps_only_art_key(store):
+    # メタデータには画像そのものではなくキーだけが入るか
+    cover = b"cover-bytes"
+    mock_audio = MagicMock()
+    mock_audio.tags = {"title": ["T"], "artist": ["A"]}
+    mock_audio.info.length = 100
+    mock_audio.pictures = [MagicMock(data=cover)]
+
+    with patch("core.metadata.MutagenFile", return_value=mock_audio):
+        first = extract_metadata("disc/01.flac")
+        second = extract_metadata("disc/02.flac")
+
+    assert "album_art" not in first
+    assert first["art_key"] == second["art_key"] == ArtStore.make_key(cover)
+    assert load_album_art(first) == cover
@@ -0,0 +1,26 @@
+import pytest
+from core import collation
+from core.collation import collation_key
+
+
+@pytest.mark.skipif(
+    collation.has_locale_collation(),
+    reason="PyICU がある環境ではロケールの照合順になる",
+)
+def test_fallback_key_ignores_width_case_and_kana():
+    # 全角/半角・大文字/小文字・カタカナ/ひらがなの違いで順序が変わらないか
+    assert collation_key("ＡＢＣ") == collation_key("abc")
+    assert collation_key("サクラ") == collation_key("さくら")
+    assert collation_key("あいう") < collation_key("かきく")
+
+
+def test_missing_value_sorts_first():
+    # タイトル等が無い曲は先頭に並ぶか
+    assert collation_key(None) == collation_key("")
+    assert collation_key(None) < collation_key("a")
+
+
+def test_japanese_order():
+    # かなの五十音順で並ぶか（どちらの照合方式でも成り立つ）
+    words = ["たちつ", "あいう", "さしす", "かきく"]
+    assert sorted(words, key=collation_key) == ["あいう", "かきく", "さしす", "たちつ"]
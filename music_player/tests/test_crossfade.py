@@ -0,0 +1,29 @@
+import numpy as np
+from dsp.crossfade import equal_power_curves, mix_crossfade
+
+
+def test_equal_power_curves():
+    """2曲のパワーの和が常に 1 で、前の曲は下がり・次の曲は上がり続けるか検証"""
+    fade_out, fade_in = equal_power_curves(0, 1000, 1000)
+    assert np.allclose(fade_out**2 + fade_in**2, 1.0, atol=1e-6)
+    assert np.all(np.diff(fade_out) < 0) and np.all(np.diff(fade_in) > 0)
+    assert fade_out[0] > 0.99 and fade_in[-1] > 0.99
+    # 真ん中では両方とも -3 dB
+    assert np.allclose(equal_power_curves(499, 2, 1000), np.sqrt(0.5), atol=2e-3)
+
+
+def test_mix_crossfade_does_not_depend_on_block_size():
+    rng = np.random.default_rng(0)
+    outgoing = rng.uniform(-1, 1, (1000, 2)).astype(np.float32)
+    incoming = rng.uniform(-1, 1, (1000, 2)).astype(np.float32)
+    whole = mix_crossfade(outgoing, incoming, 0, 1000, gain=0.5)
+    split = np.concatenate(
+        [
+            mix_crossfade(outgoing[a:b], incoming[a:b], a, 1000, gain=0.5)
+            for a, b in [(0, 1), (1, 300), (300, 1000)]
+        ]
+    )
+    assert np.allclose(whole, split)
+    fade_out, fade_in = equal_power_curves(0, 1000, 1000)
+    expected = outgoing * fade_out[:, None] + incoming * 0.5 * fade_in[:, None]
+    assert np.allclose(whole, expected)
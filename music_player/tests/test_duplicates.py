@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+import core.analysis
+from core.decoder import DecodeError, can_decode, decode_audio
+from core.duplicates import (
+    FINGERPRINT_KIND,
+    DuplicateIndex,
+    find_duplicates,
+    fingerprint_file,
+    fingerprint_files,
+)
+from core.metadata_cache import MetadataCache
+from dsp.fingerprint import (
+    compute_fingerprint,
+    fingerprint_from_bytes,
+    fingerprint_to_bytes,
+)
+
+soundfile = pytest.importorskip("soundfile")
+
+RATE = 44100
+
+
+def _song(seed, seconds=25):
+    """音程の変わる和音を並べた、曲ごとに異なるテスト用の信号"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(RATE * 0.25)) / RATE
+    notes = []
+    for _ in range(int(seconds * 4)):
+        chord = sum(
+            np.sin(2 * np.pi * freq * t) * rng.uniform(0.2, 1.0)
+            for freq in rng.uniform(200, 3000, 3)
+        )
+        notes.append(chord * np.exp(-t * 4))
+    return (np.concatenate(notes) * 0.2).astype(np.float32)
+
+
+def _rerip(samples, seed=9):
+    """先頭の無音・音量・高域の減衰・ノイズが違う、同じ録音の別ファイル"""
+    rng = np.random.default_rng(seed)
+    shifted = np.concatenate([np.zeros(int(RATE * 0.013)), samples])[: len(samples)]
+    smoothed = np.convolve(shifted, np.ones(5) / 5, mode="same")
+    return (smoothed * 0.5 + rng.normal(0, 0.01, len(smoothed))).astype(np.float32)
+
+
+def _matches(a, b):
+    # 同じ時間差で一致したハッシュの数（最も多い時間差）
+    times = {}
+    for h, t in b.tolist():
+        times.setdefault(h, []).append(t)
+    votes = {}
+    for h, t in a.tolist():
+        for other in times.get(h, ()):
+            votes[other - t] = votes.get(other - t, 0) + 1
+    return max(votes.values(), default=0)
+
+
+def test_fingerprint_survives_rerip():
+    # 同じ録音なら多くのハッシュが一致し、別の曲ではほとんど一致しないか
+    original = compute_fingerprint(_song(1, 10), RATE)
+    rerip = compute_fingerprint(_rerip(_song(1, 10)), RATE)
+    other = compute_fingerprint(_song(2, 10), RATE)
+
+    assert len(original) > 100
+    assert _matches(original, rerip) > 0.1 * len(original)
+    assert _matches(original, other) < 5
+    assert np.array_equal(
+        fingerprint_from_bytes(fingerprint_to_bytes(original)), original
+    )
+
+
+def test_fingerprint_of_silence_is_empty():
+    assert len(compute_fingerprint(np.zeros(RATE * 5, dtype=np.float32), RATE)) == 0
+    assert len(compute_fingerprint(np.zeros(10, dtype=np.float32), RATE)) == 0
+
+
+def test_duplicate_index_clusters():
+    # 一致したハッシュの組だけから、推移的なまとまりを作るか
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 1 << 20, (300, 2)).astype(np.uint32)
+    base[:, 1] = np.sort(base[:, 1] % 300)
+    index = DuplicateIndex()
+    index.add("a", base)
+    index.add("noise", rng.integers(0, 1 << 20, (300, 2)).astype(np.uint32))
+    shifted = base.copy()
+    shifted[:, 1] += 3
+    index.add("b", shifted[:200])
+    index.add("c", np.concatenate([shifted[150:], base[:0]]))
+    index.add("empty", np.zeros((0, 2), dtype=np.uint32))
+
+    assert index.pairs().tolist() == [[0, 2], [0, 3], [2, 3]]
+    assert index.clusters() == [["a", "b", "c"]]
+
+
+@pytest.mark.skipif(not can_decode(), reason="soundfile が使えない")
+def test_find_duplicates_across_formats(tmp_path):
+    # 形式違い・リッピング違いの同じ曲がまとまり、結果がキャッシュされるか
+    paths = {}
+    for name, samples, fmt in [
+        ("a.flac", _song(1), "FLAC"),
+        ("a_copy.wav", _rerip(_song(1)), "WAV"),
+        ("b.flac", _song(2), "FLAC"),
+        ("short.wav", _song(3, 4), "WAV"),
+    ]:
+        paths[name] = str(tmp_path / name)
+        soundfile.write(paths[name], samples, RATE, format=fmt)
+    broken = tmp_path / "broken.mp3"
+    broken.write_bytes(b"not audio")
+    files = list(paths.values()) + [str(broken)]
+
+    cache = MetadataCache(str(tmp_path / "cache.db"))
+    clusters = find_duplicates(files, cache=cache, max_workers=2)
+    assert clusters == [[paths["a.flac"], paths["a_copy.wav"]]]
+    assert cache.get_analysis(paths["short.wav"], FINGERPRINT_KIND) is not None
+
+    # 2回目はキャッシュだけで求まる
+    progress = []
+    again = find_duplicates(
+        files, cache=cache, max_workers=1, on_progress=lambda *a: progress.append(a)
+    )
+    assert again == clusters
+    assert progress[-1] == (5, 5)
+    cache.close()
+
+
+def test_fingerprint_pool_uses_spawn(tmp_path, monkeypatch):
+    # 並列のフィンガープリントも共通のプール（spawn で起動するワーカー）で計算されるか
+    contexts = []
+    executor = core.analysis.ProcessPoolExecutor
+
+    def recording_executor(*args, **kwargs):
+        contexts.append(kwargs.get("mp_context"))
+        return executor(*args, **kwargs)
+
+    monkeypatch.setattr(core.analysis, "ProcessPoolExecutor", recording_executor)
+    paths = [str(tmp_path / f"{i}.wav") for i in range(2)]
+    for i, path in enumerate(paths):
+        soundfile.write(path, _song(i, 12), RATE)
+
+    results = fingerprint_files(paths, max_workers=2)
+    assert sorted(results) == sorted(paths)
+    assert [context.get_start_method() for context in contexts] == ["spawn"]
+
+
+@pytest.mark.skipif(not can_decode(), reason="soundfile が使えない")
+def test_decode_audio_window(tmp_path):
+    path = str(tmp_path / "tone.wav")
+    stereo = np.stack([_song(4, 3), np.zeros(RATE * 3, dtype=np.float32)], axis=1)
+    soundfile.write(path, stereo, RATE)
+
+    samples, rate = decode_audio(path, offset=1.0, duration=0.5)
+    assert rate == RATE
+    assert samples.shape == (RATE // 2, 2)
+    mono, _ = decode_audio(path, offset=1.0, duration=0.5, mono=True)
+    assert np.allclose(mono, samples.mean(axis=1), atol=1e-4)
+    assert len(decode_audio(path, offset=10.0, mono=True)[0]) == 0
+
+    with pytest.raises(DecodeError):
+        decode_audio(str(tmp_path / "missing.wav"))
+    assert fingerprint_file(str(tmp_path / "missing.wav")) is None
@@ -0,0 +1,282 @@
+import numpy as np
+import pytest
+from dsp.biquad import BiquadCascade, sosfilt_direct
+from dsp.convolution import PartitionedConvolver
+from dsp.equalizer import IIR_MODE, LINEAR_PHASE_MODE, Equalizer, parse_frequency
+from dsp.kernels import available_backends, sosfilt_inplace
+from dsp.filter_design import (
+    cached_peaking_eq_coefficients,
+    calculate_peaking_eq_coefficients,
+    calculate_peaking_eq_sos,
+    design_linear_phase_fir,
+    sos_frequency_response,
+)
+
+FREQS = [31, 62, 125, 250, 500, 1000, 2000, 4000, 8000, 16000]
+GAINS = [6, -3, 4, -12, 12, 2, -5, 3, 7, -8]
+
+
+def _noise(frames, channels=2, seed=0):
+    return np.random.default_rng(seed).standard_normal((frames, channels))
+
+
+def test_sos_matches_single_band_design():
+    sos = calculate_peaking_eq_sos(FREQS, 48000, GAINS)
+    assert sos.shape == (10, 5)
+    for row, freq, gain in zip(sos, FREQS, GAINS):
+        assert np.allclose(row, calculate_peaking_eq_coefficients(freq, 48000, gain))
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 128])
+def test_cascade_matches_reference_across_blocks(block_size):
+    """ブロックの切れ目・端数がどこにあっても参照実装と同じ出力・状態になるか検証"""
+    sos = calculate_peaking_eq_sos(FREQS, 48000, GAINS)
+    samples = _noise(3000)
+    expected, expected_state = sosfilt_direct(sos, samples)
+
+    cascade = BiquadCascade(sos, 2, block_size=block_size, backend="numpy")
+    bounds = [0, 1, 130, 131, 1500, 2999, 3000]
+    output = np.concatenate(
+        [cascade.process(samples[a:b]) for a, b in zip(bounds, bounds[1:])]
+    )
+    assert np.allclose(output, expected, atol=1e-9)
+    assert np.allclose(cascade.state, expected_state, atol=1e-9)
+
+    cascade.reset()
+    assert np.allclose(cascade.process(samples[:500]), expected[:500], atol=1e-9)
+
+
+def test_kernel_matches_reference():
+    """JIT 用のサンプル単位カーネル（Numba が無ければ Python のまま）を検証"""
+    sos = calculate_peaking_eq_sos(FREQS, 48000, GAINS)
+    samples = _noise(300)
+    expected, expected_state = sosfilt_direct(sos, samples)
+    state = np.zeros((20, 2))
+    output = sosfilt_inplace(sos, samples.copy(), state)
+    assert np.allclose(output, expected, atol=1e-9)
+    assert np.allclose(state, expected_state, atol=1e-9)
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_backends_agree(backend):
+    sos = calculate_peaking_eq_sos(FREQS, 48000, GAINS)
+    samples = _noise(5000)
+    cascade = BiquadCascade(sos, 2, backend=backend)
+    output = np.concatenate(
+        [cascade.process(samples[:1234]), cascade.process(samples[1234:])]
+    )
+    reference = BiquadCascade(sos, 2, backend="numpy").process(samples)
+    assert np.allclose(output, reference, atol=1e-9)
+    assert cascade.backend == backend
+
+    with pytest.raises(ValueError):
+        BiquadCascade(sos, 2, backend="unknown")
+
+
+def test_numba_failure_falls_back_to_numpy(monkeypatch):
+    # Numba のデコレートに失敗しても import は通り、NumPy のバックエンドに戻るか
+    from dsp import kernels
+
+    class BrokenNumba:
+        @staticmethod
+        def njit(**options):
+            raise RuntimeError("no locator available")
+
+    monkeypatch.setattr(kernels, "numba", BrokenNumba)
+    monkeypatch.setattr(kernels, "_numba_error", None)
+    assert kernels.available_backends()[0] == kernels.NUMBA_BACKEND
+
+    def loop(x):
+        return x
+
+    assert kernels.jit(loop) is loop
+    assert kernels.available_backends() == [kernels.NUMPY_BACKEND]
+    assert kernels.default_backend() == kernels.NUMPY_BACKEND
+    assert kernels.warm_up() is False
+
+
+def test_cascade_keeps_state_when_coefficients_change():
+    sos = calculate_peaking_eq_sos(FREQS, 48000, GAINS)
+    changed = calculate_peaking_eq_sos(FREQS, 48000, np.negative(GAINS))
+    samples = _noise(1000)
+    first, state = sosfilt_direct(sos, samples[:600])
+    second, _ = sosfilt_direct(changed, samples[600:], state)
+
+    cascade = BiquadCascade(sos, 2)
+    cascade.process(samples[:600])
+    cascade.set_sos(changed)
+    assert np.allclose(cascade.process(samples[600:]), second, atol=1e-9)
+
+
+def test_parse_frequency():
+    assert parse_frequency("31Hz") == 31
+    assert parse_frequency("1kHz") == 1000
+    with pytest.raises(ValueError):
+        parse_frequency("loud")
+
+
+def test_equalizer_boosts_band_center():
+    """1kHz を +12dB にすると 1kHz の正弦波が約4倍になり、遠い帯域は変わらないか検証"""
+    rate = 48000
+    t = np.arange(rate) / rate
+    eq = Equalizer(FREQS)
+    tone = np.stack([np.sin(2 * np.pi * 1000 * t)] * 2, axis=1).astype(np.float32)
+    # 全バンド 0dB の間はそのまま返す
+    assert eq(tone, rate) is tone
+
+    eq.set_gain(5, 12)
+    boosted = np.concatenate(
+        [eq(tone[i : i + 4096], rate) for i in range(0, rate, 4096)]
+    )
+    assert boosted.dtype == np.float32
+    gain = 20 * np.log10(np.abs(boosted[rate // 2 :]).max())
+    assert gain == pytest.approx(12.0, abs=0.1)
+
+    eq.reset()
+    low = np.stack([np.sin(2 * np.pi * 31 * t)] * 2, axis=1).astype(np.float32)
+    assert 20 * np.log10(np.abs(eq(low, rate)[rate // 2 :]).max()) == pytest.approx(
+        0.0, abs=0.1
+    )
+
+
+def test_equalizer_skips_bands_above_nyquist():
+    eq = Equalizer(FREQS)
+    eq.set_gains([0] * 9 + [12])
+    samples = _noise(1000).astype(np.float32)
+    # 22.05kHz では 16kHz のバンドは掛けず、そのまま返す
+    assert eq(samples, 22050) is samples
+    assert not np.allclose(eq(samples, 48000), samples)
+    with pytest.raises(ValueError):
+        eq.set_gains([0, 1])
+
+
+def test_slider_drag_is_designed_once_per_block():
+    """ブロックの間に何度ゲインが変わっても、設計し直すのは最新の値の1回だけか検証"""
+    cached_peaking_eq_coefficients.cache_clear()
+    eq = Equalizer(FREQS)
+    samples = _noise(256).astype(np.float32)
+    for value in range(1, 13):
+        eq.set_gain(3, value)
+    eq(samples, 44100)
+    info = cached_peaking_eq_coefficients.cache_info()
+    assert (info.hits, info.misses) == (0, 1)
+
+    # 同じ値に戻した時はキャッシュの係数を使う
+    eq.set_gain(3, 6)
+    eq(samples, 44100)
+    eq.set_gain(3, 12)
+    eq(samples, 44100)
+    info = cached_peaking_eq_coefficients.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+
+
+def test_gain_change_is_crossfaded():
+    """ゲインの変更がブロックの間でなめらかにつながり、段差が出ないか検証"""
+    rate = 48000
+    t = np.arange(rate // 4) / rate
+    tone = np.stack([0.5 * np.sin(2 * np.pi * 1000 * t)] * 2, axis=1)
+    tone = tone.astype(np.float32)
+    blocks = [tone[i : i + 1024] for i in range(0, len(tone), 1024)]
+
+    eq = Equalizer(FREQS)
+    output = []
+    for index, block in enumerate(blocks):
+        if index == 4:
+            eq.set_gain(5, 12)
+        output.append(eq(block, rate))
+    output = np.concatenate(output)
+
+    # 最大の段差は、+12dB（約4倍）にした正弦波の1サンプルあたりの変化程度に収まる
+    step = np.abs(np.diff(output[:, 0])).max()
+    assert step < 4 * 0.5 * 2 * np.pi * 1000 / rate * 1.05
+    # 切り替えたブロックの先頭は元の音、末尾は新しいゲインの音になっている
+    switch = 4 * 1024
+    assert output[switch, 0] == pytest.approx(tone[switch, 0], abs=0.01)
+    assert np.abs(output[-1024:, 0]).max() == pytest.approx(2.0, abs=0.05)
+
+
+def test_linear_phase_fir_matches_band_curve():
+    """直線位相 FIR の振幅特性がバイカッドの縦続接続と一致するか検証"""
+    fir = design_linear_phase_fir(FREQS, 48000, GAINS)
+    assert len(fir) == 16383
+    assert np.allclose(fir, fir[::-1])
+
+    check = np.array(FREQS[1:] + [100, 3000])
+    grid = np.fft.rfftfreq(1 << 19, 1 / 48000)
+    response = np.interp(check, grid, np.abs(np.fft.rfft(fir, 1 << 19)))
+    expected = np.abs(
+        sos_frequency_response(
+            calculate_peaking_eq_sos(FREQS, 48000, GAINS), check, 48000
+        )
+    )
+    assert np.allclose(20 * np.log10(response / expected), 0, atol=0.1)
+    with pytest.raises(ValueError):
+        design_linear_phase_fir(FREQS, 48000, GAINS, taps=100)
+
+
+def _delayed_convolution(samples, kernel, delay):
+    full = [np.convolve(samples[:, c], kernel) for c in range(samples.shape[1])]
+    return np.stack(full, axis=1)[delay : delay + len(samples)]
+
+
+def test_partitioned_convolver_matches_direct_convolution():
+    """どんな長さで区切って入力しても、遅延を除いた直接の畳み込みと一致するか検証"""
+    rng = np.random.default_rng(1)
+    kernel = rng.standard_normal(1001)
+    samples = _noise(6000)
+    expected = _delayed_convolution(samples, kernel, 500)
+
+    convolver = PartitionedConvolver(kernel, 2, partition_size=128, delay=500)
+    assert convolver.latency == 628
+    bounds = [0, 1, 50, 1300, 1301, 6000]
+    parts = [convolver.process(samples[a:b]) for a, b in zip(bounds, bounds[1:])]
+    assert convolver.pending == 628 - 128 + 6000 % 128
+    output = np.concatenate(parts + [convolver.flush()])
+    assert np.allclose(output, expected, atol=1e-9)
+
+    # 途中から始める時は直前の入力で履歴を埋めると、続きから同じ出力になる
+    convolver.prime(samples[:2500])
+    output = np.concatenate([convolver.process(samples[2500:]), convolver.flush()])
+    assert np.allclose(output, expected[2500:], atol=1e-9)
+
+
+def test_linear_phase_mode_is_time_aligned():
+    """直線位相モードでも出力の合計が入力と同じ長さで、時刻がずれないか検証"""
+    rate = 48000
+    t = np.arange(rate) / rate
+    tone = np.stack([np.sin(2 * np.pi * 1000 * t)] * 2, axis=1).astype(np.float32)
+    eq = Equalizer(FREQS, mode=LINEAR_PHASE_MODE, fir_taps=4095, partition_size=256)
+    eq.set_gain(5, 12)
+    output = [eq(tone[i : i + 4096], rate) for i in range(0, rate, 4096)]
+    assert eq.latency == 256 + 2047
+    assert eq.latency_ms == (256 + 2047) * 1000 // rate
+    assert eq.cpu_load > 0
+    output = np.concatenate(output + [eq.flush()])
+    assert output.shape == tone.shape
+
+    # 直線位相なので、位相を変えずに振幅だけが約4倍になる
+    middle = slice(rate // 4, rate * 3 // 4)
+    assert np.allclose(output[middle], tone[middle] * 10 ** (12 / 20), atol=0.05)
+
+
+def test_mode_switch_keeps_samples_in_order():
+    """再生中に IIR と直線位相を切り替えても、音が飛んだり重なったりしないか検証"""
+    samples = _noise(30000).astype(np.float32)
+    eq = Equalizer(FREQS, fir_taps=1023, partition_size=128)
+    modes = [
+        IIR_MODE,
+        LINEAR_PHASE_MODE,
+        LINEAR_PHASE_MODE,
+        IIR_MODE,
+        LINEAR_PHASE_MODE,
+    ]
+    output = []
+    for index, mode in enumerate(modes):
+        eq.set_mode(mode)
+        output.append(eq(samples[index * 6000 : (index + 1) * 6000], 44100))
+    output = np.concatenate(output + [eq.flush()])
+    # 全バンド 0dB ならどちらのモードも入力そのものになる
+    assert np.allclose(output, samples, atol=1e-6)
+    assert len(eq.flush()) == 0
+    with pytest.raises(ValueError):
+        eq.set_mode("minimum_phase")
@@ -0,0 +1,60 @@
+import struct
+import numpy as np
+import pytest
+from core.gapless import (
+    MP3_DECODER_DELAY,
+    gapless_range,
+    parse_itunsmpb,
+    parse_lame_frame,
+    read_gapless_info,
+)
+
+soundfile = pytest.importorskip("soundfile")
+
+
+def _lame_frame(frames, delay, padding):
+    """MPEG-1 Layer III・ステレオの Info フレーム（LAME 拡張付き）を作る"""
+    header = bytes([0xFF, 0xFB, 0x90, 0x64])
+    side_info = bytes(32)
+    info = b"Info" + struct.pack(">II", 0x0F, frames) + bytes(4 + 100 + 4)
+    packed = bytes([delay >> 4, ((delay & 0x0F) << 4) | (padding >> 8), padding & 0xFF])
+    lame = b"LAME3.100" + bytes(12) + packed
+    return header + side_info + info + lame + bytes(100)
+
+
+def test_parse_lame_frame():
+    """LAME ヘッダのディレイ・パディングに、デコーダ自身の遅延を足し引きするか検証"""
+    delay, padding, untrimmed = parse_lame_frame(_lame_frame(100, 576, 1000))
+    assert delay == 576 + MP3_DECODER_DELAY
+    assert padding == 1000 - MP3_DECODER_DELAY
+    assert untrimmed == 100 * 1152
+
+    # Xing / Info タグの無いフレームや、MP3 でないデータは読まない
+    frame = bytearray(_lame_frame(100, 576, 1000))
+    frame[36:40] = b"XXXX"
+    assert parse_lame_frame(bytes(frame)) is None
+    assert parse_lame_frame(b"RIFF....") is None
+
+
+def test_parse_itunsmpb():
+    text = " 00000000 00000840 000001CA 00000000001E8A76 00000000 00000000"
+    assert parse_itunsmpb(text) == (0x840, 0x1CA, 0x840 + 0x1E8A76 + 0x1CA)
+    assert parse_itunsmpb("broken") is None
+
+
+def test_mp3_already_trimmed_by_decoder_is_kept(tmp_path):
+    """デコーダが既に余分を取り除いている MP3 は、さらに削らないか検証"""
+    if "MP3" not in soundfile.available_formats():
+        pytest.skip("libsndfile に MP3 の書き込み機能がない")
+    path = str(tmp_path / "tone.mp3")
+    samples = 0.5 * np.sin(np.arange(44100) / 10.0)
+    soundfile.write(path, samples.astype(np.float32), 44100)
+
+    delay, padding, untrimmed = read_gapless_info(path)
+    # LAME ヘッダから求めた本来の長さは、書き込んだ長さと一致する
+    assert untrimmed - delay - padding == 44100
+    frames = soundfile.info(path).frames
+    if frames == 44100:
+        assert gapless_range(path, frames) == (0, 44100)
+    else:
+        assert gapless_range(path, frames) == (delay, untrimmed - padding)
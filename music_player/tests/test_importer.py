@@ -0,0 +1,171 @@
+import time
+from core.importer import MetadataImporter
+
+
+def _fake_loader(path):
+    """ファイル名の数字が大きいほど速く終わるローダー（順序保持の検証用）"""
+    if path.startswith("bad"):
+        return None
+    index = int(path.split(".")[0])
+    time.sleep(0.001 * (10 - index % 10))
+    return {"file_path": path, "title": path}
+
+
+def test_import_preserves_order_and_skips_invalid(qtbot):
+    # 並列実行しても投入順にバッチが届き、無効なファイルは除外されるか
+    importer = MetadataImporter(_fake_loader, max_workers=4, batch_size=5)
+    received = []
+    firsts = []
+    importer.batch_ready.connect(
+        lambda batch, first: (received.extend(batch), firsts.append(first))
+    )
+
+    files = [f"{i}.mp3" for i in range(20)]
+    files.insert(3, "bad.mp3")
+
+    with qtbot.waitSignal(importer.import_finished, timeout=5000):
+        importer.import_files(files)
+
+    assert [m["file_path"] for m in received] == [f"{i}.mp3" for i in range(20)]
+    # 最初のバッチは有効な1曲目だけを即座に届ける
+    assert firsts[0] is True
+    assert firsts.count(True) == 1
+
+
+def test_first_batch_arrives_before_job_completes(qtbot):
+    # 最初の曲は全件の解析完了を待たずに届くか
+    def slow_loader(path):
+        if path != "0.mp3":
+            time.sleep(0.05)
+        return {"file_path": path}
+
+    importer = MetadataImporter(slow_loader, max_workers=1)
+    with qtbot.waitSignal(importer.batch_ready, timeout=2000) as blocker:
+        importer.import_files([f"{i}.mp3" for i in range(20)])
+
+    assert blocker.args[0] == [{"file_path": "0.mp3"}]
+    assert blocker.args[1] is True
+    assert importer.is_busy()
+    importer.cancel()
+
+
+def test_cancel_discards_pending_results(qtbot):
+    # キャンセル後は結果が届かず、終了通知が出るか
+    def slow_loader(path):
+        time.sleep(0.01)
+        return {"file_path": path}
+
+    importer = MetadataImporter(
+        slow_loader, max_workers=2, batch_size=1000, flush_interval=10
+    )
+    received = []
+    importer.batch_ready.connect(lambda batch, first: received.extend(batch))
+    importer.import_files([f"{i}.mp3" for i in range(500)])
+    qtbot.waitUntil(lambda: len(received) == 1, timeout=2000)
+
+    with qtbot.waitSignal(importer.import_finished, timeout=1000):
+        importer.cancel()
+    qtbot.wait(200)
+
+    assert len(received) == 1
+    assert not importer.is_busy()
+
+
+def test_folder_rescan_rereads_changed_files(qtbot, tmp_path):
+    # フォルダの走査はワーカーで行い、未登録の曲と更新された曲だけを読み直すか
+    from core.scanner import LibraryScanner
+
+    root = tmp_path / "library"
+    root.mkdir()
+    for name in ("01.flac", "02.flac", "03.flac"):
+        (root / name).write_bytes(b"1")
+    paths = [str(root / name) for name in ("01.flac", "02.flac", "03.flac")]
+
+    invalidated = []
+
+    class FakeCache:
+        def invalidate(self, file_paths):
+            invalidated.extend(file_paths)
+
+    importer = MetadataImporter(
+        lambda path: {"file_path": path},
+        max_workers=2,
+        scanner=LibraryScanner(),
+        cache=FakeCache(),
+    )
+    scans = []
+    received = []
+    importer.folder_scanned.connect(scans.append)
+    importer.batch_ready.connect(lambda batch, first: received.extend(batch))
+
+    with qtbot.waitSignal(importer.import_finished, timeout=5000):
+        importer.import_files([str(root)])
+    assert [m["file_path"] for m in received] == paths
+
+    (root / "01.flac").write_bytes(b"changed")
+    (root / "04.flac").write_bytes(b"4")
+    received.clear()
+    with qtbot.waitSignal(importer.import_finished, timeout=5000):
+        importer.import_files([str(root)], known_paths=frozenset(paths))
+
+    # 登録済みでも更新された曲は読み直し、変化の無い曲は読まない
+    assert [m["file_path"] for m in received] == [paths[0], str(root / "04.flac")]
+    assert scans[-1].changed == [paths[0]]
+    assert invalidated == [paths[0]]
+
+
+def test_cancelled_folder_import_is_not_recorded(qtbot, tmp_path):
+    # 取り込みをキャンセルしたフォルダは、次の走査でも差分として返るか
+    from core.scanner import LibraryScanner
+
+    root = tmp_path / "library"
+    root.mkdir()
+    for i in range(100):
+        (root / f"{i:03}.flac").write_bytes(b"1")
+
+    def slow_loader(path):
+        time.sleep(0.01)
+        return {"file_path": path}
+
+    scanner = LibraryScanner()
+    importer = MetadataImporter(slow_loader, max_workers=1, scanner=scanner)
+    received = []
+    importer.batch_ready.connect(lambda batch, first: received.extend(batch))
+    importer.import_files([str(root)])
+    qtbot.waitUntil(lambda: len(received) > 0, timeout=2000)
+    importer.cancel()
+    qtbot.waitUntil(lambda: importer._thread is None, timeout=2000)
+
+    assert len(scanner.scan(str(root)).added) == 100
+
+
+def test_progress_accumulates_across_queued_jobs(qtbot):
+    # 取り込み中に追加したジョブの分も総数に足され、進捗が巻き戻らないか
+    def slow_loader(path):
+        time.sleep(0.002)
+        return {"file_path": path}
+
+    importer = MetadataImporter(
+        slow_loader, max_workers=2, batch_size=10, flush_interval=10
+    )
+    progress = []
+    importer.progress_changed.connect(
+        lambda done, total: progress.append((done, total))
+    )
+
+    with qtbot.waitSignal(importer.import_finished, timeout=5000):
+        importer.import_files([f"a{i}.mp3" for i in range(30)])
+        importer.import_files([f"b{i}.mp3" for i in range(20)])
+
+    assert progress[1] == (0, 50)
+    assert progress[-1] == (50, 50)
+    done = [d for d, _ in progress]
+    assert done == sorted(done)
+    assert all(total == 50 for _, total in progress[1:])
+
+    # 終わった後の取り込みは 0 から数え直す
+    progress.clear()
+    with qtbot.waitSignal(importer.import_finished, timeout=5000):
+        importer.import_files(["c.mp3"])
+    assert progress[0] == (0, 1)
+    assert progress[-1] == (1, 1)
@@ -0,0 +1,151 @@
+import math
+import numpy as np
+import pytest
+from core.loudness import (
+    LOUDNESS_KIND,
+    LoudnessScanner,
+    replay_gain,
+    scan_replay_gain,
+)
+from core.metadata_cache import MetadataCache
+from dsp.filter_design import calculate_k_weighting_coefficients
+from dsp.loudness import (
+    LoudnessMeter,
+    histogram_loudness,
+    loudness_from_bytes,
+    loudness_to_bytes,
+)
+
+soundfile = pytest.importorskip("soundfile")
+
+
+def _tone(db, seconds, rate=48000, freq=997.0):
+    t = np.arange(int(seconds * rate)) / rate
+    return 10 ** (db / 20.0) * np.sin(2 * np.pi * freq * t)
+
+
+def _stereo(samples):
+    return np.stack([samples, samples], axis=1)
+
+
+def test_k_weighting_matches_bs1770_table():
+    """48kHz の係数が BS.1770 に載っている値と一致するか検証"""
+    shelf, high_pass = calculate_k_weighting_coefficients(48000)
+    b0, b1, b2 = 1.53512485958697, -2.69169618940638, 1.19839281085285
+    assert np.allclose(shelf, [b0, b1, b2, -1.69065929318241, 0.73248077421585])
+    assert np.allclose(high_pass, [1.0, -2.0, 1.0, -1.99004745483398, 0.99007225036621])
+
+
+@pytest.mark.parametrize("rate", [44100, 48000, 96000])
+def test_sine_loudness(rate):
+    """EBU Tech 3341 と同じ -23 dBFS・1kHz のステレオ正弦波が -23 LUFS になるか検証"""
+    meter = LoudnessMeter(rate, 2)
+    meter.process(_stereo(_tone(-23, 20, rate)))
+    assert meter.integrated_loudness() == pytest.approx(-23.0, abs=0.1)
+    assert histogram_loudness(meter.histogram()) == pytest.approx(-23.0, abs=0.1)
+
+
+def test_gating_ignores_quiet_parts_and_block_size():
+    """静かな部分が相対ゲートで除かれ、分割して渡しても結果が変わらないか検証"""
+    samples = _stereo(np.concatenate([_tone(-36, 10), _tone(-23, 60), _tone(-36, 10)]))
+    whole = LoudnessMeter(48000, 2)
+    whole.process(samples)
+    assert whole.integrated_loudness() == pytest.approx(-23.0, abs=0.1)
+
+    split = LoudnessMeter(48000, 2)
+    for start in range(0, len(samples), 100003):
+        split.process(samples[start : start + 100003])
+    assert split.integrated_loudness() == pytest.approx(
+        whole.integrated_loudness(), abs=1e-6
+    )
+    assert np.array_equal(split.histogram(), whole.histogram())
+
+    silent = LoudnessMeter(48000, 2)
+    silent.process(np.zeros((48000, 2)))
+    assert silent.integrated_loudness() == float("-inf")
+
+
+def test_true_peak_finds_inter_sample_peak():
+    """サンプル値は 0.707 でも、サンプル間の山が 1.0 になる信号の true-peak を検証"""
+    n = np.arange(48000)
+    samples = np.sin(np.pi / 2 * n + np.pi / 4)
+    meter = LoudnessMeter(48000, 1)
+    meter.process(samples[:, None])
+    assert np.abs(samples).max() == pytest.approx(0.707, abs=0.001)
+    assert 20 * math.log10(meter.true_peak()) == pytest.approx(0.0, abs=0.2)
+
+
+def test_result_bytes_round_trip():
+    histogram = np.zeros(800, dtype=np.uint32)
+    histogram[470:480] = np.arange(1, 11)
+    loudness, peak, restored = loudness_from_bytes(
+        loudness_to_bytes(-12.5, 0.9, histogram)
+    )
+    assert (loudness, peak) == (-12.5, 0.9)
+    assert np.array_equal(restored, histogram)
+
+
+def test_replay_gain_is_limited_by_true_peak():
+    assert replay_gain(-23.0, 0.1) == pytest.approx(5.0)
+    # +15 dB 上げると 0 dBTP を超えるので、ピークが 0 dBTP になるところまで
+    assert replay_gain(-33.0, 0.5) == pytest.approx(-20 * math.log10(0.5))
+    assert replay_gain(float("-inf"), 0.0) == 0.0
+
+
+def _write_album(tmp_path):
+    paths = {}
+    for name, db in [("loud.flac", -13), ("quiet.wav", -28), ("single.wav", -18)]:
+        path = str(tmp_path / name)
+        soundfile.write(path, _stereo(_tone(db, 5, 44100)).astype(np.float32), 44100)
+        paths[name] = path
+    return paths
+
+
+def test_scan_replay_gain_track_and_album(tmp_path, monkeypatch):
+    """トラックゲイン・アルバムゲインが求まり、2回目はキャッシュから読むか検証"""
+    paths = _write_album(tmp_path)
+    broken = tmp_path / "broken.flac"
+    broken.write_bytes(b"not audio")
+    items = [
+        (paths["loud.flac"], "album"),
+        (paths["quiet.wav"], "album"),
+        (paths["single.wav"], None),
+        (str(broken), "album"),
+    ]
+    cache = MetadataCache(str(tmp_path / "cache.db"))
+    gains = scan_replay_gain(items, cache=cache, max_workers=1)
+
+    assert set(gains) == {
+        paths["loud.flac"],
+        paths["quiet.wav"],
+        paths["single.wav"],
+        str(broken),
+    }
+    # デコードできない曲は None（失敗したこともキャッシュする）
+    assert gains[str(broken)] is None
+    assert cache.get_analysis(str(broken), LOUDNESS_KIND) == b""
+    loud_track, loud_album = gains[paths["loud.flac"]]
+    quiet_track, quiet_album = gains[paths["quiet.wav"]]
+    assert loud_track == pytest.approx(-5.0, abs=0.1)
+    assert quiet_track == pytest.approx(10.0, abs=0.1)
+    # アルバム内の音量差はそのまま残す（大きい方の曲に近い値で揃える）
+    assert loud_album == quiet_album
+    assert -5.1 < loud_album < -4.0
+    assert gains[paths["single.wav"]] == pytest.approx((0.0, 0.0), abs=0.1)
+    assert cache.get_analysis(paths["quiet.wav"], LOUDNESS_KIND) is not None
+
+    def fail(path):
+        raise AssertionError("キャッシュ済みの曲を測り直した")
+
+    monkeypatch.setattr("core.loudness.measure_file", fail)
+    again = scan_replay_gain(items, cache=cache, max_workers=1)
+    assert again == gains
+    cache.close()
+
+
+def test_scanner_runs_in_background(qtbot, tmp_path):
+    paths = _write_album(tmp_path)
+    scanner = LoudnessScanner(max_workers=1)
+    with qtbot.waitSignal(scanner.gains_ready, timeout=10000) as blocker:
+        scanner.scan([(paths["loud.flac"], None), (str(tmp_path / "none.mp3"), None)])
+    assert list(blocker.args[0]) == [paths["loud.flac"]]
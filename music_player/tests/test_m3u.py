@@ -0,0 +1,45 @@
+import os
+from core.m3u import is_playlist_file, read_m3u, write_m3u
+
+
+def test_is_playlist_file():
+    assert is_playlist_file("/m/list.M3U8")
+    assert is_playlist_file("list.m3u")
+    assert not is_playlist_file("song.mp3")
+
+
+def test_read_m3u_resolves_paths(tmp_path):
+    # BOM・コメント・URL を読み飛ばし、相対パスはプレイリストの場所から解決するか
+    playlist = tmp_path / "list.m3u8"
+    playlist.write_text(
+        "﻿#EXTM3U\n"
+        "#EXTINF:120,歌手 - 曲\n"
+        "sub/曲.flac\n"
+        "\n"
+        "http://example.com/stream.mp3\n"
+        "file:///abs/song.mp3\n"
+        "/abs/other.wav\n",
+        encoding="utf-8",
+    )
+
+    assert read_m3u(str(playlist)) == [
+        os.path.join(str(tmp_path), "sub", "曲.flac"),
+        "/abs/song.mp3",
+        "/abs/other.wav",
+    ]
+
+
+def test_write_m3u_round_trip(tmp_path):
+    # 書き出したプレイリストを読み戻すと同じ順のパスになるか
+    songs = [
+        {"file_path": "/m/a.flac", "title": "A", "artist": "X", "duration": 61.7},
+        {"file_path": "/m/b.mp3"},
+        {"title": "パス無し"},
+    ]
+    path = tmp_path / "out.m3u8"
+    write_m3u(str(path), songs)
+
+    text = path.read_text(encoding="utf-8")
+    assert text.startswith("#EXTM3U\n#EXTINF:61,X - A\n/m/a.flac\n")
+    assert "#EXTINF:-1,b.mp3\n" in text
+    assert read_m3u(str(path)) == ["/m/a.flac", "/m/b.mp3"]
@@ -1,7 +1,7 @@
 # tests/test_metadata.py
 import pytest
 from unittest.mock import MagicMock, patch
-from core.metadata import extract_metadata
+from core.metadata import extract_metadata, load_album_art
 
 
 # --- MP3のテスト ---
@@ -78,3 +78,147 @@ def test_extract_metadata_unrecognized_format():
     with patch("core.metadata.MutagenFile", return_value=None):
         info = extract_metadata("unsupported.txt")
         assert info is None
+
+
+# --- 高速モード（画像を読まない）のテスト ---
+def _write_flac(path, comments, picture=b""):
+    """STREAMINFO・VORBIS_COMMENT・PICTURE だけを持つ最小限の FLAC を書き出す"""
+    from mutagen.flac import Picture, VCFLACDict
+
+    # 44.1kHz / 2ch / 16bit / 441000 サンプル (= 10秒)
+    streaminfo = bytearray(34)
+    streaminfo[0:2] = (4096).to_bytes(2, "big")
+    streaminfo[2:4] = (4096).to_bytes(2, "big")
+    packed = (44100 << 44) | (1 << 41) | (15 << 36) | 441000
+    streaminfo[10:18] = packed.to_bytes(8, "big")
+
+    vc = VCFLACDict()
+    for key, value in comments.items():
+        vc[key] = value
+    pic = Picture()
+    pic.data = picture
+    blocks = [(0, bytes(streaminfo)), (4, vc.write()), (6, pic.write())]
+
+    with open(path, "wb") as f:
+        f.write(b"fLaC")
+        for i, (block_type, data) in enumerate(blocks):
+            last = 0x80 if i == len(blocks) - 1 else 0
+            f.write(bytes([last | block_type]) + len(data).to_bytes(3, "big"))
+            f.write(data)
+
+
+def test_tags_only_flac(tmp_path):
+    path = str(tmp_path / "tags.flac")
+    comments = {"title": "曲名", "artist": "歌手", "album": "盤", "composer": "作曲"}
+    _write_flac(path, comments, picture=b"x" * 100000)
+
+    info = extract_metadata(path, include_art=False)
+
+    assert info["title"] == "曲名"
+    assert info["artist"] == "歌手"
+    assert info["album"] == "盤"
+    assert info["composer"] == "作曲"
+    assert info["duration"] == 10
+    # 画像は読まないので art_key 自体が含まれない
+    assert "art_key" not in info
+
+
+def test_tags_only_mp3(tmp_path):
+    from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB, TCOM
+
+    # MPEG1 Layer3 128kbps 44.1kHz のフレームを並べた音声データ
+    frame = b"\xff\xfb\x90\x64" + b"\x00" * 413
+    path = str(tmp_path / "tags.mp3")
+    with open(path, "wb") as f:
+        f.write(frame * 200)
+
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text="MP3 Title"))
+    tags.add(TPE1(encoding=1, text="MP3 Artist"))
+    tags.add(TALB(encoding=0, text="MP3 Album"))
+    tags.add(TCOM(encoding=3, text="MP3 Composer"))
+    tags.add(APIC(encoding=3, mime="image/png", type=3, data=b"x" * 100000))
+    tags.save(path)
+
+    fast = extract_metadata(path, include_art=False)
+    full = extract_metadata(path)
+
+    for key in ("title", "artist", "album", "composer", "duration"):
+        assert fast[key] == full[key]
+    assert fast["title"] == "MP3 Title"
+    assert fast["artist"] == "MP3 Artist"
+    assert "art_key" not in fast
+    assert full["art_key"] is not None
+
+
+def test_load_album_art_after_tags_only(tmp_path):
+    # 高速モードで読んだ曲でも、表示時に画像を取得できるか
+    path = str(tmp_path / "art.flac")
+    _write_flac(path, {"title": "T"}, picture=b"cover")
+
+    info = extract_metadata(path, include_art=False)
+
+    assert load_album_art(info) == b"cover"
+    assert info["art_key"] is not None
+
+
+def test_adts_aac_reads_id3_tags(tmp_path):
+    # 生の ADTS (.aac) に付いた ID3 のタグと画像を読めるか
+    from mutagen.id3 import ID3, APIC, TIT2, TPE1
+
+    # AAC-LC 44.1kHz 2ch、中身が空の ADTS フレームを並べた音声データ
+    length = 17
+    header = bytes(
+        [0xFF, 0xF1, 0x50, 0x80, length >> 3, ((length & 7) << 5) | 0x1F, 0xFC]
+    )
+    path = str(tmp_path / "song.aac")
+    with open(path, "wb") as f:
+        f.write((header + b"\x00" * (length - 7)) * 200)
+
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text="AAC Title"))
+    tags.add(TPE1(encoding=3, text="AAC Artist"))
+    tags.add(APIC(encoding=3, mime="image/png", type=3, data=b"aac-cover"))
+    tags.save(path)
+
+    fast = extract_metadata(path, include_art=False)
+    full = extract_metadata(path)
+
+    assert fast["title"] == full["title"] == "AAC Title"
+    assert fast["artist"] == "AAC Artist"
+    assert load_album_art(full) == b"aac-cover"
+
+
+def test_tags_only_error_falls_back_to_mutagen():
+    # 高速モードの解析で例外が出ても、曲を落とさず Mutagen で読み直すか
+    mock_audio = MagicMock()
+    mock_audio.tags = {"TIT2": ["Fallback Title"]}
+    mock_audio.info.length = 30
+
+    with patch(
+        "core.metadata._read_tags_only", side_effect=ValueError("broken frame")
+    ), patch("core.metadata.MutagenFile", return_value=mock_audio):
+        info = extract_metadata("broken.mp3", include_art=False)
+
+    assert info["title"] == "Fallback Title"
+    assert "art_key" not in info
+
+
+def test_extract_metadata_m4a():
+    # M4A のタグ（アルバム・作曲者を含む）と covr の画像を取得できるか
+    mock_audio = MagicMock()
+    mock_audio.tags = {
+        "\xa9nam": ["M4A Title"],
+        "\xa9ART": ["M4A Artist"],
+        "\xa9alb": ["M4A Album"],
+        "\xa9wrt": ["M4A Composer"],
+        "covr": [b"m4a-cover"],
+    }
+    mock_audio.info.length = 90
+
+    with patch("core.metadata.MutagenFile", return_value=mock_audio):
+        info = extract_metadata("dummy.m4a")
+
+    assert info["album"] == "M4A Album"
+    assert info["composer"] == "M4A Composer"
+    assert load_album_art(info) == b"m4a-cover"
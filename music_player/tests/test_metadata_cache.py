@@ -0,0 +1,129 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from core.metadata import extract_metadata, set_metadata_cache
+from core.metadata_cache import MetadataCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """テストごとに一時ディレクトリ上のキャッシュを用意し、終了後に解除する"""
+    c = MetadataCache(str(tmp_path / "cache.db"))
+    set_metadata_cache(c)
+    yield c
+    set_metadata_cache(None)
+    c.close()
+
+
+@pytest.fixture
+def audio_file(tmp_path):
+    """stat 可能な実ファイル（中身は Mutagen をモックするので何でもよい）"""
+    path = tmp_path / "song.flac"
+    path.write_bytes(b"dummy audio")
+    return str(path)
+
+
+def _mock_audio(title="Cached Title", length=200):
+    mock_audio = MagicMock()
+    mock_audio.tags = {"title": [title], "artist": ["Cached Artist"]}
+    mock_audio.info.length = length
+    mock_audio.pictures = []
+    return mock_audio
+
+
+def test_second_extract_is_cache_hit(cache, audio_file):
+    # 2回目の抽出では Mutagen を呼ばずにキャッシュから返るか
+    with patch("core.metadata.MutagenFile", return_value=_mock_audio()) as mock_file:
+        first = extract_metadata(audio_file)
+        second = extract_metadata(audio_file)
+
+    assert mock_file.call_count == 1
+    assert second == first
+    assert cache.stats == {"hits": 1, "misses": 1}
+
+
+def test_modified_file_is_reparsed(cache, audio_file):
+    # サイズ・更新時刻が変わったファイルは再解析されるか
+    with patch("core.metadata.MutagenFile", return_value=_mock_audio("Old")):
+        extract_metadata(audio_file)
+
+    with open(audio_file, "ab") as f:
+        f.write(b" appended")
+    st = os.stat(audio_file)
+    os.utime(audio_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    with patch(
+        "core.metadata.MutagenFile", return_value=_mock_audio("New")
+    ) as mock_file:
+        info = extract_metadata(audio_file)
+
+    assert mock_file.call_count == 1
+    assert info["title"] == "New"
+
+
+def test_cache_persists_across_instances(tmp_path, audio_file):
+    # 接続を閉じて開き直してもエントリが残っているか
+    db_path = str(tmp_path / "cache.db")
+    first = MetadataCache(db_path)
+    first.put(audio_file, {"file_path": audio_file, "title": "T", "art_key": "abc"})
+    first.close()
+
+    second = MetadataCache(db_path)
+    info = second.get(audio_file)
+    second.close()
+
+    assert info["title"] == "T"
+    assert info["art_key"] == "abc"
+
+
+def test_bulk_invalidate(cache, tmp_path):
+    # 複数パスをまとめて破棄できるか
+    paths = []
+    for i in range(3):
+        p = tmp_path / f"{i}.mp3"
+        p.write_bytes(b"x")
+        paths.append(str(p))
+        cache.put(str(p), {"file_path": str(p), "title": str(i)})
+
+    removed = cache.invalidate(paths[:2])
+
+    assert removed == 2
+    assert len(cache) == 1
+    assert cache.get(paths[0]) is None
+    assert cache.get(paths[2])["title"] == "2"
+
+
+def test_missing_file_is_miss(cache, tmp_path):
+    # 存在しないファイルはミスとして扱われるか
+    assert cache.get(str(tmp_path / "missing.mp3")) is None
+    assert cache.misses == 1
+
+
+def test_stats_are_consistent_across_threads(cache, audio_file):
+    # 複数スレッドから同時に引いても、ヒット・ミスの回数が失われないか
+    from concurrent.futures import ThreadPoolExecutor
+
+    cache.put(audio_file, {"title": "T"})
+    paths = [audio_file, audio_file + ".missing"] * 500
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(cache.get, paths))
+
+    assert cache.stats == {"hits": 500, "misses": 500}
+
+
+def test_analysis_results_follow_file_changes(cache, audio_file):
+    # 解析結果は種類ごとに保存され、ファイルが変わると無効になるか
+    cache.put_analysis(audio_file, "fingerprint:1", b"\x01\x02")
+    cache.put_analysis(audio_file, "loudness:1", b"\x03")
+
+    assert cache.get_analysis(audio_file, "fingerprint:1") == b"\x01\x02"
+    assert cache.get_analysis(audio_file, "loudness:1") == b"\x03"
+    assert cache.get_analysis(audio_file, "other") is None
+
+    st = os.stat(audio_file)
+    os.utime(audio_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert cache.get_analysis(audio_file, "fingerprint:1") is None
+
+    cache.put_analysis(audio_file, "fingerprint:1", b"\x09")
+    cache.invalidate([audio_file])
+    assert cache.get_analysis(audio_file, "fingerprint:1") is None
@@ -0,0 +1,98 @@
+from unittest.mock import patch
+import numpy as np
+import pytest
+from PySide6.QtMultimedia import QMediaPlayer
+from core.engine import AudioEngine, PcmAudioEngine
+
+soundfile = pytest.importorskip("soundfile")
+
+
+@pytest.fixture
+def song(tmp_path):
+    path = str(tmp_path / "tone.wav")
+    t = np.arange(44100 * 2) / 44100
+    samples = np.stack([np.sin(2 * np.pi * 440 * t)] * 2, axis=1) * 0.1
+    soundfile.write(path, samples.astype(np.float32), 44100)
+    return path
+
+
+def test_load_emits_same_signals_as_audio_engine(qtbot, song):
+    """AudioEngine と同じシグナルで長さ・状態・再生位置が届くか検証"""
+    engine = PcmAudioEngine()
+    statuses = []
+    engine.media_status_changed.connect(statuses.append)
+
+    with qtbot.waitSignal(engine.duration_changed) as blocker:
+        engine.load_song(song, start_position=500, autoplay=False)
+    assert blocker.args == [2000]
+    assert engine.duration() == 2000
+    assert engine.position() == 500
+    assert statuses == [
+        QMediaPlayer.MediaStatus.LoadingMedia,
+        QMediaPlayer.MediaStatus.LoadedMedia,
+    ]
+
+    with qtbot.waitSignal(engine.position_changed) as blocker:
+        engine.set_position(1200)
+    assert blocker.args == [1200]
+
+
+def test_processors_see_decoded_blocks(qtbot, song):
+    engine = PcmAudioEngine()
+    rates = []
+    engine.processors.append(lambda block, rate: rates.append(rate) or block)
+    engine.load_song(song, autoplay=False)
+    # 再生前でもリングバッファが埋まるまで先にデコードする
+    qtbot.waitUntil(lambda: len(rates) > 0)
+    assert rates[0] == 44100
+
+
+def test_unreadable_file_falls_back_to_media_player(qtbot, song, tmp_path):
+    """libsndfile で開けない曲は QMediaPlayer に任せ、そのシグナルを伝えるか検証"""
+    path = str(tmp_path / "broken.m4a")
+    with open(path, "wb") as f:
+        f.write(b"not audio")
+    engine = PcmAudioEngine()
+    statuses = []
+    engine.media_status_changed.connect(statuses.append)
+    with patch.object(AudioEngine, "load_song") as mock_load:
+        engine.load_song(path, start_position=300, autoplay=False)
+    mock_load.assert_called_once_with(path, 300, False)
+    assert engine.duration() == 0
+    assert not engine.prepare_next(song)
+
+    # QMediaPlayer でも読めなければ、その InvalidMedia がそのまま届く
+    engine._fallback.media_status_changed.emit(QMediaPlayer.MediaStatus.InvalidMedia)
+    assert statuses[-1] == QMediaPlayer.MediaStatus.InvalidMedia
+
+    # 開ける曲に戻った後は、代わりのエンジンのシグナルを伝えない
+    engine.load_song(song, autoplay=False)
+    engine._fallback.media_status_changed.emit(QMediaPlayer.MediaStatus.EndOfMedia)
+    assert statuses[-1] == QMediaPlayer.MediaStatus.LoadedMedia
+    assert engine.duration() == 2000
+
+
+def test_prepared_song_follows_without_gap(qtbot, song, tmp_path):
+    """用意した次の曲へ、出力側が前の曲を読み切った直後に移るか検証"""
+    following = str(tmp_path / "following.wav")
+    soundfile.write(following, np.full((4410, 2), 0.5, dtype=np.float32), 44100)
+    engine = PcmAudioEngine()
+    engine.load_song(song, start_position=1990, autoplay=False)
+    assert engine.prepare_next(following)
+
+    # 前の曲の残り 10ms（441 フレーム）に続けて、同じ読み出しで次の曲の先頭を返す
+    source = engine._source
+    bytes_per_frame = engine._format.bytesPerFrame()
+    qtbot.waitUntil(lambda: source.stream.available() >= 441)
+    qtbot.waitUntil(lambda: engine._next_stream.available() >= 559)
+    with qtbot.waitSignal(engine.next_song_started) as blocker:
+        data = source.readData(bytes_per_frame * 1000)
+    assert blocker.args == [following]
+    assert len(data) == bytes_per_frame * 1000
+    assert engine.duration() == 100
+    assert engine._stream.position() == 12
+
+    # 形式の違う曲は用意しない
+    mono = str(tmp_path / "mono.wav")
+    soundfile.write(mono, np.zeros(4410, dtype=np.float32), 22050)
+    assert not engine.prepare_next(mono)
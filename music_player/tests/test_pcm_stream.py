@@ -0,0 +1,273 @@
+import threading
+import time
+import numpy as np
+import pytest
+from mutagen.id3 import COMM
+from mutagen.wave import WAVE
+from core.decoder import DecodeError
+from core.pcm_stream import PcmStream
+from core.ring_buffer import RingBuffer
+from dsp.crossfade import equal_power_curves
+
+soundfile = pytest.importorskip("soundfile")
+
+RATE = 8000
+
+
+def _ramp_file(tmp_path, seconds=2, channels=2):
+    """サンプル値から位置が分かる（単調に増える）テスト用の音声ファイル"""
+    path = str(tmp_path / "ramp.wav")
+    ramp = np.linspace(-1, 1, RATE * seconds, endpoint=False)
+    samples = np.stack([ramp * (c + 1) / channels for c in range(channels)], axis=1)
+    soundfile.write(path, samples.astype(np.float32), RATE, subtype="FLOAT")
+    return path, samples.astype(np.float32)
+
+
+def _drain(stream, timeout=5.0):
+    # 最後まで取り出す（デコードスレッドが追いつくのを待ちながら）
+    chunks = []
+    deadline = time.monotonic() + timeout
+    while not stream.at_end:
+        assert time.monotonic() < deadline
+        chunk = stream.read(1000)
+        if len(chunk):
+            chunks.append(chunk)
+        else:
+            time.sleep(0.001)
+    return np.concatenate(chunks)
+
+
+def test_ring_buffer_wraps_and_clears():
+    ring = RingBuffer(5, 1)
+    assert ring.write(np.arange(4, dtype=np.float32)[:, None]) == 4
+    assert ring.read(3)[:, 0].tolist() == [0, 1, 2]
+    # 末尾から先頭へ折り返して書き込む
+    assert ring.write(np.arange(4, 8, dtype=np.float32)[:, None]) == 4
+    assert ring.read(10)[:, 0].tolist() == [3, 4, 5, 6, 7]
+    assert len(ring.read(10)) == 0
+
+    old_generation = ring.generation
+    ring.write(np.ones((2, 1), dtype=np.float32))
+    ring.clear()
+    assert len(ring) == 0
+    # 古い世代の書き込みは捨てられる
+    assert ring.write(np.ones((2, 1), dtype=np.float32), old_generation) == 0
+
+
+def test_ring_buffer_writer_waits_for_space():
+    ring = RingBuffer(4, 1)
+    result = []
+    writer = threading.Thread(
+        target=lambda: result.append(ring.write(np.ones((10, 1), np.float32)))
+    )
+    writer.start()
+    received = 0
+    while received < 10:
+        received += len(ring.read(3))
+    writer.join(timeout=1.0)
+    assert result == [10]
+
+    # 満杯で待っている書き込みは clear() で打ち切られる
+    ring.write(np.ones((4, 1), np.float32))
+    writer = threading.Thread(
+        target=lambda: result.append(ring.write(np.ones((3, 1), np.float32)))
+    )
+    writer.start()
+    time.sleep(0.05)
+    ring.clear()
+    writer.join(timeout=1.0)
+    assert result == [10, 0]
+
+
+def test_stream_plays_through_processors(tmp_path):
+    """デコードした全サンプルが処理フックを通って順番どおりに出てくるか検証"""
+    path, samples = _ramp_file(tmp_path)
+    calls = []
+
+    def halve(block, rate):
+        calls.append(rate)
+        return block * 0.5
+
+    stream = PcmStream(path, [halve], block_frames=1000, buffer_seconds=0.1)
+    assert (stream.sample_rate, stream.channels, stream.duration) == (RATE, 2, 2000)
+    stream.start()
+    played = _drain(stream)
+    stream.close()
+
+    assert np.allclose(played, samples * 0.5)
+    assert set(calls) == {RATE}
+    assert stream.position() == 2000
+
+
+class _Delay:
+    """入力を 300 フレーム遅らせて出す処理（残りは flush() で返す）"""
+
+    def __init__(self):
+        self.resets = 0
+        self.reset()
+
+    def reset(self):
+        self.resets += 1
+        self.buffer = np.zeros((0, 2), dtype=np.float32)
+
+    def __call__(self, block, rate):
+        self.buffer = np.concatenate([self.buffer, block])
+        count = max(0, len(self.buffer) - 300)
+        output, self.buffer = self.buffer[:count], self.buffer[count:]
+        return output
+
+    def flush(self):
+        output, self.buffer = self.buffer, self.buffer[:0]
+        return output
+
+
+def test_stream_flushes_delayed_processors(tmp_path):
+    """出力が遅れて出てくる処理も、曲の最後まで欠けずに出てくるか検証"""
+    path, samples = _ramp_file(tmp_path)
+
+    stream = PcmStream(
+        path,
+        [_Delay(), lambda block, rate: block * 2],
+        block_frames=1000,
+        buffer_seconds=0.1,
+    )
+    stream.start()
+    played = _drain(stream)
+    stream.close()
+    # flush() の分も後ろの処理を通ってから出てくる
+    assert np.allclose(played, samples * 2)
+    assert stream.position() == 2000
+
+
+def test_stream_trims_encoder_delay_and_padding(tmp_path):
+    """iTunSMPB に書かれたエンコーダの余分を、再生・シーク・長さから除くか検証"""
+    path, samples = _ramp_file(tmp_path)
+    total = len(samples) - 100 - 200
+    audio = WAVE(path)
+    audio.add_tags()
+    audio.tags.add(
+        COMM(
+            encoding=0,
+            desc="iTunSMPB",
+            text=f" 00000000 00000064 000000C8 {total:016X}",
+        )
+    )
+    audio.save()
+
+    stream = PcmStream(path, block_frames=1000, buffer_seconds=0.1)
+    assert stream.frames == total
+    stream.start()
+    assert np.allclose(_drain(stream), samples[100:-200])
+    stream.seek(500)
+    first = np.zeros((0, 2), dtype=np.float32)
+    while len(first) < 10:
+        first = np.concatenate([first, stream.read(10 - len(first))])
+    assert np.allclose(first, samples[100 + RATE // 2 : 100 + RATE // 2 + 10])
+    stream.close()
+
+
+def test_chained_stream_continues_without_gap(tmp_path):
+    """つないだ次の曲が、処理フックの状態を引き継いで切れ目なく続くか検証"""
+    path, samples = _ramp_file(tmp_path)
+    delay = _Delay()
+    first = PcmStream(path, [delay], block_frames=1000, buffer_seconds=0.1)
+    second = PcmStream(path, [delay], block_frames=1000, buffer_seconds=0.1)
+    first.start()
+    second.start(previous=first)
+    played = np.concatenate([_drain(first), _drain(second)])
+    first.close()
+    second.close()
+
+    # 1曲目の最後の 300 フレームは flush() されず、2曲目の先頭に続いて出てくる
+    assert np.allclose(played, np.concatenate([samples, samples]))
+    assert delay.resets == 2
+
+    # 読み終えた後につないだ曲は、状態を捨てて最初から始める
+    third = PcmStream(path, [delay], block_frames=1000, buffer_seconds=0.1)
+    third.start(previous=second)
+    assert np.allclose(_drain(third), samples)
+    assert delay.resets == 3
+    third.close()
+
+
+def test_chained_stream_crossfades(tmp_path):
+    """重ねた部分が2曲を混ぜた音になり、次の曲は重ねた続きから始まるか検証"""
+    path, samples = _ramp_file(tmp_path)
+    following = str(tmp_path / "following.wav")
+    constant = np.full((RATE, 2), 0.5, dtype=np.float32)
+    soundfile.write(following, constant, RATE, subtype="FLOAT")
+    gains = []
+
+    def gain(block, rate):
+        gains.append(len(block))
+        return block * 2
+
+    first = PcmStream(path, [gain], block_frames=1000, buffer_seconds=0.1)
+    second = PcmStream(following, [gain], block_frames=1000, buffer_seconds=0.1)
+    first.start()
+    second.start(previous=first, crossfade_frames=800, crossfade_gain=0.5)
+    played = np.concatenate([_drain(first), _drain(second)])
+    first.close()
+
+    assert len(played) == len(samples) + len(constant) - 800
+    fade_out, fade_in = equal_power_curves(0, 800, 800)
+    overlap = samples[-800:] * fade_out[:, None] + 0.25 * fade_in[:, None]
+    assert np.allclose(played[: len(samples) - 800], samples[:-800] * 2)
+    assert np.allclose(played[len(samples) - 800 : len(samples)], overlap * 2)
+    assert np.allclose(played[len(samples) :], 1.0)
+    # 処理フックは混ぜた後の1本の音だけを処理する
+    assert sum(gains) == len(played)
+    assert second.position() == second.duration
+    second.close()
+
+
+def test_stream_seek_and_position(tmp_path):
+    path, samples = _ramp_file(tmp_path)
+    resets = []
+
+    class Gain:
+        def __call__(self, block, rate):
+            return block
+
+        def reset(self):
+            resets.append(True)
+
+    stream = PcmStream(path, [Gain()], block_frames=500, buffer_seconds=0.1)
+    stream.start(start_position=1500)
+    played = _drain(stream)
+    assert np.allclose(played, samples[RATE * 3 // 2 :])
+
+    stream.seek(500)
+    assert stream.position() == 500
+    first = np.zeros((0, 2), dtype=np.float32)
+    while len(first) < 800:
+        first = np.concatenate([first, stream.read(800 - len(first))])
+    assert np.allclose(first, samples[RATE // 2 : RATE // 2 + 800])
+    # 取り出した 800 フレーム = 100ms 進み、出力側に残る分は差し引く
+    assert stream.position() == 600
+    assert stream.position(latency_frames=400) == 550
+    assert len(resets) >= 2
+    stream.close()
+
+
+def test_stream_converts_rate_and_channels(tmp_path):
+    path, samples = _ramp_file(tmp_path, channels=1)
+    stream = PcmStream(path, block_frames=700, buffer_seconds=0.1)
+    stream.start(output_rate=RATE * 2, output_channels=2)
+    played = _drain(stream)
+    stream.close()
+
+    assert played.shape[1] == 2
+    assert abs(len(played) - len(samples) * 2) <= 2
+    # 線形補間なので、1つおきに元のサンプルが現れる
+    assert np.allclose(played[::2, 0], samples[: len(played[::2]), 0], atol=1e-6)
+    assert np.allclose(played[:, 0], played[:, 1])
+    # 最後の1フレームは次のサンプルが無いため補間されない
+    assert stream.position() >= 1999
+
+
+def test_stream_rejects_unreadable_file(tmp_path):
+    path = tmp_path / "broken.flac"
+    path.write_bytes(b"not audio")
+    with pytest.raises(DecodeError):
+        PcmStream(str(path))
@@ -1,5 +1,6 @@
 import pytest
-from core.playlist import PlaylistManager
+from unittest.mock import patch
+from core.playlist import PlaylistManager, SongPrefetcher
 
 
 @pytest.fixture
@@ -60,3 +61,225 @@ def test_clear_playlist(manager, sample_metadata):
     manager.clear()
 
     assert len(manager.get_all_songs()) == 0
+
+
+def test_get_song_by_path(manager, sample_metadata):
+    # 登録済みの曲をパスから取得できるか
+    manager.add_song(sample_metadata)
+
+    assert manager.get_song_by_path("/path/to/song.mp3") == sample_metadata
+    assert manager.get_song_by_path("/path/to/other.mp3") is None
+
+
+def test_path_index_follows_removal(manager, sample_metadata):
+    # 同じ曲が複数ある場合、最後の1曲を消すまで索引に残るか
+    manager.add_song(sample_metadata)
+    manager.add_song(sample_metadata)
+
+    manager.remove_song(0)
+    assert manager.get_song_by_path("/path/to/song.mp3") == sample_metadata
+
+    manager.remove_song(0)
+    assert manager.get_song_by_path("/path/to/song.mp3") is None
+
+
+def test_prefetcher_warms_neighbors(tmp_path):
+    # 先読みでアルバムアートとファイル先頭が読み込まれるか
+    path = tmp_path / "next.flac"
+    path.write_bytes(b"x" * 1024)
+    song = {"file_path": str(path), "art_key": "abc"}
+
+    prefetcher = SongPrefetcher()
+    with patch("core.playlist.load_album_art") as mock_load:
+        prefetcher.prefetch([song])
+        prefetcher._pending[0].result(timeout=2)
+    prefetcher.shutdown()
+
+    mock_load.assert_called_once_with(song)
+
+
+def test_get_column(manager, sample_metadata):
+    # 項目の値をプレイリスト順にまとめて取得できるか
+    manager.add_song(sample_metadata)
+    manager.add_song({"file_path": "/path/to/other.mp3", "title": "Other"})
+
+    assert manager.get_column("title") == ["Test Song", "Other"]
+    assert manager.get_column("duration", 0) == [180, 0]
+
+
+def test_search_returns_playlist_positions(manager):
+    # 検索結果がプレイリスト上の位置で返り、追加・削除に追従するか
+    for i, title in enumerate(["Blue Moon", "Red Sun", "Moon River"]):
+        manager.add_song({"file_path": f"/music/{i}.mp3", "title": title})
+
+    assert manager.search("moon") == [0, 2]
+    assert manager.search("") is None
+
+    manager.remove_song(0)
+    assert manager.search("moon") == [1]
+
+    manager.add_song({"file_path": "/music/3.mp3", "title": "Harvest Moon"})
+    assert manager.search("moon") == [1, 2]
+
+    manager.clear()
+    assert manager.search("moon") == []
+
+
+@pytest.fixture
+def sortable_manager(manager):
+    songs = [
+        ("/m/0.mp3", "Zebra", "Beta", "Two", 300),
+        ("/m/1.mp3", "apple", "alpha", "One", 200),
+        ("/m/2.mp3", "Mango", "Beta", "One", 100),
+        ("/m/3.mp3", "Kiwi", "alpha", "Two", 250),
+    ]
+    for i, (path, title, artist, album, duration) in enumerate(songs):
+        manager.add_song(
+            {
+                "file_path": path,
+                "title": title,
+                "artist": artist,
+                "album": album,
+                "duration": duration,
+            },
+            added_at=1000 - i,
+        )
+    return manager
+
+
+def test_sort_by_artist_album_title(sortable_manager):
+    # アーティスト → アルバム → タイトルの順（大文字小文字を区別しない）で並ぶか
+    permutation = sortable_manager.sort("artist")
+
+    assert permutation == [1, 3, 2, 0]
+    assert sortable_manager.get_column("title") == ["apple", "Kiwi", "Mango", "Zebra"]
+
+
+def test_sort_reverse_and_other_keys(sortable_manager):
+    # 降順・再生時間・追加日時の並び替えと、元の位置を返す permutation
+    sortable_manager.sort("duration", reverse=True)
+    assert sortable_manager.get_column("duration") == [300, 250, 200, 100]
+
+    permutation = sortable_manager.sort("added")
+    # 直前の並び（再生時間の降順）の何番目だったか
+    assert permutation == [1, 3, 2, 0]
+    assert sortable_manager.get_column("title") == ["Kiwi", "Mango", "apple", "Zebra"]
+    assert sortable_manager.get_added_at(0) == 997
+
+
+def test_sort_after_add_and_remove(sortable_manager):
+    # 曲の追加・削除後は新しい曲も含めて並び替えられるか
+    sortable_manager.sort("title")
+    sortable_manager.remove_song(0)
+    sortable_manager.add_song({"file_path": "/m/4.mp3", "title": "Banana"})
+
+    sortable_manager.sort("title")
+    assert sortable_manager.get_column("title") == ["Banana", "Kiwi", "Mango", "Zebra"]
+    assert sortable_manager.get_song_by_path("/m/4.mp3")["title"] == "Banana"
+    assert sortable_manager.search("kiwi") == [1]
+
+
+def test_add_songs_skips_invalid_entries(manager):
+    # まとめて追加した曲は同じ追加時刻になり、無効なデータは除かれるか
+    manager.add_songs(
+        [{"file_path": "/a.mp3", "title": "A"}, None, {"file_path": "/b.mp3"}],
+        added_at=123.0,
+    )
+
+    assert len(manager) == 2
+    assert manager.get_added_at(0) == manager.get_added_at(1) == 123.0
+
+
+def test_import_songs_round_trip(sortable_manager):
+    # 書き出した曲データから、同じ並び・同じ内容のプレイリストを復元できるか
+    data = sortable_manager.export_songs()
+    restored = PlaylistManager()
+    restored.import_songs(data)
+
+    assert len(restored) == len(sortable_manager)
+    for original, song in zip(sortable_manager.get_all_songs(), restored.songs):
+        assert dict(song) == dict(original)
+    assert restored.get_added_at(0) == sortable_manager.get_added_at(0)
+    path = sortable_manager.songs[1]["file_path"]
+    assert (
+        restored.get_song_by_path(path)["title"] == sortable_manager.songs[1]["title"]
+    )
+
+
+def test_import_songs_defers_indexing(sortable_manager):
+    # 索引作りは後回しでも、検索・並び替えは正しく動くか
+    restored = PlaylistManager()
+    restored.import_songs(sortable_manager.export_songs())
+    assert restored.index_pending(0) == len(sortable_manager)
+
+    restored.remove_song(0)
+    assert restored.index_pending(1) == len(sortable_manager) - 1
+    assert restored.search(sortable_manager.songs[2]["title"]) == [1]
+    restored.sort("title")
+    assert [song["title"] for song in restored.songs] == ["apple", "Kiwi", "Mango"]
+    assert restored.index_pending() == 0
+
+
+def test_remove_songs_in_bulk(manager):
+    # まとめて削除しても、残りの並び・パス索引・検索がずれないか
+    manager.add_songs(
+        [{"file_path": f"/m/{i}.mp3", "title": f"Song{i}"} for i in range(6)]
+        + [{"file_path": "/m/1.mp3", "title": "Dup"}]
+    )
+    removed = manager.remove_songs([4, 1, 99, 1, -1])
+
+    assert [song["title"] for song in removed] == ["Song1", "Song4"]
+    assert manager.get_column("title") == ["Song0", "Song2", "Song3", "Song5", "Dup"]
+    # 同じパスの曲が残っていれば、索引はそちらを指す
+    assert manager.get_song_by_path("/m/1.mp3")["title"] == "Dup"
+    assert manager.get_song_by_path("/m/4.mp3") is None
+    assert manager.search("song5") == [3]
+    assert manager.remove_songs([]) == []
+
+
+def test_move_songs_keeps_ids(manager):
+    # 複数の曲をまとめて移動でき、曲IDから現在の位置を引けるか
+    manager.add_songs(
+        [{"file_path": f"/m/{i}.mp3", "title": f"T{i}"} for i in range(6)]
+    )
+    ids = [manager.song_id(i) for i in range(6)]
+
+    permutation = manager.move_songs([1, 3], 5)
+    assert manager.get_column("title") == ["T0", "T2", "T4", "T1", "T3", "T5"]
+    assert permutation == [0, 2, 4, 1, 3, 5]
+    assert manager.index_of(ids[3]) == 4
+
+    manager.move_songs([4, 5], 0)
+    assert manager.get_column("title") == ["T3", "T5", "T0", "T2", "T4", "T1"]
+    manager.move_songs([0], 6)
+    assert manager.get_column("title") == ["T5", "T0", "T2", "T4", "T1", "T3"]
+
+    manager.remove_song(0)
+    assert manager.index_of(ids[5]) == -1
+    assert manager.index_of(ids[1]) == 3
+
+
+def test_update_song_replaces_in_place(manager):
+    # 読み直した内容で曲を置き換えても、位置・曲ID・検索・並び替えが保たれるか
+    manager.add_songs(
+        [
+            {"file_path": "/m/a.mp3", "title": "Alpha", "album": "Old"},
+            {"file_path": "/m/b.mp3", "title": "Beta"},
+        ]
+    )
+    song_id = manager.song_id(0)
+
+    position = manager.update_song(song_id, {"file_path": "/m/a.mp3", "title": "Zeta"})
+
+    assert position == 0
+    assert manager.song_id(0) == song_id
+    song = manager.get_song_by_path("/m/a.mp3")
+    assert song["title"] == "Zeta"
+    assert "album" not in song
+    assert manager.search("alpha") == []
+    assert manager.search("zeta") == [0]
+    manager.sort("title")
+    assert manager.get_column("title") == ["Beta", "Zeta"]
+    removed_id = manager.song_id(0)
+    manager.remove_song(0)
+    assert manager.update_song(removed_id, {"title": "X"}) == -1
@@ -0,0 +1,147 @@
+import random
+import pytest
+from core.playlist import PlaylistManager
+from core.queue import PlaybackQueue
+
+
+@pytest.fixture
+def manager():
+    manager = PlaylistManager()
+    manager.add_songs(
+        [{"file_path": f"/m/{i}.mp3", "title": f"T{i}"} for i in range(10)]
+    )
+    return manager
+
+
+@pytest.fixture
+def queue(manager):
+    return PlaybackQueue(manager, rng=random.Random(0))
+
+
+def _titles(manager, song_ids):
+    return [manager.get_all_songs()[manager.index_of(i)]["title"] for i in song_ids]
+
+
+def test_sequential_next_and_previous(manager, queue):
+    # シャッフルなしではプレイリスト順に進み、端で折り返すか
+    assert _titles(manager, [queue.next(), queue.next()]) == ["T0", "T1"]
+    queue.set_current(manager.song_id(9))
+    assert _titles(manager, [queue.next()]) == ["T0"]
+    assert _titles(manager, [queue.previous(), queue.previous()]) == ["T9", "T8"]
+
+
+def test_sequential_next_after_current_removed(manager, queue):
+    # 再生中の曲が削除されても、その位置に詰めてきた曲から続くか
+    queue.set_current(manager.song_id(4))
+    queue.before_remove([3, 4])
+    manager.remove_songs([3, 4])
+    assert _titles(manager, [queue.next()]) == ["T5"]
+
+
+def test_play_next_takes_priority(manager, queue):
+    # 「次に再生」の予約が予約順に優先され、削除された予約は飛ばすか
+    queue.set_current(manager.song_id(0))
+    queue.play_next([manager.song_id(7), manager.song_id(3), manager.song_id(5)])
+    manager.remove_song(3)
+    assert _titles(manager, [queue.next(), queue.next(), queue.next()]) == [
+        "T7",
+        "T5",
+        "T6",
+    ]
+
+
+def test_shuffle_plays_every_song_once_per_round(manager, queue):
+    # 1周で全曲を1回ずつ再生し、途中で追加・削除された曲にも対応するか
+    queue.set_shuffle(True)
+    queue.set_current(manager.song_id(0))
+    played = [queue.next() for _ in range(4)]
+    removed = manager.songs[manager.index_of(played[-1]) - 1]["title"]
+    manager.remove_song(manager.index_of(played[-1]) - 1)
+    manager.add_song({"file_path": "/m/new.mp3", "title": "New"})
+    played += [queue.next() for _ in range(len(manager) - 1 - 4)]
+
+    titles = _titles(manager, played)
+    assert len(set(titles)) == len(titles)
+    assert set(titles) | {"T0"} == set(manager.get_column("title"))
+    assert removed not in titles
+    assert titles != [f"T{i}" for i in range(1, len(titles) + 1)]
+
+    # 次の周回も続けて再生できる
+    assert queue.next() is not None
+
+
+def test_shuffle_history(manager, queue):
+    # シャッフル中の「前へ」は再生した順に戻り、「次へ」で進み直せるか
+    queue.set_shuffle(True)
+    queue.set_current(manager.song_id(0))
+    played = [queue.next() for _ in range(3)]
+
+    assert queue.previous() == played[1]
+    assert queue.previous() == played[0]
+    assert queue.previous() == manager.song_id(0)
+    assert [queue.next(), queue.next()] == played[:2]
+
+    # ユーザーが曲を選ぶと、進み直す履歴は捨てる
+    chosen = next(i for i in manager.song_ids() if i not in played + [0])
+    queue.set_current(chosen)
+    assert queue.next() not in played + [0, chosen]
+
+
+def test_empty_playlist():
+    queue = PlaybackQueue(PlaylistManager())
+    assert queue.next() is None
+    assert queue.previous() is None
+    queue.set_shuffle(True)
+    assert queue.next() is None
+
+
+def test_peek_next_matches_next(manager, queue):
+    # 次の曲を先に調べても現在の曲は変わらず、next() は同じ曲を返すか
+    queue.set_current(manager.song_id(0))
+    assert queue.peek_next() == manager.song_id(1)
+    assert queue.current_id == manager.song_id(0)
+    assert queue.next() == manager.song_id(1)
+
+    queue.play_next([manager.song_id(7)])
+    assert queue.peek_next() == manager.song_id(7)
+    assert queue.next() == manager.song_id(7)
+
+    queue.set_shuffle(True)
+    peeked = [queue.peek_next() for _ in range(3)]
+    assert len(set(peeked)) == 1
+    assert queue.next() == peeked[0]
+
+
+def test_peek_previous_matches_previous(manager, queue):
+    # 前の曲を先に調べても現在の曲は変わらず、previous() は同じ曲を返すか
+    queue.set_current(manager.song_id(3))
+    assert queue.peek_previous() == manager.song_id(2)
+    assert queue.current_id == manager.song_id(3)
+
+    queue.set_shuffle(True)
+    played = [queue.next() for _ in range(2)]
+    assert queue.peek_previous() == played[0]
+    assert queue.previous() == played[0]
+    assert queue.peek_previous() == manager.song_id(3)
+    assert queue.previous() == manager.song_id(3)
+
+
+def test_peek_then_pick_keeps_song_in_round():
+    # 先読みした後に別の曲を選んでも、先読みした曲はこの周回で再生されるか
+    manager = PlaylistManager()
+    manager.add_songs([{"file_path": f"/m/{i}.mp3"} for i in range(6)])
+    ids = manager.song_ids()
+    queue = PlaybackQueue(manager, rng=random.Random(0))
+    queue.set_shuffle(True)
+    first = queue.next()
+
+    peeked = queue.peek_next()
+    picked = next(i for i in ids if i not in (peeked, first))
+    queue.set_current(picked)
+
+    played = {first, picked}
+    while len(played) < 6:
+        song_id = queue.next()
+        assert song_id not in played
+        played.add(song_id)
+    assert peeked in played
@@ -0,0 +1,79 @@
+import os
+import pytest
+from core.scanner import LibraryScanner
+
+
+@pytest.fixture
+def library(tmp_path):
+    """アルバムフォルダを含む小さなライブラリを作成する"""
+    root = tmp_path / "library"
+    (root / "Artist" / "Album").mkdir(parents=True)
+    (root / "Artist" / "Album" / "02.flac").write_bytes(b"2")
+    (root / "Artist" / "Album" / "01.flac").write_bytes(b"1")
+    (root / "Artist" / "cover.jpg").write_bytes(b"img")
+    (root / "single.MP3").write_bytes(b"s")
+    return root
+
+
+def test_scan_finds_audio_recursively(library):
+    # サブフォルダまで辿り、音声ファイルだけを名前順に列挙するか
+    result = LibraryScanner().scan(str(library))
+
+    names = [os.path.relpath(p, library) for p in result.files]
+    assert names == [
+        "single.MP3",
+        os.path.join("Artist", "Album", "01.flac"),
+        os.path.join("Artist", "Album", "02.flac"),
+    ]
+    assert result.added == result.files
+
+
+def test_rescan_unchanged_tree_has_no_diff(library, tmp_path):
+    # ジャーナルを保存し、別インスタンスでの再スキャンで差分が出ないか
+    journal = str(tmp_path / "journal.json")
+    LibraryScanner(journal).scan(str(library))
+
+    result = LibraryScanner(journal).scan(str(library))
+
+    assert len(result.files) == 3
+    assert not result.has_changes
+
+
+def test_rescan_reports_added_changed_removed(library):
+    # 追加・更新・削除がそれぞれ差分として検出されるか
+    scanner = LibraryScanner()
+    scanner.scan(str(library))
+
+    album = library / "Artist" / "Album"
+    (album / "03.flac").write_bytes(b"3")
+    (album / "01.flac").write_bytes(b"longer content")
+    os.remove(album / "02.flac")
+
+    result = scanner.scan(str(library))
+
+    assert result.added == [str(album / "03.flac")]
+    assert result.changed == [str(album / "01.flac")]
+    assert result.removed == [str(album / "02.flac")]
+
+
+def test_scan_without_commit_keeps_diff(library):
+    # commit=False の走査はジャーナルを変えず、commit() するまで同じ差分を返すか
+    scanner = LibraryScanner()
+    scanner.scan(str(library))
+    (library / "new.flac").write_bytes(b"n")
+
+    result = scanner.scan(str(library), commit=False)
+    assert result.added == [str(library / "new.flac")]
+    assert scanner.scan(str(library), commit=False).added == result.added
+
+    scanner.commit(result)
+    assert not scanner.scan(str(library)).has_changes
+
+
+def test_forget_resets_journal(library):
+    # ジャーナルを破棄すると全件が追加扱いになるか
+    scanner = LibraryScanner()
+    scanner.scan(str(library))
+    scanner.forget(str(library))
+
+    assert len(scanner.scan(str(library)).added) == 3
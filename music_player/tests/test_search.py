@@ -0,0 +1,85 @@
+import pytest
+from core.search import SearchIndex, normalize_text
+
+
+@pytest.fixture
+def index():
+    idx = SearchIndex()
+    idx.add(
+        0, {"title": "Moonlight Drive", "artist": "The Doors", "album": "Strange Days"}
+    )
+    idx.add(1, {"title": "夜に駆ける", "artist": "ヨアソビ", "album": "THE BOOK"})
+    idx.add(
+        2, {"title": "Blue Moon", "artist": "Billie Holiday", "composer": "Rodgers"}
+    )
+    return idx
+
+
+def test_normalize_text():
+    # 全角・大文字・カタカナの違いが吸収されるか
+    assert normalize_text("ＡＢＣ") == "abc"
+    assert normalize_text("サクラ") == normalize_text("さくら")
+    assert normalize_text("ｻｸﾗ") == "さくら"
+
+
+def test_word_prefix_match(index):
+    # 英数字は単語の先頭一致で、どの項目にあっても見つかるか
+    assert index.search("moon") == {0, 2}
+    assert index.search("MOONL") == {0}
+    assert index.search("doors") == {0}
+    assert index.search("rodg") == {2}
+    # 単語の途中だけでは一致しない
+    assert index.search("oon") == set()
+
+
+def test_cjk_substring_match(index):
+    # かな・漢字は部分一致で、カタカナとひらがなを区別しないか
+    assert index.search("駆け") == {1}
+    assert index.search("よあそび") == {1}
+    assert index.search("アソ") == {1}
+
+
+def test_multiple_words_are_and(index):
+    # 空白区切りの語はすべてを含む曲だけが一致するか
+    assert index.search("moon billie") == {2}
+    assert index.search("moon 夜") == set()
+
+
+def test_empty_query_returns_none(index):
+    assert index.search("") is None
+    assert index.search("   ") is None
+
+
+def test_single_character_query(index):
+    # 1文字の英数字は索引を使わずに全件から照合されるか
+    assert index.search("b") == {1, 2}
+
+
+def test_remove_and_slot_reuse(index):
+    # 削除した曲は一致せず、再利用したスロットは新しい内容で検索されるか
+    index.remove(0)
+    assert index.search("moon") == {2}
+    assert len(index) == 2
+
+    index.add(0, {"title": "Sunrise"})
+    assert index.search("moon") == {2}
+    assert index.search("sun") == {0}
+
+
+def test_refining_query_after_update(index):
+    # 入力を伸ばす途中で曲が追加されても、その曲が結果に含まれるか
+    assert index.search("bl") == {2}
+    index.add(3, {"title": "Blues Run"})
+    assert index.search("blu") == {2, 3}
+
+
+def test_compaction_keeps_results(index):
+    # 削除済みの記録を掃除しても検索結果が変わらないか
+    for slot in range(3, 2000):
+        index.add(slot, {"title": f"Filler {slot}"})
+    for slot in range(3, 2000):
+        index.remove(slot)
+
+    assert index._garbage < 1024
+    assert index.search("moon") == {0, 2}
+    assert index.search("filler") == set()
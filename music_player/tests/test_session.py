@@ -0,0 +1,103 @@
+import json
+from core.playlist import PlaylistManager
+from core.session import SESSION_VERSION, load_session, save_session
+
+
+def _manager():
+    manager = PlaylistManager()
+    manager.add_songs(
+        [
+            {
+                "file_path": "/m/a.flac",
+                "title": "曲A",
+                "artist": "歌手",
+                "album": "アルバム",
+                "duration": 201.5,
+                "art_key": "abc",
+                "track": 3,
+            },
+            {"file_path": "/m/b.mp3", "title": "B", "artist": "歌手"},
+        ],
+        added_at=1234.5,
+    )
+    return manager
+
+
+def test_session_round_trip(tmp_path):
+    # プレイリストと再生状態が保存前と同じ内容で戻るか
+    path = str(tmp_path / "session.json")
+    manager = _manager()
+    state = {"current_row": 1, "position": 4200, "volume": 35, "eq": {"1kHz": -3}}
+    save_session(path, manager, state)
+
+    songs, restored_state = load_session(path)
+    restored = PlaylistManager()
+    restored.import_songs(songs)
+
+    assert restored_state == state
+    assert [dict(song) for song in restored.songs] == [
+        dict(song) for song in manager.songs
+    ]
+    # 無い項目は無いまま、追加時刻も保たれる
+    assert "art_key" not in restored.songs[1]
+    assert restored.get_added_at(1) == 1234.5
+    assert restored.search("曲a") == [0]
+
+
+def test_load_session_missing_or_broken(tmp_path):
+    # 無い・壊れた・古い形式のファイルは None を返すか
+    assert load_session(str(tmp_path / "none.json")) is None
+    assert load_session(None) is None
+
+    broken = tmp_path / "broken.json"
+    broken.write_text("{not json", encoding="utf-8")
+    assert load_session(str(broken)) is None
+
+    old = tmp_path / "old.json"
+    old.write_text(
+        json.dumps({"version": SESSION_VERSION - 1, "songs": {}}), encoding="utf-8"
+    )
+    assert load_session(str(old)) is None
+
+
+def test_save_session_replaces_file_atomically(tmp_path):
+    # 上書き保存で一時ファイルが残らないか
+    path = tmp_path / "session.json"
+    save_session(str(path), _manager(), {})
+    save_session(str(path), PlaylistManager(), {"volume": 10})
+
+    assert [p.name for p in tmp_path.iterdir()] == ["session.json"]
+    songs, state = load_session(str(path))
+    assert songs["count"] == 0
+    assert state == {"volume": 10}
+
+
+def test_load_session_ignores_invalid_songs(tmp_path):
+    # 途中で切れた・書き換えられた曲データは空のプレイリストにし、状態は残すか
+    path = str(tmp_path / "session.json")
+    save_session(path, _manager(), {"volume": 40})
+    valid = json.loads(open(path, encoding="utf-8").read())
+
+    def broken(change):
+        data = json.loads(json.dumps(valid))
+        change(data["songs"])
+        return data
+
+    cases = [
+        broken(lambda songs: songs["columns"]["title"].pop()),
+        broken(lambda songs: songs["columns"]["artist"]["codes"].append(5)),
+        broken(lambda songs: songs.update(count=3)),
+        broken(lambda songs: songs["durations"].__setitem__(0, "long")),
+        broken(lambda songs: songs["missing"].update(art_key=[7])),
+        broken(lambda songs: songs["columns"]["file_path"].__setitem__(0, ["/m"])),
+        broken(lambda songs: songs.pop("columns")),
+        {"version": SESSION_VERSION, "songs": [], "state": "x"},
+    ]
+    for data in cases:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        songs, state = load_session(path)
+        manager = PlaylistManager()
+        manager.import_songs(songs)
+        assert len(manager) == 0
+        assert state in ({"volume": 40}, {})
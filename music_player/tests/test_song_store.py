@@ -0,0 +1,92 @@
+import pytest
+from core.song_store import SongStore
+
+
+@pytest.fixture
+def store():
+    return SongStore()
+
+
+def _song(i, artist="Shared Artist"):
+    # 毎回新しい文字列オブジェクトを作り、intern の効果を確認できるようにする
+    return {
+        "file_path": f"/music/{i}.flac",
+        "title": f"Title {i}",
+        "artist": "".join(artist),
+        "duration": 100 + i,
+    }
+
+
+def test_row_behaves_like_dict(store):
+    # SongRow から辞書と同じように値を読み書きできるか
+    row = store.row(store.add(_song(1)))
+
+    assert row["title"] == "Title 1"
+    assert row["duration"] == 101
+    assert row.get("album", "none") == "none"
+    assert "album" not in row
+    assert dict(row) == _song(1)
+
+    row["art_key"] = "abc"
+    assert row["art_key"] == "abc"
+
+
+def test_repeated_strings_are_shared(store):
+    # 繰り返し現れる文字列は1つのオブジェクトを共有するか
+    first = store.row(store.add(_song(1, artist=["A", "rtist"])))
+    second = store.row(store.add(_song(2, artist=["Ar", "tist"])))
+
+    assert first["artist"] is second["artist"]
+
+
+def test_extra_keys_are_kept(store):
+    # 列に無いキーや整数以外の再生時間も失われないか
+    song = {"file_path": "x.mp3", "duration": 12.5, "rating": 5}
+    row = store.row(store.add(song))
+
+    assert row.to_dict() == song
+
+
+def test_freed_slot_is_reused_and_old_view_invalidated(store):
+    # 解放したスロットは再利用され、古いビューは無効になるか
+    slot = store.add(_song(1))
+    old_row = store.row(slot)
+    store.free(slot)
+
+    new_slot = store.add(_song(2))
+    assert new_slot == slot
+    assert not old_row.is_valid()
+    with pytest.raises(LookupError):
+        old_row["title"]
+
+    # 無効なビューへの書き込みは新しい曲に影響しない
+    old_row["title"] = "overwritten"
+    assert store.row(new_slot)["title"] == "Title 2"
+
+
+def test_view_taken_before_clear_stays_invalid(store):
+    # clear() 後に追加した曲が同じスロットに入っても、古いビューは無効のままか
+    slot = store.add(_song(1))
+    old_row = store.row(slot)
+    store.clear()
+
+    new_slot = store.add(_song(2))
+    assert new_slot == slot
+    assert not old_row.is_valid()
+    old_row["title"] = "overwritten"
+    assert store.row(new_slot)["title"] == "Title 2"
+
+
+def test_slot_of_follows_ids():
+    # 曲IDからスロットを引け、解放後は None になるか
+    store = SongStore()
+    first = store.add({"title": "A"})
+    second = store.add({"title": "B"})
+    assert store.slot_of(store.id_of(second)) == second
+
+    first_id = store.id_of(first)
+    store.free(first)
+    assert store.slot_of(first_id) is None
+    reused = store.add({"title": "C"})
+    assert reused == first
+    assert store.slot_of(store.id_of(reused)) == first
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from unittest.mock import patch
 from PySide6.QtCore import Qt, QMimeData, QUrl, QPoint, QEvent
@@ -6,6 +7,7 @@ from ui.components.drop_zone import DropZone
 from ui.components.playlist_view import PlaylistView
 from ui.components.clickable_slider import ClickableSlider
 from ui.components.player_controls import PlayerControls
+from ui.components.spectrum_view import SpectrumVisualizer
 
 
 def test_drop_zone_full_logic(qtbot):
@@ -40,7 +42,7 @@ def test_playlist_view_interaction(qtbot):
     view.add_song_item(test_song_data)
     assert view.count() == 1
     with qtbot.waitSignal(view.songSelected, timeout=1000) as blocker:
-        view.itemDoubleClicked.emit(view.item(0))
+        view.doubleClicked.emit(view.model().index(0))
     assert blocker.args[0] == "/path/test.flac"
 
 
@@ -191,7 +193,7 @@ def test_playlist_view_full_coverage(qtbot):
 
     # 1. アイテム上での右クリックイベント
     # アイテムが存在する座標（1行目の中心あたり）を狙う
-    item_rect = view.visualItemRect(view.item(0))
+    item_rect = view.visualRect(view.model().index(0))
     pos = item_rect.center()
     event = QContextMenuEvent(QContextMenuEvent.Mouse, pos, view.mapToGlobal(pos))
     view.contextMenuEvent(event)  # menu.popup() なのでブロックされない
@@ -215,3 +217,193 @@ def test_player_controls_tooltip_logic_fix(qtbot):
         # 再生時間表示
         controls._show_hover_time(60000, QPoint(0, 0))
         mock_tooltip.assert_called_with(QPoint(0, 0), "01:00", controls.slider)
+
+
+def test_drop_zone_right_click_selects_folder(qtbot):
+    """右クリックで選択したフォルダがそのまま通知されるか検証"""
+    widget = DropZone()
+    qtbot.addWidget(widget)
+
+    with patch(
+        "ui.components.drop_zone.QFileDialog.getExistingDirectory",
+        return_value="/tmp/music",
+    ):
+        with qtbot.waitSignal(widget.filesDropped, timeout=1000) as blocker:
+            qtbot.mouseClick(widget, Qt.RightButton)
+
+    assert blocker.args[0] == ["/tmp/music"]
+
+
+def test_playlist_view_set_visible_rows(qtbot):
+    """絞り込みで一致した曲だけが行になり、行番号はプレイリスト上の位置で扱えるか"""
+    view = PlaylistView()
+    qtbot.addWidget(view)
+    for i in range(4):
+        view.add_song_item({"title": f"T{i}", "artist": "A", "file_path": f"/p/{i}"})
+    view.setCurrentRow(3)
+
+    view.set_visible_rows([1, 3])
+    assert view.visible_rows() == [1, 3]
+    assert view.model().rowCount() == 2
+    assert view.count() == 4
+    assert view.currentRow() == 3
+
+    # 絞り込み中に削除しても、残りの曲の位置がずれて追従するか
+    with qtbot.waitSignal(view.songDeleted, timeout=1000) as blocker:
+        view.setCurrentRow(1)
+        qtbot.keyClick(view, Qt.Key_Delete)
+    assert blocker.args[0] == 1
+    view.remove_song(0)
+    assert view.visible_rows() == [0, 2]
+    assert view.file_path_at(2) == "/p/3"
+
+    view.set_visible_rows(None)
+    assert view.visible_rows() == [0, 1, 2]
+
+
+def test_playlist_view_sort_keeps_current_song(qtbot):
+    """並び替えても行を作り直さず、選択中の曲が維持されるか"""
+    view = PlaylistView()
+    qtbot.addWidget(view)
+    view.add_songs(
+        [
+            {"title": title, "artist": "A", "file_path": f"/p/{title}"}
+            for title in ["Charlie", "Alpha", "Bravo"]
+        ]
+    )
+    view.setCurrentRow(0)
+
+    view.sort_songs("title")
+
+    assert [view.file_path_at(r) for r in range(3)] == [
+        "/p/Alpha",
+        "/p/Bravo",
+        "/p/Charlie",
+    ]
+    assert view.currentRow() == 2
+
+
+def test_playlist_view_batch_insert_and_lazy_text(qtbot):
+    """まとめて追加した曲が1回の挿入通知で反映され、表示文字列が作られるか"""
+    view = PlaylistView()
+    qtbot.addWidget(view)
+    inserted = []
+    view.model().rowsInserted.connect(
+        lambda parent, first, last: inserted.append((first, last))
+    )
+
+    view.add_songs(
+        [{"title": f"T{i}", "artist": "A", "file_path": f"/p/{i}"} for i in range(100)]
+        + [None]
+    )
+
+    assert inserted == [(0, 99)]
+    assert view.count() == 100
+    assert view.model().index(5).data() == "T5 - A"
+    assert view.file_path_at(99) == "/p/99"
+
+
+def test_playlist_view_bulk_remove_single_notification(qtbot):
+    """飛び飛びの複数削除が1回の通知で済み、現在の曲が維持されるか"""
+    view = PlaylistView()
+    qtbot.addWidget(view)
+    view.add_songs(
+        [{"title": f"T{i}", "artist": "A", "file_path": f"/p/{i}"} for i in range(10)]
+    )
+    view.setCurrentRow(5)
+    notifications = []
+    model = view.model()
+    model.rowsRemoved.connect(lambda *args: notifications.append("remove"))
+    model.modelReset.connect(lambda: notifications.append("reset"))
+
+    removed = view.remove_songs([1, 3, 8])
+    assert [song["file_path"] for song in removed] == ["/p/1", "/p/3", "/p/8"]
+    assert notifications == ["reset"]
+    assert view.file_path_at(view.currentRow()) == "/p/5"
+
+    # 連続した範囲は行の削除として通知する
+    view.remove_songs([0, 1])
+    assert notifications == ["reset", "remove"]
+    assert view.count() == 5
+    assert view.file_path_at(view.currentRow()) == "/p/5"
+
+
+def test_playlist_view_drag_reorder(qtbot):
+    """選択した曲をドロップ位置へまとめて移動し、元の行は消えないか"""
+    view = PlaylistView()
+    view.resize(300, 400)
+    view.show()
+    qtbot.addWidget(view)
+    qtbot.waitExposed(view)
+    view.add_songs(
+        [{"title": f"T{i}", "artist": "A", "file_path": f"/p/{i}"} for i in range(5)]
+    )
+    selection = view.selectionModel()
+    for row in (0, 1):
+        selection.select(
+            view.model().index(row),
+            selection.SelectionFlag.Select | selection.SelectionFlag.Rows,
+        )
+    assert view.selected_positions() == [0, 1]
+
+    # 4行目（T3）の下半分へドロップする
+    rect = view.visualRect(view.model().index(3))
+    mime = view.model().mimeData([view.model().index(0)])
+    with patch.object(QDropEvent, "source", return_value=view):
+        event = QDropEvent(
+            rect.center() + QPoint(0, 2),
+            Qt.MoveAction,
+            mime,
+            Qt.LeftButton,
+            Qt.NoModifier,
+        )
+        view.dropEvent(event)
+
+    assert event.dropAction() == Qt.IgnoreAction
+    assert [view.file_path_at(r) for r in range(5)] == [
+        "/p/2",
+        "/p/3",
+        "/p/0",
+        "/p/1",
+        "/p/4",
+    ]
+    assert view.selected_positions() == [2, 3]
+
+
+def test_spectrum_visualizer_modes_and_ring_image(qtbot):
+    """バー表示の減衰と、スペクトログラムが最新の列だけを書き足すことを検証"""
+    view = SpectrumVisualizer(history=8)
+    qtbot.addWidget(view)
+    view.resize(160, 80)
+    view.show()
+    qtbot.waitExposed(view)
+    assert view._timer.isActive()
+
+    levels = np.full(4, -80.0)
+    levels[0] = 0.0
+    view.set_spectrum(levels)
+    view._tick()
+    assert view._bars[0] == 0.0
+    # 音が止まってもバーは一気に落ちず、少しずつ下がる
+    view.set_spectrum(np.full(4, -80.0))
+    view._last_tick -= 0.1
+    view._tick()
+    assert -10.0 < view._bars[0] < 0.0
+    view.grab()
+
+    # スペクトログラムは書き込み位置だけが新しい列になる
+    before = view._pixels.copy()
+    view.set_spectrum(levels)
+    changed = np.flatnonzero((view._pixels != before).any(axis=0))
+    assert changed.tolist() == [2]
+    assert view._column == 3
+    # 低域（先頭のバンド）は一番下の行に描く
+    assert view._pixels[-1, 2] == view._colors[255]
+
+    with qtbot.waitSignal(view.modeChanged) as blocker:
+        qtbot.mouseClick(view, Qt.LeftButton)
+    assert blocker.args == [SpectrumVisualizer.SPECTROGRAM]
+    view.grab()
+
+    view.hide()
+    assert not view._timer.isActive()
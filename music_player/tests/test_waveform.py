@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from core.metadata_cache import MetadataCache
+from core.waveform import WAVEFORM_KIND, WaveformLoader, compute_waveform
+from dsp.waveform import (
+    PeakAccumulator,
+    waveform_columns,
+    waveform_from_bytes,
+    waveform_to_bytes,
+)
+
+soundfile = pytest.importorskip("soundfile")
+
+
+def _expected_peaks(samples, buckets):
+    edges = np.arange(buckets + 1) * len(samples) // buckets
+    low = [samples[a:b].min() for a, b in zip(edges[:-1], edges[1:])]
+    high = [samples[a:b].max() for a, b in zip(edges[:-1], edges[1:])]
+    return np.array(low), np.array(high)
+
+
+def test_peaks_do_not_depend_on_block_boundaries():
+    """ブロックの切れ目が区間の途中にあっても、区間ごとの最小・最大が正しいか検証"""
+    rng = np.random.default_rng(0)
+    samples = rng.uniform(-1, 1, (100003, 2)).astype(np.float32)
+    peaks = PeakAccumulator(len(samples), buckets=1000)
+    start = 0
+    for size in [1, 5000, 77, 40000, 54925]:
+        peaks.add(samples[start : start + size])
+        start += size
+    low, high = _expected_peaks(samples, 1000)
+    assert np.array_equal(peaks.minimum, low)
+    assert np.array_equal(peaks.maximum, high)
+
+
+def test_levels_and_bytes_round_trip():
+    """多段解像度の各段と保存用のバイト列が、元の山を小さくせずに戻るか検証"""
+    rng = np.random.default_rng(1)
+    samples = rng.uniform(-1, 1, (50000, 1)).astype(np.float32)
+    peaks = PeakAccumulator(len(samples), buckets=1000)
+    peaks.add(samples)
+    levels = waveform_from_bytes(waveform_to_bytes(peaks.levels()))
+    assert [len(low) for low, _ in levels] == [1000, 500, 250, 125, 63, 32]
+
+    # 粗い段も、その範囲の元の最小・最大を含む（int8 への丸め分だけ外側）
+    low, high = _expected_peaks(samples, 125)
+    assert np.all(levels[3][0] <= low + 1e-6)
+    assert np.all(levels[3][1] >= high - 1e-6)
+    assert np.all(levels[3][1] - high < 2.0 / 127)
+
+    columns_low, columns_high = waveform_columns(levels, 300)
+    assert len(columns_low) == len(columns_high) == 300
+
+
+def test_compute_waveform_is_cached(qtbot, tmp_path, monkeypatch):
+    """読み込んだ波形がキャッシュに保存され、2回目は計算し直さないか検証"""
+    rate = 8000
+    t = np.arange(rate * 4) / rate
+    # 前半は小さく、後半は大きい音
+    samples = np.where(t < 2, 0.1, 0.8) * np.sin(2 * np.pi * 440 * t)
+    path = str(tmp_path / "song.flac")
+    soundfile.write(path, samples, rate)
+
+    levels = waveform_from_bytes(compute_waveform(path))
+    low, high = levels[-1]
+    half = len(high) // 2
+    assert high[:half].max() == pytest.approx(0.1, abs=0.02)
+    assert high[half:].min() == pytest.approx(0.8, abs=0.02)
+    assert compute_waveform(str(tmp_path / "missing.flac")) is None
+
+    cache = MetadataCache(str(tmp_path / "cache.db"))
+    loader = WaveformLoader(cache)
+    with qtbot.waitSignal(loader.waveform_ready, timeout=10000) as blocker:
+        loader.load(path)
+    assert blocker.args[0] == path
+    assert cache.get_analysis(path, WAVEFORM_KIND) is not None
+
+    def fail(path):
+        raise AssertionError("キャッシュ済みの曲を計算し直した")
+
+    monkeypatch.setattr("core.waveform.compute_waveform", fail)
+    with qtbot.waitSignal(loader.waveform_ready, timeout=10000) as blocker:
+        loader.load(path)
+    assert np.array_equal(blocker.args[1][0][1], levels[0][1])
+    cache.close()
+
+
+def test_compute_waveform_stops_when_cancelled(tmp_path):
+    """打ち切りを指示すると、残りのブロックをデコードせずに None を返すか検証"""
+    rate = 8000
+    path = str(tmp_path / "long.flac")
+    soundfile.write(path, np.zeros(rate * 10), rate)
+    checks = []
+
+    def cancelled():
+        checks.append(True)
+        return len(checks) > 2
+
+    assert compute_waveform(path, block_frames=rate, cancelled=cancelled) is None
+    assert len(checks) == 3
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import numpy as np
+
+# tools/ から実行しても dsp パッケージを import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dsp.biquad import BiquadCascade, sosfilt_direct
+from dsp.filter_design import calculate_peaking_eq_sos
+from dsp.kernels import available_backends
+
+RATE = 48000
+FREQS = [31, 62, 125, 250, 500, 1000, 2000, 4000, 8000, 16000]
+GAINS = [6, -3, 4, -12, 12, 2, -5, 3, 7, -8]
+
+
+def measure(label, run, seconds, baseline=None):
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    speed = seconds / elapsed
+    note = f"   x{speed / baseline:8.1f} vs reference" if baseline else ""
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms   {speed:8.1f}x real time{note}")
+    return speed
+
+
+def main(seconds=30, block_frames=4096):
+    print(
+        f"=== 10-band EQ benchmark ({seconds} s, {RATE} Hz stereo,"
+        f" {block_frames}-frame blocks) ==="
+    )
+    sos = calculate_peaking_eq_sos(FREQS, RATE, GAINS)
+    samples = np.random.default_rng(0).standard_normal((RATE * seconds, 2))
+    samples = samples.astype(np.float32)
+
+    # サンプルごとの Python ループは遅いので、短く切って測る
+    short = samples[: RATE // 10]
+    baseline = measure(
+        "reference (Python loop)", lambda: sosfilt_direct(sos, short), 0.1
+    )
+
+    for backend in available_backends():
+        cascade = BiquadCascade(sos, 2, backend=backend)
+        # 初回呼び出し（Numba はコンパイルまたはキャッシュの読み込み）を分けて測る
+        start = time.perf_counter()
+        cascade.process(samples[:block_frames])
+        elapsed = time.perf_counter() - start
+        print(f"{backend + ' (first call)':<28} {elapsed * 1000:9.1f} ms")
+
+        def run():
+            for i in range(0, len(samples), block_frames):
+                cascade.process(samples[i : i + block_frames])
+
+        measure(backend, run, seconds, baseline)
+
+
+if __name__ == "__main__":
+    main()
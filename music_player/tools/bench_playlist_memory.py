@@ -0,0 +1,66 @@
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+# tools/ から実行しても core パッケージを import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.playlist import PlaylistManager
+
+
+def make_songs(count):
+    """
+    実際のライブラリに近い偏りを持つダミーのメタデータを生成する。
+    extract_metadata の結果と同様に、曲ごとに別の文字列オブジェクトを作ります。
+    """
+    for i in range(count):
+        artist_id = i // 100
+        album_id = i // 12
+        yield {
+            "file_path": f"/music/Artist {artist_id}/Album {album_id}/{i % 12:02d}.flac",
+            "title": f"Track Title {i}",
+            "artist": f"Artist {artist_id}",
+            "album": f"Album {album_id}",
+            "composer": "Unknown Composer"[:],
+            "duration": 180 + i % 240,
+            "art_key": f"{album_id:032x}",
+        }
+
+
+def measure(label, build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    container = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {current / 1024 / 1024:8.1f} MB   build {elapsed:6.2f} s")
+    return container
+
+
+def main(count=500_000):
+    print(f"=== Playlist memory benchmark ({count:,} songs) ===")
+
+    songs = measure("list of dict (before)", lambda: list(make_songs(count)))
+    start = time.perf_counter()
+    total = sum(song["duration"] for song in songs)
+    print(f"{'':<28} scan duration: {time.perf_counter() - start:.3f} s ({total})")
+    del songs
+
+    def build_manager():
+        manager = PlaylistManager()
+        for song in make_songs(count):
+            manager.add_song(song)
+        return manager
+
+    manager = measure("PlaylistManager (columnar)", build_manager)
+    start = time.perf_counter()
+    total = sum(manager.get_column("duration"))
+    print(f"{'':<28} scan duration: {time.perf_counter() - start:.3f} s ({total})")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
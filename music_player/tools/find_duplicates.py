@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+
+# tools/ から実行しても core パッケージを import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.decoder import can_decode
+from core.duplicates import find_duplicates
+from core.metadata_cache import MetadataCache
+from core.scanner import LibraryScanner
+from core.utils import get_user_data_path
+
+
+def main(folders):
+    if not can_decode():
+        print("Error: soundfile (libsndfile) is required to decode audio.")
+        return
+
+    scanner = LibraryScanner()
+    paths = []
+    for folder in folders:
+        paths.extend(path for path, _, _ in scanner.walk(folder))
+    print(f"=== Duplicate search ({len(paths):,} files) ===")
+
+    # フィンガープリントはアプリと同じキャッシュに保存し、2回目以降は再計算しない
+    cache = MetadataCache(get_user_data_path("metadata_cache.db"))
+    start = time.perf_counter()
+
+    def show_progress(done, total):
+        print(f"\rfingerprint {done:,} / {total:,}", end="", flush=True)
+
+    try:
+        clusters = find_duplicates(paths, cache=cache, on_progress=show_progress)
+    finally:
+        cache.close()
+    print(f"\n{len(clusters)} clusters in {time.perf_counter() - start:.1f} s")
+
+    for cluster in clusters:
+        print("-" * 50)
+        for path in cluster:
+            print(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python find_duplicates.py <music_folder> [<music_folder> ...]")
+    else:
+        main(sys.argv[1:])
@@ -1,5 +1,12 @@
+import numpy as np
 from PySide6.QtWidgets import QSlider, QStyle, QStyleOptionSlider, QToolTip
 from PySide6.QtCore import Qt, Signal, QPoint
+from PySide6.QtGui import QImage, QPainter
+from dsp.waveform import waveform_columns
+
+# 波形の色（再生済みの部分 / まだ再生していない部分）
+_PLAYED_COLOR = 0xFF00A88A
+_REMAINING_COLOR = 0xFF3A3A3A
 
 
 class ClickableSlider(QSlider):
@@ -10,6 +17,76 @@ class ClickableSlider(QSlider):
         super().__init__(orientation, parent)
         # ボタンを押していなくてもマウスの動きを検知するように設定
         self.setMouseTracking(True)
+        # シークバーの背景に描く波形の概形と、描画サイズごとに作った画像
+        self._waveform = None
+        self._waveform_images = None
+        self._waveform_size = None
+
+    def set_waveform(self, levels):
+        """
+        背景に描く波形（[(最小値, 最大値), ...] の多段解像度）を設定する。
+        None で消します。
+        """
+        self._waveform = levels
+        self._waveform_images = None
+        self.update()
+
+    def resizeEvent(self, event):
+        self._waveform_images = None
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        if self._waveform is not None and self.orientation() == Qt.Horizontal:
+            groove = self._groove_rect()
+            images = self._waveform_image(groove.width(), self.height())
+            if images is not None:
+                played, remaining = images
+                # 再生位置より左を再生済みの色で描く
+                split = QStyle.sliderPositionFromValue(
+                    self.minimum(), self.maximum(), self.value(), groove.width()
+                )
+                painter = QPainter(self)
+                painter.drawImage(groove.x(), 0, played, 0, 0, split, played.height())
+                painter.drawImage(
+                    groove.x() + split,
+                    0,
+                    remaining,
+                    split,
+                    0,
+                    remaining.width() - split,
+                    remaining.height(),
+                )
+                painter.end()
+        super().paintEvent(event)
+
+    def _waveform_image(self, width, height):
+        """波形を描いた画像を返す（大きさが変わった時だけ作り直す）"""
+        if width <= 0 or height <= 0:
+            return None
+        if self._waveform_images is not None and self._waveform_size == (
+            width,
+            height,
+        ):
+            return self._waveform_images
+        low, high = waveform_columns(self._waveform, width)
+        # 列ごとの上端・下端の行（1列に満たない時は横に引き伸ばす）
+        columns = np.arange(width) * len(low) // width
+        middle = (height - 1) / 2.0
+        top = np.floor(middle - high[columns] * middle)
+        bottom = np.ceil(middle - low[columns] * middle)
+        rows = np.arange(height)[:, None]
+        inside = (rows >= top) & (rows <= bottom)
+        images = []
+        for color in (_PLAYED_COLOR, _REMAINING_COLOR):
+            pixels = np.where(inside, np.uint32(color), np.uint32(0)).astype(np.uint32)
+            # copy() で numpy 配列から切り離した画像にする
+            image = QImage(
+                pixels.data, width, height, width * 4, QImage.Format_ARGB32
+            ).copy()
+            images.append(image)
+        self._waveform_images = tuple(images)
+        self._waveform_size = (width, height)
+        return self._waveform_images
 
     def mouseMoveEvent(self, event):
         """マウス移動時にホバー位置の値を計算してシグナルを発火"""
@@ -33,11 +110,7 @@ class ClickableSlider(QSlider):
 
     def _get_value_from_pos(self, pos):
         """座標からスライダーの値を計算する共通ロジック"""
-        opt = QStyleOptionSlider()
-        self.initStyleOption(opt)
-        sr = self.style().subControlRect(
-            QStyle.CC_Slider, opt, QStyle.SC_SliderGroove, self
-        )
+        sr = self._groove_rect()
 
         if self.orientation() == Qt.Horizontal:
             return QStyle.sliderValueFromPosition(
@@ -50,3 +123,10 @@ class ClickableSlider(QSlider):
                 sr.height() - pos.y() + sr.y(),
                 sr.height(),
             )
+
+    def _groove_rect(self):
+        opt = QStyleOptionSlider()
+        self.initStyleOption(opt)
+        return self.style().subControlRect(
+            QStyle.CC_Slider, opt, QStyle.SC_SliderGroove, self
+        )
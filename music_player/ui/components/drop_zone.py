@@ -29,7 +29,9 @@ class DropZone(QFrame):
 
         layout = QVBoxLayout(self)
         # 文言を「クリックして選択」に変更
-        self.label = QLabel("クリックしてファイルを選択")
+        self.label = QLabel(
+            "クリックしてファイルを選択\n（右クリックでフォルダを選択）"
+        )
         self.label.setAlignment(Qt.AlignCenter)
         self.label.setAttribute(Qt.WA_TransparentForMouseEvents)
         self.label.setStyleSheet(
@@ -51,11 +53,16 @@ class DropZone(QFrame):
                 self,
                 "音楽ファイルを選択",
                 "",
-                "Audio Files (*.mp3 *.wav *.flac *.m4a);;All Files (*)",
+                "Audio Files (*.mp3 *.wav *.flac *.m4a);;Playlists (*.m3u8 *.m3u);;All Files (*)",
             )
             if files:
                 # 取得したリストをシグナルで飛ばす
                 self.filesDropped.emit(files)
+        elif event.button() == Qt.RightButton:
+            # フォルダごと取り込む（中身の走査は MainWindow 側で行う）
+            folder = QFileDialog.getExistingDirectory(self, "音楽フォルダを選択")
+            if folder:
+                self.filesDropped.emit([folder])
 
     # 既存のD&Dイベントは残しておいても実害はありません
     def dragEnterEvent(self, event):
@@ -47,3 +47,7 @@ class EqSlider(QWidget):
     def set_value(self, value):
         """プリセット選択時などに外部から値を設定する用"""
         self.slider.setValue(value)
+
+    def value(self):
+        """現在のゲイン [dB]"""
+        return self.slider.value()
@@ -29,6 +29,7 @@ class PlayerControls(QWidget):
     skipForwardClicked = Signal()
     skipBackwardClicked = Signal()
     seekRequested = Signal(int)
+    shuffleToggled = Signal(bool)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -57,6 +58,8 @@ class PlayerControls(QWidget):
 
         self.slider = ClickableSlider(Qt.Horizontal)
         self.slider.setRange(0, 0)
+        # 背景に波形を描くので高さを確保する
+        self.slider.setMinimumHeight(36)
         self.slider.setStyleSheet(
             """
             QSlider::groove:horizontal { border: 1px solid #444; height: 4px; background: #2a2a2a; margin: 2px 0; }
@@ -104,6 +107,13 @@ class PlayerControls(QWidget):
         self.btn_stop = create_icon_button("stop")
         self.btn_toggle = create_icon_button("play")
         self.btn_next = create_icon_button("next")
+        self.btn_shuffle = create_icon_button("shuffle")
+        self.btn_shuffle.setCheckable(True)
+        self.btn_shuffle.setToolTip("シャッフル")
+        self.btn_shuffle.setStyleSheet(
+            self.btn_shuffle.styleSheet()
+            + "QPushButton:checked { background-color: rgba(0, 242, 195, 0.2); }"
+        )
 
         # ★ 音量調整エリアの作成
         self.vol_label = QLabel("Vol:")
@@ -125,6 +135,7 @@ class PlayerControls(QWidget):
         self.button_layout.addStretch()
 
         # 中央：再生コントロール
+        self.button_layout.addWidget(self.btn_shuffle)
         self.button_layout.addWidget(self.btn_prev)
         self.button_layout.addWidget(self.btn_stop)
         self.button_layout.addWidget(self.btn_toggle)
@@ -143,6 +154,7 @@ class PlayerControls(QWidget):
         self.btn_stop.clicked.connect(self.stopClicked.emit)
         self.btn_next.clicked.connect(self.skipForwardClicked.emit)
         self.btn_prev.clicked.connect(self.skipBackwardClicked.emit)
+        self.btn_shuffle.toggled.connect(self.shuffleToggled.emit)
 
         # 追加: 各スライダーのホバーイベントを接続
         self.slider.hoveredValue.connect(self._show_hover_time)
@@ -157,6 +169,10 @@ class PlayerControls(QWidget):
     def set_duration(self, duration_ms):
         self.slider.setRange(0, duration_ms)
 
+    def set_waveform(self, levels):
+        """シークバーの背景に描く波形を設定する（None で消す）"""
+        self.slider.set_waveform(levels)
+
     def _format_time(self, ms):
         s = ms // 1000
         m, s = divmod(s, 60)
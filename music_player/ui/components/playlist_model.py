@@ -0,0 +1,196 @@
+from bisect import bisect_left
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+from core.playlist import PlaylistManager
+
+
+class PlaylistModel(QAbstractListModel):
+    """
+    PlaylistManager をそのまま Qt のリストモデルとして見せるクラス。
+
+    曲ごとのアイテムは作らず、表示用の文字列は data() が呼ばれた
+    （画面に見えている）行の分だけ組み立てます。
+    検索で絞り込んでいる間は、一致した曲だけを行として見せます。
+    行番号（モデル上の行）とプレイリスト上の位置は row_to_position /
+    position_to_row で相互に変換します。
+    """
+
+    def __init__(self, manager=None, parent=None):
+        super().__init__(parent)
+        self.manager = manager if manager is not None else PlaylistManager()
+        # 表示する曲のプレイリスト上の位置（昇順）。None は絞り込みなし
+        self._filter = None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self._filter is not None:
+            return len(self._filter)
+        return len(self.manager)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        position = self.row_to_position(index.row())
+        if not 0 <= position < len(self.manager):
+            return None
+        song = self.manager.songs[position]
+        if role == Qt.DisplayRole:
+            title = song.get("title", "Unknown")
+            artist = song.get("artist", "Unknown")
+            return f"{title} - {artist}"
+        if role == Qt.UserRole:
+            return song.get("file_path")
+        return None
+
+    def row_to_position(self, row):
+        if self._filter is None:
+            return row
+        if 0 <= row < len(self._filter):
+            return self._filter[row]
+        return -1
+
+    def position_to_row(self, position):
+        """プレイリスト上の位置を行番号に変換する（絞り込みで隠れていれば -1）"""
+        if self._filter is None:
+            return position if 0 <= position < len(self.manager) else -1
+        row = bisect_left(self._filter, position)
+        if row < len(self._filter) and self._filter[row] == position:
+            return row
+        return -1
+
+    def set_filter(self, positions):
+        """positions の曲だけを行として見せる（None で絞り込みを解除）"""
+        self.beginResetModel()
+        self._filter = None if positions is None else sorted(positions)
+        self.endResetModel()
+
+    def add_songs(self, songs):
+        """曲をまとめて末尾に追加する（行の挿入はバッチごとに1回だけ通知する）"""
+        songs = [
+            metadata for metadata in songs if PlaylistManager.is_valid_song(metadata)
+        ]
+        if not songs:
+            return
+        if self._filter is not None:
+            # 絞り込み中は行が増えない（検索のやり直しで表示される）
+            self.manager.add_songs(songs)
+            return
+        start = len(self.manager)
+        self.beginInsertRows(QModelIndex(), start, start + len(songs) - 1)
+        self.manager.add_songs(songs)
+        self.endInsertRows()
+
+    def import_songs(self, data):
+        """PlaylistManager.export_songs() の結果をまとめて末尾に追加する"""
+        count = data.get("count", 0)
+        if not count:
+            return
+        if self._filter is not None:
+            self.manager.import_songs(data)
+            return
+        start = len(self.manager)
+        self.beginInsertRows(QModelIndex(), start, start + count - 1)
+        self.manager.import_songs(data)
+        self.endInsertRows()
+
+    def update_songs(self, songs):
+        """
+        (曲ID, 読み直したメタデータ) の組ごとに曲の内容を置き換え、
+        見えている行の表示を更新する（行の追加・削除はしない）
+        """
+        for song_id, metadata in songs:
+            row = self.position_to_row(self.manager.update_song(song_id, metadata))
+            if row >= 0:
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+
+    def remove_song(self, position):
+        """プレイリスト上の位置の曲を削除する（削除した曲の辞書を返す）"""
+        if not 0 <= position < len(self.manager):
+            return None
+        return self.remove_songs([position])[0]
+
+    def remove_songs(self, positions):
+        """
+        複数の位置の曲をまとめて削除し、削除した曲の辞書を位置順のリストで返す。
+        削除する行が連続していれば行の削除として、飛び飛びならモデルの
+        リセットとして、どちらも1回だけ通知します。
+        """
+        count = len(self.manager)
+        positions = sorted({p for p in positions if 0 <= p < count})
+        if not positions:
+            return []
+        rows = [row for row in map(self.position_to_row, positions) if row >= 0]
+        contiguous = not rows or rows[-1] - rows[0] + 1 == len(rows)
+        if not rows:
+            pass
+        elif contiguous:
+            self.beginRemoveRows(QModelIndex(), rows[0], rows[-1])
+        else:
+            self.beginResetModel()
+
+        removed = self.manager.remove_songs(positions)
+        if self._filter is not None:
+            # 残った曲は、それより前で削除された曲の数だけ位置が前にずれる
+            dropped = set(positions)
+            self._filter = [
+                p - bisect_left(positions, p) for p in self._filter if p not in dropped
+            ]
+
+        if not rows:
+            pass
+        elif contiguous:
+            self.endRemoveRows()
+        else:
+            self.endResetModel()
+        return removed
+
+    def clear(self):
+        self.beginResetModel()
+        self.manager.clear()
+        if self._filter is not None:
+            self._filter = []
+        self.endResetModel()
+
+    def sort_songs(self, order, reverse=False):
+        """
+        PlaylistManager.sort で並び替え、選択中の行などの位置を新しい並びに付け替える。
+        行は作り直さず、レイアウト変更として1回だけ通知します。
+        """
+        return self._rearrange(self.manager.sort, order, reverse=reverse)
+
+    def move_songs(self, positions, destination):
+        """複数の位置の曲を destination の位置の前へまとめて移動する（通知は1回）"""
+        return self._rearrange(self.manager.move_songs, positions, destination)
+
+    def _rearrange(self, method, *args, **kwargs):
+        # 並びを変える PlaylistManager のメソッドを呼び、返された
+        # permutation[新しい位置] = 元の位置 で行の付け替えを行う
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList()
+        old_positions = [self.row_to_position(index.row()) for index in old_indexes]
+
+        permutation = method(*args, **kwargs)
+        new_positions = [0] * len(permutation)
+        for new_position, old_position in enumerate(permutation):
+            new_positions[old_position] = new_position
+        if self._filter is not None:
+            self._filter = sorted(new_positions[p] for p in self._filter)
+
+        self.changePersistentIndexList(
+            old_indexes,
+            [self.index(self.position_to_row(new_positions[p])) for p in old_positions],
+        )
+        self.layoutChanged.emit()
+        return permutation
+
+    # --- ドラッグ&ドロップによる並び替え（実際の移動は PlaylistView.dropEvent で行う） ---
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid():
+            return flags | Qt.ItemIsDragEnabled
+        return flags | Qt.ItemIsDropEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
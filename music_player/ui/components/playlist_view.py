@@ -1,23 +1,57 @@
-from PySide6.QtWidgets import QListWidget, QListWidgetItem, QMenu
+from PySide6.QtWidgets import QAbstractItemView, QHeaderView, QMenu, QTableView
 from PySide6.QtCore import Signal, Qt
 from PySide6.QtGui import QKeyEvent, QAction
+from .playlist_model import PlaylistModel
 
 
-class PlaylistView(QListWidget):
-    """プレイリストを表示するウィジェット"""
+class PlaylistView(QTableView):
+    """
+    プレイリストを表示するウィジェット
+
+    曲ごとのアイテムは持たず、PlaylistManager を参照する PlaylistModel を表示します。
+    行の高さを固定しているため、10万曲を超えても見えている行の分しか描画しません。
+    （QListView は行の追加のたびに全行の配置を計算し直すため、行の高さを
+    ヘッダーでまとめて管理できる1列の QTableView をリストとして使っています）
+
+    currentRow() / songDeleted などの行番号は、すべてプレイリスト上の位置です。
+    """
 
     songSelected = Signal(str)
     # 削除操作が行われた際に、そのインデックスを通知するシグナル
     songDeleted = Signal(int)
+    # 複数の曲をまとめて削除する操作の通知（位置のリスト）
+    songsDeleted = Signal(list)
+    # 「次に再生」に予約する曲の位置のリスト
+    playNextRequested = Signal(list)
 
-    def __init__(self, parent=None):
+    def __init__(self, manager=None, parent=None):
         super().__init__(parent)
-        self.itemDoubleClicked.connect(self._on_item_double_clicked)
+        self.playlist_model = PlaylistModel(manager, self)
+        self.setModel(self.playlist_model)
+        self.doubleClicked.connect(self._on_double_clicked)
+
+        # 1列のリストとして見せる
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.horizontalHeader().hide()
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.verticalHeader().hide()
+
+        # ドラッグで曲を並び替える（移動は dropEvent でまとめて行う）
+        self.setDragEnabled(True)
+        self.setAcceptDrops(True)
+        self.setDropIndicatorShown(True)
+        self.setDragDropMode(QAbstractItemView.InternalMove)
+        self.setDefaultDropAction(Qt.MoveAction)
 
         # スタイル設定
         self.setStyleSheet(
             """
-            QListWidget {
+            QTableView {
                 background-color: #1a1a1a;
                 border: 1px solid #333;
                 border-radius: 5px;
@@ -25,34 +59,40 @@ class PlaylistView(QListWidget):
                 font-size: 13px;
                 outline: none;
             }
-            QListWidget::item {
+            QTableView::item {
                 padding: 10px;
                 border-bottom: 1px solid #222;
             }
-            QListWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #2c2c2c;
                 color: #00f2c3;
                 border-left: 3px solid #00f2c3;
             }
-            QListWidget::item:hover {
+            QTableView::item:hover {
                 background-color: #252525;
             }
         """
         )
 
+        # 全行を同じ高さにして、行ごとのサイズ計算を省く
+        self.ensurePolished()
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 21)
+
     def keyPressEvent(self, event: QKeyEvent):
         """Deleteキーによる削除対応"""
         if event.key() == Qt.Key_Delete:
-            current_row = self.currentRow()
-            if current_row >= 0:
-                self.songDeleted.emit(current_row)
+            positions = self.selected_positions()
+            if not positions and self.currentRow() >= 0:
+                positions = [self.currentRow()]
+            self._emit_delete(positions)
         else:
             super().keyPressEvent(event)
 
     def contextMenuEvent(self, event):
         """右クリックメニューの作成と表示"""
-        item = self.itemAt(event.pos())
-        if not item:
+        index = self.indexAt(event.pos())
+        if not index.isValid():
             return
 
         menu = QMenu(self)
@@ -64,19 +104,141 @@ class PlaylistView(QListWidget):
         """
         )
 
+        # 選択範囲の上で開いたら選択中の曲すべて、それ以外はその行の曲を対象にする
+        positions = self.selected_positions()
+        position = self.playlist_model.row_to_position(index.row())
+        if position not in positions:
+            positions = [position]
+        play_next_action = QAction("次に再生", self)
+        play_next_action.triggered.connect(
+            lambda: self.playNextRequested.emit(positions)
+        )
+        menu.addAction(play_next_action)
+
         delete_action = QAction("削除", self)
-        delete_action.triggered.connect(lambda: self.songDeleted.emit(self.row(item)))
+        delete_action.triggered.connect(lambda: self._emit_delete(positions))
         menu.addAction(delete_action)
 
         menu.popup(event.globalPos())
 
-    def _on_item_double_clicked(self, item):
-        file_path = item.data(Qt.UserRole)
+    def _emit_delete(self, positions):
+        if len(positions) == 1:
+            self.songDeleted.emit(positions[0])
+        elif positions:
+            self.songsDeleted.emit(positions)
+
+    def dropEvent(self, event):
+        """ドラッグした曲をドロップ位置へまとめて移動する"""
+        if event.source() is not self:
+            event.ignore()
+            return
+        model = self.playlist_model
+        pos = event.position().toPoint()
+        index = self.indexAt(pos)
+        if not index.isValid():
+            row = model.rowCount()
+        elif pos.y() > self.visualRect(index).center().y():
+            row = index.row() + 1
+        else:
+            row = index.row()
+        if row < model.rowCount():
+            destination = model.row_to_position(row)
+        else:
+            destination = model.row_to_position(row - 1) + 1 if row else 0
+
+        self.move_songs(self.selected_positions(), destination)
+        # 移動は済んでいるので、Qt に元の行を削除させない
+        event.setDropAction(Qt.IgnoreAction)
+        event.accept()
+
+    def _on_double_clicked(self, index):
+        file_path = index.data(Qt.UserRole)
         self.songSelected.emit(file_path)
 
+    # --- QListWidget と同じ感覚で使うための操作（行番号はプレイリスト上の位置） ---
+
+    def count(self):
+        """プレイリストの曲数（絞り込みで隠れている曲も含む）"""
+        return len(self.playlist_model.manager)
+
+    def currentRow(self):
+        index = self.currentIndex()
+        if not index.isValid():
+            return -1
+        return self.playlist_model.row_to_position(index.row())
+
+    def setCurrentRow(self, position):
+        self.setCurrentIndex(
+            self.playlist_model.index(self.playlist_model.position_to_row(position))
+        )
+
+    def file_path_at(self, position):
+        """指定した位置の曲のファイルパス（範囲外なら None）"""
+        songs = self.playlist_model.manager.songs
+        if 0 <= position < len(songs):
+            return songs[position].get("file_path")
+        return None
+
+    def add_songs(self, songs):
+        """曲をまとめて追加する"""
+        self.playlist_model.add_songs(songs)
+
+    def import_songs(self, data):
+        """保存しておいた曲データ（PlaylistManager.export_songs() の結果）を追加する"""
+        self.playlist_model.import_songs(data)
+
+    def update_songs(self, songs):
+        """(曲ID, メタデータ) の組ごとに、登録済みの曲の内容を置き換える"""
+        self.playlist_model.update_songs(songs)
+
     def add_song_item(self, metadata):
-        title = metadata.get("title", "Unknown")
-        artist = metadata.get("artist", "Unknown")
-        item = QListWidgetItem(f"{title} - {artist}")
-        item.setData(Qt.UserRole, metadata["file_path"])
-        self.addItem(item)
+        self.playlist_model.add_songs([metadata])
+
+    def remove_song(self, position):
+        """指定した位置の曲を削除する（削除した曲の辞書を返す）"""
+        removed = self.remove_songs([position])
+        return removed[0] if removed else None
+
+    def remove_songs(self, positions):
+        """複数の位置の曲をまとめて削除する（現在の曲が残っていれば選択を維持する）"""
+        manager = self.playlist_model.manager
+        current = self.currentRow()
+        current_id = manager.song_id(current) if current >= 0 else None
+        removed = self.playlist_model.remove_songs(positions)
+        if current_id is not None and self.currentRow() < 0:
+            # 飛び飛びの削除ではモデルがリセットされるため、曲IDから選択を戻す
+            current = manager.index_of(current_id)
+            if current >= 0:
+                self.setCurrentRow(current)
+        return removed
+
+    def move_songs(self, positions, destination):
+        """複数の位置の曲を destination の位置の前へ移動する（選択中の曲は維持される）"""
+        return self.playlist_model.move_songs(positions, destination)
+
+    def selected_positions(self):
+        """選択中の曲のプレイリスト上の位置（昇順）"""
+        model = self.playlist_model
+        return sorted(
+            model.row_to_position(index.row())
+            for index in self.selectionModel().selectedRows()
+        )
+
+    def sort_songs(self, order, reverse=False):
+        """core.playlist.SORT_ORDERS の種類で並び替える（選択中の曲は維持される）"""
+        return self.playlist_model.sort_songs(order, reverse=reverse)
+
+    def set_visible_rows(self, positions):
+        """
+        positions の曲だけを表示する（None ですべて表示）。
+        行を1つずつ隠すのではなく、モデルの行そのものを一致した曲だけにします。
+        """
+        current = self.currentRow()
+        self.playlist_model.set_filter(positions)
+        if current >= 0:
+            self.setCurrentRow(current)
+
+    def visible_rows(self):
+        """表示中の曲のプレイリスト上の位置"""
+        model = self.playlist_model
+        return [model.row_to_position(row) for row in range(model.rowCount())]
@@ -0,0 +1,195 @@
+import time
+import numpy as np
+from PySide6.QtWidgets import QWidget
+from PySide6.QtCore import Qt, QTimer, QRectF, Signal
+from PySide6.QtGui import QColor, QImage, QPainter
+
+# この時間フレームが届かなければ、音が止まったとみなす [秒]
+_STALE_SECONDS = 0.25
+
+
+def _colormap():
+    """レベル（0-255）から表示色（0xAARRGGBB）への対応表。暗い青 → 水色 → 白"""
+    position = np.linspace(0.0, 1.0, 256)
+    red = np.clip(position * 2.0 - 1.0, 0.0, 1.0)
+    green = np.clip(position * 1.5 - 0.2, 0.0, 1.0) * 0.95
+    blue = np.clip(0.25 + position * 1.2, 0.0, 1.0) * (0.76 + 0.24 * red)
+    channels = [np.round(c * 255).astype(np.uint32) for c in (red, green, blue)]
+    return 0xFF000000 | channels[0] << 16 | channels[1] << 8 | channels[2]
+
+
+class SpectrumVisualizer(QWidget):
+    """
+    スペクトルのバー表示と、スクロールするスペクトログラム表示を切り替えられる
+    ビジュアライザ。クリックで表示を切り替えます。
+
+    set_spectrum() で届いたフレームは最新の1つだけを覚え、描画は frame_rate の
+    タイマーで行います（届いた数だけ描き直さない）。スペクトログラムは
+    リングバッファ状の QImage に最新の1列だけを書き込み、古い列は描き直しません。
+    ウィンドウが隠れている・最小化されている間はタイマーを止め、
+    GUI スレッドが忙しい時は間に合わなかったフレームを捨てます。
+    """
+
+    BARS = "bars"
+    SPECTROGRAM = "spectrogram"
+
+    # 表示を切り替えた時（新しいモード）
+    modeChanged = Signal(str)
+
+    def __init__(self, frame_rate=60, history=256, parent=None):
+        super().__init__(parent)
+        self.frame_rate = frame_rate
+        self.history = history
+        self.mode = self.BARS
+        # 表示するレベルの範囲 [dB] と、バーが下がる速さ [dB/秒]
+        self.floor_db = -80.0
+        self.fall_rate = 60.0
+        self.setMinimumHeight(60)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self.setCursor(Qt.PointingHandCursor)
+
+        self._levels = None
+        self._bars = None
+        self._new_frame = False
+        self._frame_time = 0.0
+        self._last_tick = None
+        self._colors = _colormap()
+        # スペクトログラムの画素（QImage はこの配列のメモリを直接参照する）
+        self._pixels = None
+        self._image = None
+        self._column = 0
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(1000 // frame_rate)
+        self._timer.timeout.connect(self._tick)
+
+    def set_mode(self, mode):
+        if mode not in (self.BARS, self.SPECTROGRAM) or mode == self.mode:
+            return
+        self.mode = mode
+        self.update()
+        self.modeChanged.emit(mode)
+
+    def set_spectrum(self, levels, frequencies=None):
+        """解析結果（各バンドのレベル [dB]）を受け取る"""
+        self._levels = np.asarray(levels, dtype=np.float64)
+        self._new_frame = True
+        self._frame_time = time.monotonic()
+        # スペクトログラムは描画とは別に、届いたフレームを1列ずつ書き足す
+        self._write_column(self._levels)
+
+    def clear(self):
+        """表示を消す（曲の停止時など）"""
+        self._levels = self._bars = None
+        if self._pixels is not None:
+            self._pixels[:] = self._colors[0]
+        self.update()
+
+    def _normalized(self, levels):
+        return np.clip((levels - self.floor_db) / -self.floor_db, 0.0, 1.0)
+
+    def _write_column(self, levels):
+        if self._pixels is None or self._pixels.shape[0] != len(levels):
+            # 上が高域になるよう、バンドを逆順に並べた行にする
+            self._pixels = np.full(
+                (len(levels), self.history), self._colors[0], dtype=np.uint32
+            )
+            self._image = QImage(
+                self._pixels.data,
+                self.history,
+                len(levels),
+                self.history * 4,
+                QImage.Format_RGB32,
+            )
+            self._column = 0
+        index = (self._normalized(levels[::-1]) * 255).astype(np.intp)
+        self._pixels[:, self._column] = self._colors[index]
+        self._column = (self._column + 1) % self.history
+
+    # --- 描画 ---
+    def showEvent(self, event):
+        self._last_tick = None
+        self._timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def _tick(self):
+        window = self.window()
+        if window.isMinimized() or not self.isVisible():
+            return
+        now = time.monotonic()
+        elapsed = 0.0 if self._last_tick is None else now - self._last_tick
+        self._last_tick = now
+        if self._levels is None:
+            return
+        if self.mode == self.SPECTROGRAM:
+            if self._new_frame:
+                self._new_frame = False
+                self.update()
+            return
+
+        # バーは新しい値まで即座に上がり、下がる時はゆっくり下げる
+        # （一時停止などでフレームが届かなくなったら、無音に向かって下げる）
+        target = self._levels
+        if now - self._frame_time > _STALE_SECONDS:
+            target = np.full_like(target, self.floor_db)
+        if self._bars is None or len(self._bars) != len(target):
+            bars = target.copy()
+        else:
+            bars = np.maximum(target, self._bars - self.fall_rate * elapsed)
+        changed = self._bars is None or not np.array_equal(bars, self._bars)
+        self._bars = bars
+        self._new_frame = False
+        if changed:
+            # update() は次のイベントループでまとめて描くので、忙しい時は間引かれる
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#121212"))
+        if self.mode == self.SPECTROGRAM:
+            self._paint_spectrogram(painter)
+        elif self._bars is not None:
+            self._paint_bars(painter)
+        painter.end()
+
+    def _paint_bars(self, painter):
+        width, height = self.width(), self.height()
+        count = len(self._bars)
+        step = width / count
+        color = QColor("#00f2c3")
+        for index, level in enumerate(self._normalized(self._bars)):
+            bar = level * height
+            painter.fillRect(
+                QRectF(index * step + 1, height - bar, max(1.0, step - 2), bar), color
+            )
+
+    def _paint_spectrogram(self, painter):
+        if self._image is None:
+            return
+        # リングバッファの古い側（書き込み位置から右）→ 新しい側（左端から）の順に並べる
+        width, height = self.width(), self.height()
+        older = self.history - self._column
+        split = width * older / self.history
+        rows = self._image.height()
+        painter.drawImage(
+            QRectF(0, 0, split, height),
+            self._image,
+            QRectF(self._column, 0, older, rows),
+        )
+        if self._column:
+            painter.drawImage(
+                QRectF(split, 0, width - split, height),
+                self._image,
+                QRectF(0, 0, self._column, rows),
+            )
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.set_mode(self.SPECTROGRAM if self.mode == self.BARS else self.BARS)
+            event.accept()
+            return
+        super().mousePressEvent(event)
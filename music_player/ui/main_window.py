@@ -6,23 +6,50 @@ from PySide6.QtWidgets import (
     QHBoxLayout,
     QTabWidget,
     QLabel,
+    QComboBox,
+    QSpinBox,
+    QLineEdit,
+    QProgressBar,
+    QPushButton,
+    QFileDialog,
 )
-from PySide6.QtCore import QUrl, Qt
+from PySide6.QtCore import QUrl, Qt, QTimer
 from PySide6.QtGui import QIcon, QPixmap, QImage
 from PySide6.QtMultimedia import QMediaPlayer
 from .components.eq_slider import EqSlider
 from .components.player_controls import PlayerControls
 from .components.drop_zone import DropZone
 from .components.playlist_view import PlaylistView
-from core.metadata import extract_metadata
-from core.playlist import PlaylistManager
+from .components.spectrum_view import SpectrumVisualizer
+from core.metadata import extract_metadata, load_album_art, get_metadata_cache
+from core.importer import MetadataImporter
+from core.playlist import PlaylistManager, SongPrefetcher
+from core.queue import PlaybackQueue
+from core.scanner import LibraryScanner
 from core.engine import AudioEngine
+from core.decoder import can_decode
+from core.loudness import LoudnessScanner
+from core.spectrum import SpectrumWorker
+from core.waveform import WaveformLoader
+from core.m3u import is_playlist_file, read_m3u, write_m3u
+from core.session import load_session, save_session
 from core.utils import get_asset_path
+from dsp.equalizer import (
+    IIR_MODE,
+    LINEAR_PHASE_MODE,
+    Equalizer,
+    parse_frequency,
+)
+
+# 曲の残りがこの時間 [ms] を切ったら、次の曲を開いて切れ目なくつなぐ準備をする
+GAPLESS_PRELOAD_MS = 5000
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, data_dir=None, engine=None):
         super().__init__()
+        # スキャン履歴などの保存先（None の場合は何も永続化しない）
+        self.data_dir = data_dir
         self.setWindowTitle("Music Player Portfolio")
         self.resize(800, 600)
 
@@ -30,11 +57,45 @@ class MainWindow(QMainWindow):
         self.setWindowIcon(QIcon(icon_path))
 
         self.playlist_manager = PlaylistManager()
-        self.engine = AudioEngine()
+        # 再生エンジン（PcmAudioEngine を渡すと自前のデコードで再生する）
+        self.engine = engine if engine is not None else AudioEngine()
+        # 次・前の曲（シャッフル・次に再生・履歴）を決める
+        self.queue = PlaybackQueue(self.playlist_manager)
+        self.scanner = LibraryScanner(self._data_path("scan_journal.json"))
+        # タグ解析とフォルダの走査は GUI スレッドを塞がないようバックグラウンドで行う
+        # 取り込み時は画像を読まない高速モードにし、画像は表示する曲の分だけ読む
+        self.importer = MetadataImporter(
+            lambda path: extract_metadata(path, include_art=False),
+            scanner=self.scanner,
+            cache=get_metadata_cache(),
+        )
+        # 再スキャンで更新が見つかり、読み直している曲のパス
+        self._rereads = set()
+        # 前後の曲を先読みして曲送りを速くする
+        self.prefetcher = SongPrefetcher()
+        # 曲ごとの音量補正（ReplayGain）をバックグラウンドで測る
+        self.loudness_scanner = LoudnessScanner(get_metadata_cache())
+        # {パス: (トラックゲイン, アルバムゲイン)} [dB]
+        self._replay_gains = {}
+        # シークバーに描く波形は保存済みならすぐ読み、無ければ裏で計算する
+        self.waveform_loader = WaveformLoader(get_metadata_cache())
+        self._current_path = None
+        # 次の曲として再生エンジンに用意した曲 (曲ID, パス)
+        self._prepared_song = None
+        # 復元した曲の検索・並び替え用キーを、空き時間に少しずつ作る
+        self._index_timer = QTimer(self)
+        self._index_timer.setInterval(0)
+        self._index_timer.timeout.connect(self._index_pending_songs)
 
         self._init_ui()
         self._apply_styles()
         self._setup_connections()
+        self._restore_session()
+
+    def _data_path(self, filename):
+        if self.data_dir is None:
+            return None
+        return os.path.join(self.data_dir, filename)
 
     def _init_ui(self):
         self.central_widget = QWidget()
@@ -60,8 +121,49 @@ class MainWindow(QMainWindow):
         self.playlist_container = QWidget()
         self.playlist_layout = QVBoxLayout(self.playlist_container)
         self.drop_zone = DropZone()
-        self.playlist_view = PlaylistView()
+        self.playlist_view = PlaylistView(self.playlist_manager)
         self.playlist_layout.addWidget(self.drop_zone)
+
+        # インポート進捗（読み込み中のみ表示）
+        self.import_bar = QWidget()
+        self.import_layout = QHBoxLayout(self.import_bar)
+        self.import_layout.setContentsMargins(0, 0, 0, 0)
+        self.import_progress = QProgressBar()
+        self.import_progress.setTextVisible(True)
+        self.import_progress.setFormat("読み込み中... %v / %m")
+        self.import_cancel_button = QPushButton("キャンセル")
+        self.import_layout.addWidget(self.import_progress)
+        self.import_layout.addWidget(self.import_cancel_button)
+        self.import_bar.hide()
+        self.playlist_layout.addWidget(self.import_bar)
+
+        # プレイリストの絞り込み検索と並び替え
+        self.search_bar = QWidget()
+        self.search_layout = QHBoxLayout(self.search_bar)
+        self.search_layout.setContentsMargins(0, 0, 0, 0)
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText(
+            "検索（タイトル・アーティスト・アルバム・作曲者）"
+        )
+        self.search_box.setClearButtonEnabled(True)
+        self.sort_combo = QComboBox()
+        for label, order in [
+            ("追加順", "added"),
+            ("アーティスト", "artist"),
+            ("アルバム", "album"),
+            ("タイトル", "title"),
+            ("再生時間", "duration"),
+        ]:
+            self.sort_combo.addItem(label, order)
+        self.sort_desc_button = QPushButton("降順")
+        self.sort_desc_button.setCheckable(True)
+        self.export_button = QPushButton("M3U8 書き出し")
+        self.search_layout.addWidget(self.search_box, 1)
+        self.search_layout.addWidget(self.sort_combo)
+        self.search_layout.addWidget(self.sort_desc_button)
+        self.search_layout.addWidget(self.export_button)
+        self.playlist_layout.addWidget(self.search_bar)
+
         self.playlist_layout.addWidget(self.playlist_view)
 
         # Equalizer タブ
@@ -89,12 +191,65 @@ class MainWindow(QMainWindow):
             slider = EqSlider(frequency=freq)
             self.eq_layout.addWidget(slider)
             self.eq_sliders[freq] = slider
+        # 自前でデコードするエンジンでは、スライダーの値で実際にイコライザを掛ける
+        self.equalizer = None
+        if getattr(self.engine, "processors", None) is not None:
+            self.equalizer = Equalizer([parse_frequency(freq) for freq in frequencies])
+            self.engine.processors.append(self.equalizer)
+
+        # 曲ごとの音量差の補正（自動: シャッフル中はトラック、それ以外はアルバム単位）
+        self.replay_gain_panel = QWidget()
+        self.replay_gain_layout = QVBoxLayout(self.replay_gain_panel)
+        self.replay_gain_layout.addStretch()
+        # EQ の掛け方（直線位相は位相を崩さない代わりに遅延と計算量が増える）
+        self.replay_gain_layout.addWidget(QLabel("EQ 方式"))
+        self.eq_mode_combo = QComboBox()
+        self.eq_mode_combo.addItem("通常", IIR_MODE)
+        self.eq_mode_combo.addItem("リニアフェーズ", LINEAR_PHASE_MODE)
+        self.eq_mode_combo.setEnabled(self.equalizer is not None)
+        self.replay_gain_layout.addWidget(self.eq_mode_combo)
+        self.eq_status_label = QLabel("")
+        self.replay_gain_layout.addWidget(self.eq_status_label)
+        self.replay_gain_layout.addWidget(QLabel("音量補正"))
+        self.replay_gain_combo = QComboBox()
+        for label, mode in [
+            ("自動", "auto"),
+            ("トラック", "track"),
+            ("アルバム", "album"),
+            ("オフ", "off"),
+        ]:
+            self.replay_gain_combo.addItem(label, mode)
+        # ラウドネスの測定は全曲をデコードする重い処理なので、音量補正を
+        # 有効にした時だけ行う（既定はオフ）
+        self.replay_gain_combo.setCurrentIndex(self.replay_gain_combo.findData("off"))
+        self.replay_gain_layout.addWidget(self.replay_gain_combo)
+        # 曲の変わり目で前後の曲を重ねる長さ（自前でデコードするエンジンの時だけ）
+        self.replay_gain_layout.addWidget(QLabel("クロスフェード"))
+        self.crossfade_spin = QSpinBox()
+        self.crossfade_spin.setRange(0, 12)
+        self.crossfade_spin.setSuffix(" 秒")
+        self.crossfade_spin.setEnabled(
+            getattr(self.engine, "processors", None) is not None
+        )
+        self.replay_gain_layout.addWidget(self.crossfade_spin)
+        self.eq_layout.addWidget(self.replay_gain_panel)
 
         self.tabs.addTab(self.playlist_container, "Playlist")
         self.tabs.addTab(self.eq_container, "Equalizer")
 
+        # 再生中の音のスペクトル（自前でデコードするエンジンの時だけ）
+        self.visualizer = SpectrumVisualizer()
+        self.visualizer.setFixedHeight(80)
+        self.spectrum_worker = None
+        if getattr(self.engine, "taps", None) is not None:
+            self.spectrum_worker = SpectrumWorker()
+            self.engine.taps.append(self.spectrum_worker.feed)
+        else:
+            self.visualizer.hide()
+
         self.controls = PlayerControls()
         self.main_layout.addWidget(self.tabs)
+        self.main_layout.addWidget(self.visualizer)
         self.main_layout.addWidget(self.controls)
 
     def _set_default_art(self):
@@ -120,26 +275,70 @@ class MainWindow(QMainWindow):
             QTabBar::tab:selected { background-color: #121212; color: #00f2c3; border-bottom: 3px solid #00f2c3; font-weight: bold; }
         """
         )
+        self.search_bar.setStyleSheet(
+            """
+            QLineEdit, QComboBox, QPushButton { background-color: #1a1a1a; color: #ddd; border: 1px solid #333; border-radius: 5px; padding: 6px; }
+            QPushButton:checked { color: #00f2c3; border-color: #00f2c3; }
+        """
+        )
         self.eq_container.setStyleSheet(
             "#eqContainer { background-color: #121212; } QWidget { background-color: transparent; }"
+            " QLabel { color: #888888; }"
+            " QComboBox { background-color: #1a1a1a; color: #ddd; border: 1px solid #333; border-radius: 5px; padding: 6px; }"
         )
 
     def _setup_connections(self):
         self.drop_zone.filesDropped.connect(self._on_files_dropped)
+        self.importer.batch_ready.connect(self._on_import_batch)
+        self.importer.folder_scanned.connect(self._on_folder_scanned)
+        self.importer.import_finished.connect(self._rereads.clear)
+        self.importer.progress_changed.connect(self._on_import_progress)
+        self.importer.import_finished.connect(self.import_bar.hide)
+        self.importer.import_finished.connect(self._scan_loudness)
+        self.loudness_scanner.gains_ready.connect(self._on_gains_ready)
+        self.waveform_loader.waveform_ready.connect(self._on_waveform_ready)
+        self.import_cancel_button.clicked.connect(self.importer.cancel)
         self.playlist_view.songSelected.connect(self._on_song_selected)
         self.playlist_view.songDeleted.connect(self._on_delete_song)
+        self.playlist_view.songsDeleted.connect(self._on_delete_songs)
+        self.playlist_view.playNextRequested.connect(self._on_play_next_requested)
+        self.search_box.textChanged.connect(self._apply_search)
+        self.sort_combo.currentIndexChanged.connect(self._apply_sort)
+        self.sort_desc_button.toggled.connect(self._apply_sort)
+        self.export_button.clicked.connect(self._export_playlist)
 
         self.controls.playPauseClicked.connect(self.engine.toggle_play)
-        self.controls.stopClicked.connect(self.engine.player.stop)
+        self.controls.stopClicked.connect(self.engine.stop)
         self.controls.seekRequested.connect(self.engine.set_position)
+        # シークすると再生エンジンは用意した次の曲を取りやめるので、後で用意し直す
+        self.controls.seekRequested.connect(self._cancel_prepared_song)
+        self.controls.stopClicked.connect(self._cancel_prepared_song)
 
         self.controls.skipForwardClicked.connect(self._play_next_song)
         self.controls.skipBackwardClicked.connect(self._play_prev_song)
+        self.controls.shuffleToggled.connect(self.queue.set_shuffle)
+        self.controls.shuffleToggled.connect(self._cancel_prepared_song)
+        self.controls.shuffleToggled.connect(self._apply_replay_gain)
+        self.replay_gain_combo.currentIndexChanged.connect(self._apply_replay_gain)
+        self.replay_gain_combo.currentIndexChanged.connect(self._scan_loudness)
+        self.eq_mode_combo.currentIndexChanged.connect(self._apply_eq_mode)
+        self.crossfade_spin.valueChanged.connect(self._apply_crossfade)
+        if self.equalizer is not None:
+            for index, slider in enumerate(self.eq_sliders.values()):
+                slider.valueChanged.connect(
+                    lambda _freq, value, index=index: self.equalizer.set_gain(
+                        index, value
+                    )
+                )
 
         self.engine.state_changed.connect(self.controls.update_playback_icons)
+        if self.spectrum_worker is not None:
+            self.spectrum_worker.spectrum_ready.connect(self.visualizer.set_spectrum)
+            self.spectrum_worker.start()
         self.engine.position_changed.connect(self._on_position_changed)
         self.engine.duration_changed.connect(self.controls.set_duration)
         self.engine.media_status_changed.connect(self._on_media_status_changed)
+        self.engine.next_song_started.connect(self._on_next_song_started)
 
         self.controls.volume_slider.valueChanged.connect(self.engine.set_volume)
         self.engine.set_volume(self.controls.volume_slider.value())
@@ -148,76 +347,409 @@ class MainWindow(QMainWindow):
         if not files:
             return
 
-        # 追加前の行数を保持（最初に追加される曲のインデックスになる）
+        # M3U / M3U8 プレイリストは記載された曲を順に取り込む
+        paths = []
+        for path in files:
+            if is_playlist_file(path):
+                paths.extend(self._read_playlist_file(path))
+            else:
+                paths.append(path)
+        if not paths:
+            return
+        files = paths
+
+        # フォルダは取り込み側で再帰的に走査し、未登録の曲と更新された曲だけを読む
+        known_paths = None
+        if any(os.path.isdir(path) for path in files):
+            known_paths = frozenset(self.playlist_manager.get_column("file_path"))
+
+        # 解析はバックグラウンドで行い、結果はバッチ単位で _on_import_batch に届く
+        # 進捗は取り込み中の全ジョブを通した値が progress_changed で届く
+        self.import_bar.show()
+        self.importer.import_files(files, known_paths)
+
+    def _on_import_batch(self, batch, first):
+        if self._rereads:
+            batch = self._update_reread_songs(batch)
+            if not batch:
+                return
+
+        # 追加前の行数を保持（バッチ先頭の曲のインデックスになる）
         start_row = self.playlist_view.count()
-        first_valid_path = None
-
-        for f in files:
-            metadata = extract_metadata(f)
-            if metadata:
-                self.playlist_manager.add_song(metadata)
-                self.playlist_view.add_song_item(metadata)
-                # 今回ドロップされた中で最初の有効なファイルを記録
-                if first_valid_path is None:
-                    first_valid_path = metadata["file_path"]
-
-        # 追加された最初の曲を自動的にロードして再生
-        if first_valid_path:
+        self.playlist_view.add_songs(batch)
+
+        # 絞り込み中は、追加した曲も含めて検索し直す
+        if self.search_box.text():
+            self._apply_search()
+
+        # 今回ドロップされた中で最初の有効な曲を、解析できた時点で再生する
+        if first:
             self.playlist_view.setCurrentRow(start_row)
-            self._play_song_at_path(first_valid_path)
+            self._play_song_at_path(batch[0]["file_path"])
+
+    def _read_playlist_file(self, path):
+        try:
+            return read_m3u(path)
+        except OSError as e:
+            print(f"Playlist read error ({path}): {e}")
+            return []
+
+    def _export_playlist(self):
+        """プレイリストを M3U8 ファイルとして書き出す"""
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "プレイリストを書き出し",
+            "playlist.m3u8",
+            "M3U8 Playlist (*.m3u8)",
+        )
+        if not path:
+            return
+        try:
+            write_m3u(path, self.playlist_manager.get_all_songs())
+        except OSError as e:
+            print(f"Playlist export error ({path}): {e}")
+
+    def _on_folder_scanned(self, result):
+        """
+        フォルダの再スキャン結果をプレイリストへ反映する。
+        削除された曲は外し、更新された曲は読み直した結果で行を置き換える
+        （キャッシュの破棄と読み直しは取り込み側で行われる）。
+        """
+        if result.removed:
+            self._remove_songs_by_path(set(result.removed))
+        self._rereads.update(result.changed)
+
+    def _update_reread_songs(self, batch):
+        """読み直した曲で登録済みの行を置き換え、新しく追加する曲だけを返す"""
+        added = []
+        updates = []
+        for metadata in batch:
+            file_path = metadata.get("file_path")
+            song = None
+            if file_path in self._rereads:
+                self._rereads.discard(file_path)
+                song = self.playlist_manager.get_song_by_path(file_path)
+            if song is None:
+                added.append(metadata)
+            else:
+                updates.append((song.song_id, metadata))
+        if updates:
+            self.playlist_view.update_songs(updates)
+        return added
+
+    def _remove_songs_by_path(self, paths):
+        file_paths = self.playlist_manager.get_column("file_path")
+        self._on_delete_songs(
+            [row for row, path in enumerate(file_paths) if path in paths]
+        )
+
+    def _apply_search(self, *args):
+        """検索欄の内容でプレイリストの表示を絞り込む"""
+        rows = self.playlist_manager.search(self.search_box.text())
+        self.playlist_view.set_visible_rows(rows)
+
+    def _apply_sort(self, *args):
+        """選択中の並び順でプレイリストを並び替える"""
+        self.playlist_view.sort_songs(
+            self.sort_combo.currentData(), reverse=self.sort_desc_button.isChecked()
+        )
+
+    def _on_import_progress(self, done, total):
+        self.import_progress.setMaximum(total)
+        self.import_progress.setValue(done)
 
     def _on_song_selected(self, file_path):
         self._play_song_at_path(file_path)
 
-    def _play_song_at_path(self, file_path):
+    def _play_song_at_path(self, file_path, start_position=0, autoplay=True):
         """再生とUI更新の共通処理"""
-        metadata = extract_metadata(file_path)
+        # プレイリストに登録済みの曲は、その情報を使ってファイルの再解析を省く
+        metadata = self.playlist_manager.get_song_by_path(file_path)
+        if metadata is None:
+            metadata = extract_metadata(file_path)
         if metadata:
-            self.engine.load_song(file_path)
-            self.controls.update_song_info(metadata["title"], metadata["artist"])
-
-            # アルバムアートの更新
-            if metadata.get("album_art"):
-                image = QImage.fromData(metadata["album_art"])
-                pixmap = QPixmap.fromImage(image)
-                self.art_label.setPixmap(
-                    pixmap.scaled(
-                        self.art_label.size(),
-                        Qt.KeepAspectRatio,
-                        Qt.SmoothTransformation,
-                    )
+            self._current_path = file_path
+            self._prepared_song = None
+            self._apply_replay_gain()
+            self.engine.load_song(
+                file_path, start_position=start_position, autoplay=autoplay
+            )
+            self._show_song(file_path, metadata)
+
+    def _show_song(self, file_path, metadata):
+        """再生を始めた曲の情報・波形・アルバムアートを表示する"""
+        # 波形は再生を始めてから用意する（前の曲の波形は消しておく）
+        self.controls.set_waveform(None)
+        self.waveform_loader.load(file_path)
+        self.controls.update_song_info(metadata["title"], metadata["artist"])
+
+        # アルバムアートの更新（画像は表示する時だけ ArtStore から取り出す）
+        art = load_album_art(metadata)
+        if art:
+            image = QImage.fromData(art)
+            pixmap = QPixmap.fromImage(image)
+            self.art_label.setPixmap(
+                pixmap.scaled(
+                    self.art_label.size(),
+                    Qt.KeepAspectRatio,
+                    Qt.SmoothTransformation,
                 )
-            else:
-                # 画像がない曲の場合はデフォルトに戻す
-                self._set_default_art()
+            )
+        else:
+            # 画像がない曲の場合はデフォルトに戻す
+            self._set_default_art()
+
+        self._prefetch_neighbors()
+
+    def _scan_loudness(self, *args):
+        """
+        音量補正がまだ求まっていない曲のラウドネスを測る（音量補正がオフなら何もしない）。
+        デコードできなかった曲も None として _replay_gains に入るので、測り直しません。
+        アルバムゲインはアルバム全曲から求めるため、未測定の曲を含むアルバムは
+        全曲を対象にします（測定済みの曲はキャッシュから読むだけで済む）。
+        """
+        if self.replay_gain_combo.currentData() == "off" or not can_decode():
+            return
+        paths = self.playlist_manager.get_column("file_path")
+        keys = [
+            self._album_key(path, album)
+            for path, album in zip(paths, self.playlist_manager.get_column("album"))
+        ]
+        pending = {
+            key if key is not None else path
+            for path, key in zip(paths, keys)
+            if path not in self._replay_gains
+        }
+        if not pending:
+            return
+        self.loudness_scanner.scan(
+            [
+                (path, key)
+                for path, key in zip(paths, keys)
+                if (key if key is not None else path) in pending
+            ]
+        )
+
+    @staticmethod
+    def _album_key(file_path, album):
+        # 同じフォルダにある同名アルバムの曲を1枚のアルバムとみなす
+        # （アルバムアーティストが無くても、コンピレーションをまとめられる）
+        if not album or album == "Unknown Album":
+            return None
+        return os.path.dirname(file_path), album
+
+    def _on_gains_ready(self, gains):
+        self._replay_gains.update(gains)
+        self._apply_replay_gain()
+
+    def _apply_replay_gain(self, *args):
+        """再生中の曲の音量補正を、選択中の方式でエンジンに設定する"""
+        self.engine.set_replay_gain(self._replay_gain_for(self._current_path))
+
+    def _replay_gain_for(self, file_path):
+        # 選択中の方式での曲の音量補正 [dB]（未測定・オフなら 0）
+        mode = self.replay_gain_combo.currentData()
+        gains = self._replay_gains.get(file_path)
+        if gains is None or mode == "off":
+            return 0.0
+        if mode == "auto":
+            mode = "track" if self.queue.shuffle else "album"
+        track_gain, album_gain = gains
+        return track_gain if mode == "track" else album_gain
+
+    def _prefetch_neighbors(self):
+        """次・前へ進んだ時に再生される曲（予約・シャッフル・履歴を含む）を先読みしておく"""
+        self._sync_queue()
+        songs = self.playlist_manager.get_all_songs()
+        neighbors = []
+        for song_id in (self.queue.peek_next(), self.queue.peek_previous()):
+            if song_id is None or song_id == self.queue.current_id:
+                continue
+            index = self.playlist_manager.index_of(song_id)
+            if index >= 0:
+                neighbors.append(songs[index])
+        if neighbors:
+            self.prefetcher.prefetch(neighbors)
 
     def _on_media_status_changed(self, status):
         if status == QMediaPlayer.MediaStatus.EndOfMedia:
             self._play_next_song()
 
     def _play_next_song(self):
-        count = self.playlist_view.count()
-        if count == 0:
-            return
-        next_row = (self.playlist_view.currentRow() + 1) % count
-        self._play_at_index(next_row)
+        self._sync_queue()
+        song_id = self.queue.next()
+        if song_id is not None:
+            self._play_at_index(self.playlist_manager.index_of(song_id))
 
     def _play_prev_song(self):
-        count = self.playlist_view.count()
-        if count == 0:
+        self._sync_queue()
+        song_id = self.queue.previous()
+        if song_id is not None:
+            self._play_at_index(self.playlist_manager.index_of(song_id))
+
+    def _sync_queue(self):
+        # プレイリストで選んで再生した曲を、再生順の基準（現在の曲）にする
+        row = self.playlist_view.currentRow()
+        if row >= 0:
+            self.queue.set_current(self.playlist_manager.song_id(row))
+
+    def _on_play_next_requested(self, indexes):
+        self.queue.play_next([self.playlist_manager.song_id(i) for i in indexes])
+        self._cancel_prepared_song()
+
+    def _prepare_next_song(self, position):
+        """曲の終わりが近づいたら、次の曲を再生エンジンに用意しておく"""
+        if self._current_path is None or self._prepared_song is not None:
+            return
+        duration = self.engine.duration()
+        # 重ねる場合は、重ね始める時点より前に用意する
+        preload = GAPLESS_PRELOAD_MS + self.crossfade_spin.value() * 1000
+        if duration <= 0 or duration - position > preload:
             return
-        prev_row = (self.playlist_view.currentRow() - 1 + count) % count
-        self._play_at_index(prev_row)
+        self._sync_queue()
+        song_id = self.queue.peek_next()
+        if song_id is None:
+            return
+        file_path = self.playlist_view.file_path_at(
+            self.playlist_manager.index_of(song_id)
+        )
+        # 用意できない時（形式が違う曲など）も、この曲の間は試し直さない
+        self._prepared_song = (song_id, file_path)
+        if file_path:
+            self.engine.prepare_next(file_path, self._replay_gain_for(file_path))
+
+    def _cancel_prepared_song(self, *args):
+        # 再生順が変わったら、用意した曲を取りやめて選び直す
+        self.engine.cancel_next()
+        self._prepared_song = None
+
+    def _on_next_song_started(self, file_path):
+        """用意した次の曲へ、再生エンジンが切れ目なく移った"""
+        song_id, prepared_path = self._prepared_song or (None, None)
+        self._prepared_song = None
+        if file_path != prepared_path:
+            return
+        metadata = self.playlist_manager.get_song_by_path(file_path)
+        if metadata is None:
+            metadata = extract_metadata(file_path)
+        # 再生順も、EndOfMedia の後に次の曲へ進んだ時と同じように進める
+        if self.queue.peek_next() == song_id:
+            self.queue.next()
+        else:
+            self.queue.set_current(song_id)
+        index = self.playlist_manager.index_of(song_id)
+        if index >= 0:
+            self.playlist_view.setCurrentRow(index)
+        self._current_path = file_path
+        self._apply_replay_gain()
+        self._show_song(file_path, metadata)
 
     def _play_at_index(self, index):
         self.playlist_view.setCurrentRow(index)
-        item = self.playlist_view.item(index)
-        if item:
-            self._play_song_at_path(item.data(Qt.UserRole))
+        file_path = self.playlist_view.file_path_at(index)
+        if file_path:
+            self._play_song_at_path(file_path)
 
     def _on_delete_song(self, index):
-        self.playlist_manager.remove_song(index)
-        self.playlist_view.takeItem(index)
+        self.queue.before_remove([index])
+        self.playlist_view.remove_song(index)
+
+    def _on_delete_songs(self, indexes):
+        self.queue.before_remove(indexes)
+        self.playlist_view.remove_songs(indexes)
+
+    def _restore_session(self):
+        """前回終了時のプレイリストと再生状態を復元する（曲は再生せず一時停止で待つ）"""
+        session = load_session(self._data_path("session.json"))
+        if session is None:
+            return
+        songs, state = session
+        self.playlist_view.import_songs(songs)
+        if self.playlist_manager.index_pending(0):
+            self._index_timer.start()
+
+        if isinstance(state.get("volume"), int):
+            self.controls.volume_slider.setValue(state["volume"])
+        self.controls.btn_shuffle.setChecked(bool(state.get("shuffle")))
+        mode_index = self.replay_gain_combo.findData(state.get("replay_gain"))
+        if mode_index >= 0:
+            self.replay_gain_combo.setCurrentIndex(mode_index)
+        mode_index = self.eq_mode_combo.findData(state.get("eq_mode"))
+        if mode_index >= 0:
+            self.eq_mode_combo.setCurrentIndex(mode_index)
+        if isinstance(state.get("crossfade"), int):
+            self.crossfade_spin.setValue(state["crossfade"])
+        eq = state.get("eq")
+        for freq, value in (eq if isinstance(eq, dict) else {}).items():
+            if freq in self.eq_sliders and isinstance(value, int):
+                self.eq_sliders[freq].set_value(value)
+
+        row = state.get("current_row", -1)
+        if isinstance(row, int) and 0 <= row < self.playlist_view.count():
+            self.playlist_view.setCurrentRow(row)
+            position = state.get("position", 0)
+            self._play_song_at_path(
+                self.playlist_view.file_path_at(row),
+                start_position=position if isinstance(position, int) else 0,
+                autoplay=False,
+            )
+
+    def _index_pending_songs(self):
+        # 1回に少しずつ処理して GUI の応答を保つ
+        if self.playlist_manager.index_pending(2000) == 0:
+            self._index_timer.stop()
+
+    def _save_session(self):
+        path = self._data_path("session.json")
+        if path is None:
+            return
+        state = {
+            "current_row": self.playlist_view.currentRow(),
+            "position": self.engine.position(),
+            "volume": self.controls.volume_slider.value(),
+            "shuffle": self.queue.shuffle,
+            "replay_gain": self.replay_gain_combo.currentData(),
+            "eq_mode": self.eq_mode_combo.currentData(),
+            "crossfade": self.crossfade_spin.value(),
+            "eq": {freq: slider.value() for freq, slider in self.eq_sliders.items()},
+        }
+        save_session(path, self.playlist_manager, state)
+
+    def closeEvent(self, event):
+        self.importer.cancel()
+        self.loudness_scanner.cancel()
+        self.waveform_loader.shutdown()
+        if self.spectrum_worker is not None:
+            self.spectrum_worker.stop()
+        self.prefetcher.shutdown()
+        self._index_timer.stop()
+        self._save_session()
+        super().closeEvent(event)
+
+    def _on_waveform_ready(self, file_path, levels):
+        # 読み込み中に別の曲へ移っていたら使わない
+        if file_path == self._current_path:
+            self.controls.set_waveform(levels)
 
     def _on_position_changed(self, position):
-        self.controls.update_position(position, self.engine.player.duration())
+        self.controls.update_position(position, self.engine.duration())
+        self._prepare_next_song(position)
+        self._update_eq_status()
+
+    def _apply_crossfade(self, seconds):
+        # 次に用意する曲から反映する
+        self.engine.set_crossfade(seconds * 1000)
+
+    def _apply_eq_mode(self, *args):
+        if self.equalizer is None:
+            return
+        self.equalizer.set_mode(self.eq_mode_combo.currentData())
+        self._update_eq_status()
+
+    def _update_eq_status(self):
+        """EQ の遅延と CPU 負荷（処理時間 / 音の長さ）を表示する"""
+        if self.equalizer is None:
+            return
+        self.eq_status_label.setText(
+            f"遅延 {self.equalizer.latency_ms}ms / CPU {self.equalizer.cpu_load:.1%}"
+        )